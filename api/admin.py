@@ -3,7 +3,8 @@ Admin configuration for PrepShark API.
 """
 
 from django.contrib import admin
-from .models import User, Question, MockTest, TestResult, UserProgress, Subscription, AdConfig, SubscriptionPlan, QuestionAttempt, DailyPracticePaper
+from .ingest import delete_questions
+from .models import User, Question, MockTest, TestResult, UserProgress, Subscription, AdConfig, SubscriptionPlan, QuestionAttempt, DailyPracticePaper, UserChapterStats, UserTestStats
 
 
 @admin.register(User)
@@ -28,6 +29,13 @@ class QuestionAdmin(admin.ModelAdmin):
     search_fields = ['question_text', 'question_id', 'chapter']
     readonly_fields = ['created_at', 'updated_at']
 
+    def delete_model(self, request, obj):
+        delete_questions(Question.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        # "Delete selected": one mock test touch for the whole selection
+        delete_questions(queryset)
+
 
 @admin.register(MockTest)
 class MockTestAdmin(admin.ModelAdmin):
@@ -42,7 +50,8 @@ class TestResultAdmin(admin.ModelAdmin):
     list_display = ['user', 'test_type', 'score', 'total_questions', 'created_at']
     list_filter = ['test_type', 'created_at']
     search_fields = ['user__email', 'user__name']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'question_reviews']
+    list_select_related = ['user']
 
 
 @admin.register(UserProgress)
@@ -50,6 +59,22 @@ class UserProgressAdmin(admin.ModelAdmin):
     list_display = ['user', 'subject', 'chapter', 'questions_attempted', 'accuracy']
     list_filter = ['subject']
     search_fields = ['user__email', 'chapter']
+    list_select_related = ['user']
+
+
+@admin.register(UserChapterStats)
+class UserChapterStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'subject', 'chapter', 'solved', 'attempted', 'updated_at']
+    list_filter = ['subject']
+    search_fields = ['user__email', 'chapter']
+    list_select_related = ['user']
+
+
+@admin.register(UserTestStats)
+class UserTestStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'total_tests', 'total_questions', 'total_correct', 'updated_at']
+    search_fields = ['user__email']
+    list_select_related = ['user']
 
 
 @admin.register(Subscription)
@@ -58,6 +83,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_filter = ['plan', 'status']
     search_fields = ['user__email', 'payment_id']
     readonly_fields = ['started_at', 'created_at']
+    list_select_related = ['user']
 
 
 @admin.register(AdConfig)
@@ -0,0 +1,73 @@
+"""
+Async versions of I/O-bound endpoints, routed in place of the DRF actions
+when running under ASGI (``settings.ASYNC_VIEWS``).
+
+DRF viewsets cannot be async, so these are plain Django views returning the
+same payloads. Authentication is still done by the Firebase middleware;
+``request.user`` is replaced by Django's auth middleware later in the chain,
+so the Firebase user is read from ``request._firebase_user``.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .offload import run_blocking
+from .query_budget import query_budget
+from .payments import (
+    GatewayUnavailable, OrderInProgress, activate_subscription, activation_response, get_or_create_order,
+    order_amount, order_response,
+)
+
+
+def _request_data(request):
+    """JSON or form-encoded body, like DRF's ``request.data``."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+def _response(data, status=200):
+    # DRF's encoder, so dates render exactly as in the sync views
+    return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+
+@query_budget(1)
+async def create_order(request):
+    """Create Razorpay order for subscription."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return _response({'detail': 'JSON parse error'}, status=400)
+    
+    plan_key = data.get('plan', 'DAILY_PRACTICE')
+    amount = await sync_to_async(order_amount)(plan_key)
+    try:
+        order = await run_blocking(get_or_create_order, request._firebase_user.pk, plan_key, amount)
+    except GatewayUnavailable as e:
+        return _response({'error': str(e)}, status=503)
+    except OrderInProgress as e:
+        return _response({'error': str(e)}, status=409)
+    return _response(order_response(order, amount))
+
+
+@query_budget(3)
+async def verify_payment(request):
+    """Verify payment and activate subscription."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return _response({'detail': 'JSON parse error'}, status=400)
+    
+    expires_at = await sync_to_async(activate_subscription)(
+        request._firebase_user, data.get('plan', 'DAILY_PRACTICE'), data.get('payment_id')
+    )
+    return _response(activation_response(expires_at))
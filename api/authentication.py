@@ -20,10 +20,6 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
         # Check for Firebase user stored by our middleware
         user = getattr(django_request, '_firebase_user', None)
         
-        print(f"DEBUG AUTH: user type={type(user)}, has_id={hasattr(user, 'id') if user else False}")
-        if user and hasattr(user, 'email'):
-            print(f"DEBUG AUTH: user email={user.email}")
-        
         # If middleware set a valid user, return it
         if user and hasattr(user, 'id'):
             return (user, None)
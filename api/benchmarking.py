@@ -0,0 +1,498 @@
+"""
+Helpers for the benchmark management commands.
+
+Benchmarks run against a throwaway test database so they never touch real
+data, and seed it with synthetic rows in bulk.
+"""
+
+import asyncio
+import io
+import json
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from firebase_admin import auth
+
+from .daily_practice import build_papers
+from .models import (
+    AdConfig, MockTest, Question, QuestionAttempt, Subscription, SubscriptionPlan, TestResult, TestResultReviews,
+    User, UserProgress,
+)
+from .progress import rebuild_chapter_stats
+from .query_budget import QueryBudgetExceeded, view_budget
+
+
+SUBJECTS = ['Physics', 'Chemistry', 'Botany', 'Zoology']
+DIFFICULTIES = ['EASY', 'MEDIUM', 'HARD']
+CHAPTERS_PER_SUBJECT = 30
+
+
+@contextmanager
+def benchmark_database(keepdb=False, verbosity=0):
+    """Create a test database for the duration of the block."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection.settings_dict['NAME']
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity, keepdb=keepdb)
+
+
+def seed_questions(total, batch_size=5000, seed=0):
+    """Bulk insert ``total`` synthetic questions spread over all subjects."""
+    rng = random.Random(seed)
+    start = Question.objects.count()
+    created = 0
+    while created < total:
+        size = min(batch_size, total - created)
+        batch = []
+        for offset in range(size):
+            n = start + created + offset
+            subject = SUBJECTS[n % len(SUBJECTS)]
+            batch.append(Question(
+                subject=subject,
+                chapter=f'{subject} Chapter {rng.randrange(CHAPTERS_PER_SUBJECT) + 1}',
+                difficulty=rng.choice(DIFFICULTIES),
+                question_text=f'Synthetic question {n}',
+                options=['A', 'B', 'C', 'D'],
+                correct_index=rng.randrange(4),
+                question_id=f'bench-{n}',
+            ))
+        Question.objects.bulk_create(batch)
+        created += size
+    return created
+
+
+def seed_users(total, exam_type='NEET'):
+    """Bulk insert ``total`` users whose Firebase UIDs are ``bench-user-<n>``."""
+    User.objects.bulk_create([
+        User(firebase_uid=f'bench-user-{n}', email=f'bench{n}@example.com', name=f'Bench {n}', exam_type=exam_type)
+        for n in range(total)
+    ])
+    return list(User.objects.filter(firebase_uid__startswith='bench-user-').order_by('id'))
+
+
+def seed_attempts(users, per_user, batch_size=5000, seed=0):
+    """Bulk insert ``per_user`` distinct question attempts for each user."""
+    rng = random.Random(seed)
+    questions = list(Question.objects.values_list('id', 'subject', 'chapter'))
+    per_user = min(per_user, len(questions))
+    batch = []
+    created = 0
+    for user in users:
+        for question_id, subject, chapter in rng.sample(questions, per_user):
+            selected = rng.randrange(4)
+            batch.append(QuestionAttempt(
+                user=user, question_id=question_id, subject=subject, chapter=chapter,
+                selected_index=selected, is_correct=rng.random() < 0.6,
+            ))
+            if len(batch) >= batch_size:
+                created += len(QuestionAttempt.objects.bulk_create(batch))
+                batch = []
+    created += len(QuestionAttempt.objects.bulk_create(batch))
+    return created
+
+
+def synthetic_reviews(questions, rng):
+    """Per-question review entries shaped like the app's submissions."""
+    reviews = []
+    for question in questions:
+        selected = rng.choice([None, 0, 1, 2, 3])
+        reviews.append({
+            'questionId': question.id,
+            'question': question.question_text,
+            'options': question.options,
+            'selectedIndex': selected,
+            'correctIndex': question.correct_index,
+            'isCorrect': selected == question.correct_index,
+            'timeTaken': rng.randrange(5, 180),
+            'subject': question.subject,
+            'chapter': question.chapter,
+        })
+    return reviews
+
+
+def seed_test_results(users, per_user, questions_per_test=45, seed=0):
+    """Bulk insert test results, with compressed reviews, for each user."""
+    rng = random.Random(seed)
+    pool = list(Question.objects.order_by('?')[:2000])
+    created = 0
+    for user in users:
+        results, reviews = [], []
+        for _ in range(per_user):
+            picked = rng.sample(pool, min(questions_per_test, len(pool)))
+            entries = synthetic_reviews(picked, rng)
+            correct = sum(entry['isCorrect'] for entry in entries)
+            results.append(TestResult(
+                user=user,
+                test_type=rng.choice(['CHAPTER', 'MOCK', 'CUSTOM']),
+                subject=picked[0].subject,
+                chapter=picked[0].chapter,
+                score=correct * 4 - (len(entries) - correct),
+                total_questions=len(entries),
+                correct_answers=correct,
+                time_taken=sum(entry['timeTaken'] for entry in entries),
+            ))
+            reviews.append(entries)
+        # bulk_create skips TestResult.save(), so the side table is filled here
+        results = TestResult.objects.bulk_create(results)
+        TestResultReviews.objects.bulk_create([
+            TestResultReviews(result=result, data=TestResultReviews.pack(entries))
+            for result, entries in zip(results, reviews)
+        ])
+        created += len(results)
+    return created
+
+
+def seed_mock_tests(total, questions_per_test=180, exam_type='NEET', seed=0):
+    """Create ``total`` mock tests, each with ``questions_per_test`` questions."""
+    rng = random.Random(seed)
+    question_ids = list(Question.objects.values_list('id', flat=True))
+    tests = []
+    for n in range(total):
+        test = MockTest.objects.create(
+            title=f'Bench mock test {n}',
+            exam_type=exam_type,
+            duration_minutes=180,
+            total_questions=questions_per_test,
+            subjects=SUBJECTS,
+        )
+        test.questions.set(rng.sample(question_ids, min(questions_per_test, len(question_ids))))
+        tests.append(test)
+    return tests
+
+
+# One request per API route and method, as (method, path, body); placeholders
+# are filled from the rows seed_api_fixtures() creates.
+# Writes that delete come last so earlier requests still find their rows.
+API_REQUESTS = [
+    ('GET', '/api/_health/db/', None),
+    ('GET', '/api/_metrics/', None),
+    ('GET', '/api/users/', None),
+    ('GET', '/api/users/profile/', None),
+    ('GET', '/api/users/{user}/', None),
+    ('POST', '/api/users/', {'firebase_uid': 'check-new', 'email': 'new@example.com', 'name': 'New', 'exam_type': 'NEET'}),
+    ('POST', '/api/users/register/', {'firebase_uid': '{uid}', 'email': 'x@example.com', 'name': 'X'}),
+    ('PATCH', '/api/users/update_profile/', {'name': 'Renamed'}),
+    ('PATCH', '/api/users/{user}/', {'name': 'Renamed again'}),
+    ('PUT', '/api/users/{user}/', {
+        'firebase_uid': '{uid}', 'email': 'put@example.com', 'name': 'Put', 'exam_type': 'NEET',
+    }),
+    ('GET', '/api/questions/?subject={subject}&chapter={chapter}', None),
+    ('GET', '/api/questions/?subject={subject}&limit=20', None),
+    ('GET', '/api/questions/{question}/', None),
+    ('POST', '/api/questions/by_ids/', {'ids': '{questions}'}),
+    ('GET', '/api/questions/chapter_stats/?subject={subject}', None),
+    ('GET', '/api/questions/chapters/?subject={subject}', None),
+    ('GET', '/api/questions/count/?subject={subject}', None),
+    ('GET', '/api/questions/random/?subject={subject}&count=10', None),
+    ('GET', '/api/questions/solved_ids/?subject={subject}&chapter={chapter}', None),
+    ('POST', '/api/questions/submit_answer/', {'question_id': '{question}', 'selected_index': 1, 'is_correct': True}),
+    ('POST', '/api/questions/submit_answer/', {
+        'question_id': '{unseen_question}', 'selected_index': 0, 'is_correct': True,
+    }),
+    ('POST', '/api/questions/submit_answers/', {'answers': '{answers}'}),
+    ('POST', '/api/questions/reset_chapter/', {'subject': '{subject}', 'chapter': '{chapter}'}),
+    ('GET', '/api/mock-tests/', None),
+    ('GET', '/api/mock-tests/{mock_test}/', None),
+    ('GET', '/api/tests/', None),
+    ('GET', '/api/tests/?limit=10', None),
+    ('GET', '/api/tests/history/', None),
+    ('GET', '/api/tests/stats/', None),
+    ('GET', '/api/tests/{result}/', None),
+    ('POST', '/api/tests/', {
+        'test_type': 'CHAPTER', 'subject': '{subject}', 'chapter': '{chapter}', 'score': 8,
+        'total_questions': 3, 'correct_answers': 2, 'time_taken': 90, 'question_reviews': [],
+    }),
+    ('PATCH', '/api/tests/{result}/', {'time_taken': 100}),
+    ('PUT', '/api/tests/{result}/', {
+        'test_type': 'CHAPTER', 'subject': '{subject}', 'chapter': '{chapter}', 'score': 8,
+        'total_questions': 3, 'correct_answers': 2, 'time_taken': 95, 'question_reviews': [],
+    }),
+    ('GET', '/api/progress/', None),
+    ('POST', '/api/progress/', {'subject': '{subject}', 'chapter': 'Other', 'questions_attempted': 1}),
+    ('GET', '/api/progress/{progress}/', None),
+    ('PATCH', '/api/progress/{progress}/', {'questions_attempted': 5}),
+    ('PUT', '/api/progress/{progress}/', {'subject': '{subject}', 'chapter': '{chapter}', 'questions_attempted': 6}),
+    ('GET', '/api/subscriptions/', None),
+    ('GET', '/api/subscriptions/status/', None),
+    ('GET', '/api/subscriptions/{subscription}/', None),
+    ('PATCH', '/api/subscriptions/{subscription}/', {'status': 'ACTIVE'}),
+    ('PUT', '/api/subscriptions/{subscription}/', {
+        'user': '{user}', 'plan': 'DAILY_PRACTICE', 'expires_at': '2099-01-01T00:00:00Z',
+        'payment_id': 'pay_put', 'amount': 249,
+    }),
+    ('POST', '/api/subscriptions/create_order/', {'plan': 'DAILY_PRACTICE'}),
+    ('POST', '/api/subscriptions/verify_payment/', {'plan': 'DAILY_PRACTICE', 'payment_id': 'pay_check'}),
+    ('GET', '/api/plans/', None),
+    ('GET', '/api/plans/{plan}/', None),
+    ('GET', '/api/ads/', None),
+    ('GET', '/api/ads/config/', None),
+    ('GET', '/api/ads/{ad}/', None),
+    ('GET', '/api/daily-practice/questions/?count=25', None),
+    ('GET', '/api/daily-practice/status/', None),
+    ('GET', '/api/daily-practice/history/', None),
+    ('POST', '/api/daily-practice/submit/', {'type': 25, 'score': 40, 'total_questions': 25, 'correct_answers': 12}),
+    ('DELETE', '/api/progress/{progress}/', None),
+    ('DELETE', '/api/tests/{result}/', None),
+    ('DELETE', '/api/subscriptions/{subscription}/', None),
+    ('DELETE', '/api/users/{other_user}/', None),
+]
+
+
+# Requests authenticate as the first seeded user; its bearer token doubles as
+# the metrics token so /api/_metrics/ is reachable with DEBUG off
+BENCH_METRICS_TOKEN = 'bench-user-0'
+
+def fill_placeholders(value, fixtures):
+    """Substitute ``{name}`` placeholders; a whole-string placeholder keeps the fixture's type."""
+    if isinstance(value, dict):
+        return {key: fill_placeholders(item, fixtures) for key, item in value.items()}
+    if isinstance(value, str):
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in fixtures:
+            return fixtures[value[1:-1]]
+        return value.format(**fixtures)
+    return value
+
+
+def seed_api_fixtures(questions=2000, attempts=100):
+    """
+    Seed one row of everything ``API_REQUESTS`` touches.
+
+    Returns the placeholder values for ``fill_placeholders``; ``uid`` is the
+    Firebase UID to authenticate as.
+    """
+    seed_questions(questions)
+    users = seed_users(2)
+    user = users[0]
+    seed_attempts(users, attempts)
+    seed_test_results(users, 5)
+    mock_test = seed_mock_tests(1)[0]
+    # Derived rows the write paths and scheduled jobs would normally maintain
+    build_papers([timezone.now().date()])
+    rebuild_chapter_stats()
+    # The test summary is left unbuilt so the first stats read takes the rebuild path
+    call_command('populate_plans', stdout=io.StringIO())
+    question = Question.objects.order_by('id').first()
+    chapter = list(Question.objects.filter(subject=question.subject, chapter=question.chapter)[:5])
+    # Questions in chapters nobody has attempted, so answers take the counter-insert path
+    unseen = Question.objects.bulk_create([
+        Question(
+            subject=question.subject, chapter=f'Unattempted {n}', difficulty='MEDIUM',
+            question_text=f'Unattempted question {n}', options=['A', 'B', 'C', 'D'], correct_index=0,
+            question_id=f'bench-unseen-{n}',
+        )
+        for n in range(3)
+    ])
+    return {
+        'uid': user.firebase_uid,
+        'user': user.pk,
+        'other_user': users[1].pk,
+        'subject': question.subject,
+        'chapter': question.chapter,
+        'question': question.pk,
+        'questions': [q.pk for q in chapter],
+        'answers': [
+            {'question_id': q.pk, 'selected_index': q.correct_index, 'is_correct': True}
+            for q in chapter + unseen[1:]
+        ],
+        'unseen_question': unseen[0].pk,
+        'mock_test': mock_test.pk,
+        'result': TestResult.objects.filter(user=user).values_list('pk', flat=True).first(),
+        'progress': UserProgress.objects.create(user=user, subject=question.subject, chapter=question.chapter).pk,
+        'subscription': Subscription.objects.create(
+            user=user, plan='DAILY_PRACTICE', expires_at=timezone.now() + timedelta(days=30),
+            payment_id='pay_seed', amount=249,
+        ).pk,
+        'plan': SubscriptionPlan.objects.values_list('pk', flat=True).first(),
+        'ad': AdConfig.objects.create(ad_unit_id='bench', ad_type='BANNER').pk,
+    }
+
+
+def request_within_budget(client, method, path, body):
+    """
+    Make one API request under ``QUERY_BUDGET_MODE='raise'`` and report it.
+
+    The client must be built with ``raise_request_exception=True``. ``ok`` is
+    true when the request succeeded, stayed within its budget and the route
+    has a budget at all.
+    """
+    result = {'method': method, 'path': path, 'status': None, 'queries': None, 'budget': None,
+              'ok': False, 'error': None}
+    try:
+        response = client.generic(
+            method, path, json.dumps(body) if body is not None else '', content_type='application/json',
+        )
+    except QueryBudgetExceeded as e:
+        result['error'] = str(e)
+        return result
+    except Exception as e:
+        result['status'] = 500
+        result['error'] = f'{type(e).__name__}: {e}'
+        return result
+    request = response.wsgi_request
+    result['status'] = response.status_code
+    result['queries'] = getattr(request, '_view_query_count', None)
+    if request.resolver_match is not None:
+        result['budget'] = view_budget(request.resolver_match.func, method)
+    result['ok'] = response.status_code < 400 and result['budget'] is not None
+    if response.status_code >= 400:
+        result['error'] = response.content.decode(errors='replace')[:300]
+    return result
+
+
+def timed(func, repeat):
+    """Run ``func`` ``repeat`` times and return latency stats in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+@contextmanager
+def stub_firebase():
+    """Accept any bearer token; the token itself is the Firebase UID."""
+    original = auth.verify_id_token
+    auth.verify_id_token = lambda token, *args, **kwargs: {'uid': token, 'exp': time.time() + 3600}
+    try:
+        yield
+    finally:
+        auth.verify_id_token = original
+
+
+@contextmanager
+def fake_gateway(latency=0.2):
+    """
+    Serve a minimal Razorpay-compatible order API on localhost.
+
+    Every request waits ``latency`` seconds before answering, standing in for
+    a slow upstream. Yields the base URL; under ``<base URL>/status/<code>``
+    every request is answered with that error status instead, in Razorpay's
+    error format.
+    """
+    counter = iter(range(1, 1 << 62))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(latency)
+            parts = self.path.strip('/').split('/')
+            if parts[0] == 'status':
+                status = int(parts[1])
+                code = 'BAD_REQUEST_ERROR' if status < 500 else 'SERVER_ERROR'
+                body = json.dumps({'error': {'code': code, 'description': f'Fake {status}'}}).encode()
+            else:
+                status = 200
+                body = json.dumps({'id': f'order_fake{next(counter)}', 'status': 'created'}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def summarize(latencies, queries, errors, elapsed):
+    """Latency percentiles, throughput and queries per request for one run."""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else 0.0,
+        'max_queries': max(queries, default=0),
+    }
+
+
+def wsgi_request(handler, method, path, body=b'', headers=None):
+    """Send one request through a ``WSGIHandler``; returns the status code."""
+    environ = RequestFactory().generic(
+        method, path, data=body, content_type='application/json', headers=headers
+    ).environ
+    statuses = []
+    response = handler(environ, lambda status, response_headers: statuses.append(status))
+    for _ in response:
+        pass
+    response.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_request(app, method, path, body=b'', headers=None):
+    """Send one request through an ASGI application; returns the status code."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json')] + [
+            (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    received = False
+    status = {}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # The client never disconnects early
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await app(scope, receive, send)
+    return status['code']
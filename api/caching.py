@@ -0,0 +1,158 @@
+"""
+Cache helpers shared by the API.
+
+Cached values are keyed by a per-namespace version number. Bumping the
+version (from a signal handler or after a bulk write) makes every key built
+from the old version unreachable, so nothing has to be deleted explicitly.
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import timed
+
+
+ACCEPTS_GZIP_RE = re.compile(r'\bgzip\b')
+
+# A rendered response body, stored gzip-compressed
+CachedBody = namedtuple('CachedBody', ['etag', 'content', 'content_type'])
+
+
+def cache_is_shared():
+    """Whether the default cache is seen by every worker process, not just this one."""
+    return settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def get_version(namespace):
+    """Return the current version number for a cache namespace."""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Start from a timestamp so a lost key never reuses an old version
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every value cached under ``namespace``."""
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def make_key(namespace, *parts):
+    """Build a versioned cache key from arbitrary JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{digest}'
+
+
+def compress_body(raw, content_type='application/json'):
+    """Compress a rendered body and derive a strong ETag from its content."""
+    etag = '"%s"' % hashlib.sha1(raw).hexdigest()
+    return CachedBody(etag=etag, content=gzip.compress(raw, compresslevel=6), content_type=content_type)
+
+
+def if_none_match(request, etag):
+    """True if the client already holds ``etag``."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags or etag in [tag.removeprefix('W/') for tag in etags]
+
+
+def serve_cached_body(request, body, cache_control='private, no-cache'):
+    """
+    Serve a ``CachedBody``: 304 when the client's ETag matches, otherwise the
+    stored gzip bytes as-is (or decompressed for clients without gzip support).
+    """
+    if if_none_match(request, body.etag):
+        response = HttpResponseNotModified()
+    elif ACCEPTS_GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = HttpResponse(body.content, content_type=body.content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body.content), content_type=body.content_type)
+    response['ETag'] = body.etag
+    response['Cache-Control'] = cache_control
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Serve rarely-changing viewset responses as cached, pre-rendered bodies.
+
+    Bodies are keyed by the view, action, URL kwargs and query params, plus
+    ``cache_namespace``'s version (bumped by save signals) and a fingerprint
+    of ``cache_models`` (row count and latest ``updated_at``). Clients get an
+    ``ETag`` and a ``304`` when theirs still matches.
+
+    ``list`` and ``retrieve`` are cached when named in ``cache_actions``;
+    custom actions opt in by returning ``self.cached_response(request, build)``.
+    """
+
+    cache_namespace = None
+    cache_models = ()
+    cache_actions = ('list', 'retrieve')
+    cache_control = 'private, no-cache'
+
+    def get_cache_fingerprint(self):
+        key = make_key(self.cache_namespace, 'fingerprint')
+        fingerprint = cache.get(key)
+        if fingerprint is None:
+            fingerprint = []
+            for model in self.cache_models:
+                stats = model.objects.order_by().aggregate(rows=Count('pk'), latest=Max('updated_at'))
+                fingerprint.append([model._meta.label, stats['rows'], stats['latest']])
+            cache.set(key, fingerprint, settings.CATALOG_FINGERPRINT_TTL)
+        return fingerprint
+
+    def get_cache_key(self, request):
+        return make_key(
+            self.cache_namespace, 'response', type(self).__name__, self.action, self.kwargs,
+            sorted(request.query_params.lists()), self.get_cache_fingerprint(),
+        )
+
+    def cached_response(self, request, build):
+        """Serve the cached body, or call ``build()`` and cache its 200 response."""
+        key = self.get_cache_key(request)
+        body = cache.get(key)
+        if body is None:
+            response = build()
+            if response.status_code != 200:
+                return response
+            with timed('serialize'):
+                body = compress_body(JSONRenderer().render(response.data))
+            cache.set(key, body, settings.CATALOG_CACHE_TTL)
+        return serve_cached_body(request, body, self.cache_control)
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.cache_actions:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.cache_actions:
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
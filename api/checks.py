@@ -0,0 +1,87 @@
+"""
+System checks for the API app.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.urls import URLResolver
+
+from .caching import cache_is_shared
+from .query_budget import view_budget
+
+
+QUERY_BUDGET_MODES = ('log', 'raise', 'off')
+
+
+def iter_views(patterns, prefix=''):
+    """``(route, callback)`` for every URL pattern, flattening includes."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            yield prefix + str(pattern.pattern), pattern.callback
+
+
+def missing_budgets():
+    """``[(route, method)]`` of API views that declare no query budget."""
+    from . import urls
+
+    missing = []
+    seen = set()
+    for route, callback in iter_views(urls.urlpatterns):
+        # DRF's browsable API root issues no queries
+        if getattr(callback, 'cls', None) is not None and callback.cls.__name__ == 'APIRootView':
+            continue
+        actions = getattr(callback, 'actions', None)
+        methods = list(actions) if actions else [None]
+        for method in methods:
+            # Format-suffix routes repeat the same view and actions
+            key = (getattr(callback, 'cls', callback), actions and actions[method])
+            if key in seen:
+                continue
+            seen.add(key)
+            if view_budget(callback, method or 'GET') is None:
+                missing.append((route, method.upper() if method else 'ANY'))
+    return missing
+
+
+@register(Tags.urls)
+def check_query_budgets(app_configs, **kwargs):
+    errors = []
+    if settings.QUERY_BUDGET_MODE not in QUERY_BUDGET_MODES:
+        errors.append(Error(
+            f'QUERY_BUDGET_MODE must be one of {", ".join(QUERY_BUDGET_MODES)}.',
+            id='api.E001',
+        ))
+    for route, method in missing_budgets():
+        errors.append(Warning(
+            f'{method} {route} has no query budget.',
+            hint="Add the action to the viewset's query_budgets, or decorate the view with @query_budget.",
+            id='api.W001',
+        ))
+    return errors
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint=(
+            'Payment order de-duplication and its lock live in the cache, so with several workers '
+            'a retried purchase can create a second order. Set CACHE_URL to a shared cache.'
+        ),
+        id='api.W002',
+    )]
+
+
+@register(deploy=True)
+def check_metrics_token(app_configs, **kwargs):
+    if settings.DEBUG or settings.METRICS_TOKEN:
+        return []
+    return [Error(
+        'METRICS_TOKEN is not set, so /api/_metrics/ is disabled.',
+        hint='Set METRICS_TOKEN and send it to the endpoint as "Authorization: Bearer <token>".',
+        id='api.E002',
+    )]
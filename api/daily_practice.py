@@ -0,0 +1,152 @@
+"""
+Daily practice paper generation and serving.
+
+Papers are normally pre-built ahead of time by the ``build_daily_papers``
+command. The request path only reads them; if a paper is missing it is
+built once under a database lock so concurrent first requests cannot race
+on ``unique_together``. Each paper's serialized question list is then kept
+in the cache until the end of its day.
+"""
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .caching import make_key
+from .models import DailyPracticePaper, Question
+from .sampling import question_sampler
+from .serializers import QuestionListSerializer
+
+
+# We need questions from Physics, Chemistry, Botany, Zoology
+SUBJECTS = ['Physics', 'Chemistry', 'Botany', 'Zoology']
+PRACTICE_TYPES = (25, 50)
+
+
+def subject_variants():
+    """Map each lower-cased subject name to the exact spellings stored in the DB."""
+    key = make_key('questions', 'subject-variants')
+    variants = cache.get(key)
+    if variants is None:
+        variants = {}
+        # DISTINCT on the (subject, chapter) index instead of an un-indexable iexact scan
+        for subject in Question.objects.order_by().values_list('subject', flat=True).distinct():
+            variants.setdefault(subject.lower(), []).append(subject)
+        cache.set(key, variants, 3600)
+    return variants
+
+
+def pick_question_ids(day, count):
+    """Deterministically pick ``count`` question IDs spread over the subjects."""
+    # Seed with the date so a rebuilt paper comes out the same
+    seed = int(day.strftime('%Y%m%d'))
+    variants = subject_variants()
+
+    # Let's distribute them roughly equally
+    questions_per_subject = count // len(SUBJECTS)
+    remainder = count % len(SUBJECTS)
+
+    selected_ids = []
+    for i, subject in enumerate(SUBJECTS):
+        names = variants.get(subject.lower())
+        if not names:
+            continue
+        limit = questions_per_subject + (1 if i < remainder else 0)
+        selected_ids.extend(question_sampler.sample_ids(
+            {'subject__in': sorted(names)}, limit, seed=f'{seed}-{subject}'
+        ))
+    return selected_ids
+
+
+def build_papers(days, practice_types=PRACTICE_TYPES):
+    """
+    Create any missing papers for ``days`` in bulk.
+
+    Returns the number of papers created.
+    """
+    existing = set(
+        DailyPracticePaper.objects.filter(
+            date__in=days, practice_type__in=practice_types
+        ).values_list('date', 'practice_type')
+    )
+
+    planned = []
+    for day in days:
+        for practice_type in practice_types:
+            if (day, practice_type) in existing:
+                continue
+            question_ids = pick_question_ids(day, practice_type)
+            if question_ids:
+                planned.append((DailyPracticePaper(date=day, practice_type=practice_type), question_ids))
+
+    if not planned:
+        return 0
+
+    Through = DailyPracticePaper.questions.through
+    with transaction.atomic():
+        papers = DailyPracticePaper.objects.bulk_create([paper for paper, _ in planned])
+        if any(paper.pk is None for paper in papers):
+            # Backend could not return primary keys from the bulk insert
+            saved = {
+                (paper.date, paper.practice_type): paper
+                for paper in DailyPracticePaper.objects.filter(date__in=days, practice_type__in=practice_types)
+            }
+            papers = [saved[(paper.date, paper.practice_type)] for paper in papers]
+        Through.objects.bulk_create(
+            [
+                Through(dailypracticepaper_id=paper.pk, question_id=question_id)
+                for paper, (_, question_ids) in zip(papers, planned)
+                for question_id in question_ids
+            ],
+            batch_size=1000,
+        )
+    return len(papers)
+
+
+def _lock_paper(day, practice_type):
+    """Serialize paper creation for one (date, type) across processes."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s)',
+                [int(day.strftime('%Y%m%d')) * 100 + practice_type]
+            )
+
+
+def get_or_build_paper(day, practice_type):
+    """Return the paper for a day, building it once if it was not pre-generated."""
+    paper = DailyPracticePaper.objects.filter(date=day, practice_type=practice_type).first()
+    if paper is not None:
+        return paper
+
+    try:
+        with transaction.atomic():
+            _lock_paper(day, practice_type)
+            build_papers([day], practice_types=[practice_type])
+    except IntegrityError:
+        # Another process won the race on unique_together; use its paper
+        pass
+    return DailyPracticePaper.objects.filter(date=day, practice_type=practice_type).first()
+
+
+def _seconds_until_end_of(day):
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), dt_timezone.utc)
+    return max(60, int((end - timezone.now()).total_seconds()))
+
+
+def get_paper_questions(day, practice_type):
+    """Serialized questions for a day's paper, cached for the rest of that day."""
+    key = f'daily-paper:{day.isoformat()}:{practice_type}'
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    paper = get_or_build_paper(day, practice_type)
+    if paper is None:
+        return []
+
+    data = list(QuestionListSerializer(paper.questions.all(), many=True).data)
+    cache.set(key, data, _seconds_until_end_of(day))
+    return data
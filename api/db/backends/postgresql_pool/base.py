@@ -0,0 +1,80 @@
+"""
+PostgreSQL backend that borrows connections from a process-wide pool.
+
+Configured through the ``POOL`` key of the database settings:
+``SIZE``, ``MAX_OVERFLOW``, ``TIMEOUT`` (seconds to wait for a free
+connection) and ``RECYCLE`` (maximum connection age in seconds).
+``CONN_HEALTH_CHECKS`` pings a pooled connection before lending it out, so
+connections broken by a database restart are replaced transparently.
+``CONN_MAX_AGE`` should be 0: "closing" a connection returns it to the pool.
+"""
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from api.db.pool import ConnectionPool, PoolTimeout, get_pool
+
+
+# Same value in psycopg2 and psycopg 3
+TRANSACTION_STATUS_IDLE = 0
+
+
+def reset_connection(connection):
+    """Roll back anything left open; False if the connection is unusable."""
+    if connection.closed:
+        return False
+    if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+
+
+def ping_connection(connection):
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    # The ping must not leave a transaction open when autocommit is off
+    return reset_connection(connection)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self, conn_params=None):
+        def create():
+            options = self.settings_dict.get('POOL', {})
+            # Opening uses the stock backend, including its psycopg setup
+            connect = base.DatabaseWrapper(self.settings_dict, self.alias).get_new_connection
+            return ConnectionPool(
+                factory=lambda: connect(conn_params),
+                size=options.get('SIZE', 5),
+                max_overflow=options.get('MAX_OVERFLOW', 10),
+                timeout=options.get('TIMEOUT', 30),
+                recycle=options.get('RECYCLE', 0),
+                reset=reset_connection,
+                ping=ping_connection if self.settings_dict.get('CONN_HEALTH_CHECKS') else None,
+            )
+        return get_pool(self.alias, create if conn_params is not None else None)
+
+    def get_new_connection(self, conn_params):
+        # Normally set while connecting; a pooled connection skips that step
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        try:
+            return self.get_pool(conn_params).getconn()
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self.get_pool()
+        with self.wrap_database_errors:
+            if pool is None:
+                self.connection.close()
+            elif self.in_atomic_block:
+                # Django keeps pointing at a connection closed mid-transaction
+                # until the block exits, so it must not be lent out again
+                pool.discard(self.connection)
+            else:
+                pool.putconn(self.connection)
@@ -0,0 +1,61 @@
+"""
+Per-request database query accounting.
+
+A wrapper installed on every connection counts queries and their time into
+whatever ``QueryStats`` are active in the current context. The stats live
+in a context variable, so they follow a request into ``sync_to_async``
+threads under ASGI. Tracking blocks may nest; outer blocks still see the
+queries run inside inner ones.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+
+_current = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    __slots__ = ('count', 'duration', 'parent', 'statements')
+
+    def __init__(self, parent=None, record_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.parent = parent
+        # Raw SQL of each query, only kept when asked for
+        self.statements = [] if record_sql else None
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        while stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+            if stats.statements is not None:
+                stats.statements.append(sql)
+            stats = stats.parent
+
+
+def install_query_tracker(sender, connection, **kwargs):
+    """``connection_created`` receiver; the wrapper list outlives reconnects."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def track_queries(record_sql=False):
+    """Count queries run inside the block, on any thread it hands work to."""
+    stats = QueryStats(parent=_current.get(), record_sql=record_sql)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
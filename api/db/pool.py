@@ -0,0 +1,206 @@
+"""
+Process-wide database connection pool.
+
+Django opens one connection per thread and, with ``CONN_MAX_AGE``, keeps it
+for the life of that thread. This pool instead lends connections for the
+length of a request and takes them back afterwards. Each process then holds
+at most ``size + max_overflow`` connections, however many threads it runs.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of DB-API connections.
+
+    Up to ``size`` connections are kept open while idle. Another
+    ``max_overflow`` may be opened under load; they are closed when returned
+    once ``size`` idle connections are already held. Callers that find the
+    pool exhausted wait up to ``timeout`` seconds.
+
+    ``factory`` opens a connection, ``reset`` returns a used connection to a
+    clean state (returning False if it cannot) and ``ping`` checks a
+    connection before it is lent out. Connections older than ``recycle``
+    seconds are replaced.
+    """
+
+    def __init__(self, factory, size=5, max_overflow=10, timeout=30.0, recycle=0,
+                 reset=None, ping=None):
+        self.factory = factory
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.reset = reset
+        self.ping = ping
+        self._idle = deque()  # (connection, opened_at)
+        self._opened_at = {}  # id(connection) -> opened_at, for checked-out connections
+        self._open = 0
+        self._cond = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.discards = 0
+        self.peak_open = 0
+
+    def getconn(self):
+        """Borrow a connection, opening one or waiting for one if needed."""
+        while True:
+            connection, opened_at = self._acquire()
+            if connection is None:
+                try:
+                    connection = self.factory()
+                except BaseException:
+                    self._release_slot()
+                    raise
+                opened_at = time.monotonic()
+                with self._cond:
+                    self.connects += 1
+            elif not self._is_fresh(connection, opened_at):
+                self._discard(connection)
+                continue
+            with self._cond:
+                self._opened_at[id(connection)] = opened_at
+            return connection
+
+    def putconn(self, connection):
+        """Give a borrowed connection back."""
+        with self._cond:
+            opened_at = self._opened_at.pop(id(connection), time.monotonic())
+        reusable = self._reset(connection)
+        with self._cond:
+            if reusable and len(self._idle) < self.size:
+                self._idle.append((connection, opened_at))
+                self._cond.notify()
+                return
+        self._discard(connection)
+
+    def discard(self, connection):
+        """Close a borrowed connection instead of returning it."""
+        with self._cond:
+            self._opened_at.pop(id(connection), None)
+        self._discard(connection)
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones are closed when returned)."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'checked_out': self._open - len(self._idle),
+                'peak_open': self.peak_open,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 6),
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'discards': self.discards,
+            }
+
+    def _acquire(self):
+        """Take an idle connection, or reserve a slot to open one (``(None, None)``)."""
+        started = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    connection, opened_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    self.peak_open = max(self.peak_open, self._open)
+                    connection, opened_at = None, None
+                    break
+                now = time.monotonic()
+                if started is None:
+                    started = now
+                    self.waits += 1
+                remaining = self.timeout - (now - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self.wait_time += now - started
+                    raise PoolTimeout(
+                        f'No database connection available within {self.timeout}s '
+                        f'(size={self.size}, max_overflow={self.max_overflow})'
+                    )
+                self._cond.wait(remaining)
+            self.checkouts += 1
+            if started is not None:
+                self.wait_time += time.monotonic() - started
+        return connection, opened_at
+
+    def _is_fresh(self, connection, opened_at):
+        if self.recycle and time.monotonic() - opened_at > self.recycle:
+            return False
+        if self.ping is None:
+            return True
+        try:
+            return self.ping(connection)
+        except Exception:
+            return False
+
+    def _reset(self, connection):
+        if self.reset is None:
+            return True
+        try:
+            return self.reset(connection)
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.discards += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, create=None):
+    """
+    The pool for a database alias in this process.
+
+    Keyed by PID too, so a worker forked after the parent used the database
+    never shares the parent's sockets. ``create`` builds the pool on first use.
+    """
+    key = (alias, os.getpid())
+    pool = _pools.get(key)
+    if pool is None and create is not None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = create()
+    return pool
+
+
+def pool_stats():
+    """``{alias: stats}`` for every pool in this process."""
+    pid = os.getpid()
+    return {alias: pool.stats() for (alias, owner), pool in list(_pools.items()) if owner == pid}
@@ -0,0 +1,71 @@
+"""
+Per-user entitlement snapshots.
+
+A snapshot is computed at most once per request (memoized on the ``User``
+instance) and shared across requests through the Django cache until the
+user's earliest subscription expires or a subscription row changes.
+"""
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Subscription, SubscriptionPlan
+
+
+Entitlements = namedtuple('Entitlements', ['plans', 'features', 'expires_at'])
+
+
+def _cache_key(user_id):
+    return f'entitlements:{user_id}'
+
+
+def compute_entitlements(user):
+    """Build a fresh snapshot from the user's active subscriptions."""
+    now = timezone.now()
+    active = list(
+        Subscription.objects.filter(
+            user_id=user.pk,
+            status='ACTIVE',
+            expires_at__gt=now
+        ).order_by().values_list('plan', 'expires_at')  # Index-only on subscriptions_active_idx
+    )
+    plans = sorted({plan for plan, _ in active})
+
+    features = set()
+    if plans:
+        for plan_features in SubscriptionPlan.objects.filter(key__in=plans).values_list('features', flat=True):
+            features.update(plan_features or [])
+
+    expires_at = min((expires for _, expires in active), default=None)
+    return Entitlements(plans=plans, features=sorted(features), expires_at=expires_at)
+
+
+def get_entitlements(user):
+    """Return the user's snapshot, computing it at most once per request."""
+    snapshot = user.__dict__.get('_entitlements')
+    if snapshot is not None:
+        return snapshot
+
+    key = _cache_key(user.pk)
+    snapshot = cache.get(key)
+    if snapshot is None or (snapshot.expires_at and snapshot.expires_at <= timezone.now()):
+        snapshot = compute_entitlements(user)
+        timeout = settings.ENTITLEMENT_CACHE_TTL
+        if snapshot.expires_at:
+            # Never serve a plan past its expiry
+            remaining = (snapshot.expires_at - timezone.now()).total_seconds()
+            timeout = max(1, min(timeout, int(remaining)))
+        cache.set(key, snapshot, timeout)
+
+    user._entitlements = snapshot
+    return snapshot
+
+
+def invalidate_entitlements(user_id, user=None):
+    """Drop the cached snapshot (and the memoized copy on ``user``, if given)."""
+    cache.delete(_cache_key(user_id))
+    if user is not None:
+        user.__dict__.pop('_entitlements', None)
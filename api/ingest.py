@@ -0,0 +1,257 @@
+"""
+Streaming parsing, normalization and bulk upsert of question bank files.
+"""
+
+import json
+import os
+
+from django.db import transaction
+
+from .caching import bump_version
+from .mock_tests import touch_mock_tests
+from .models import Question
+from .progress import refile_attempts
+
+
+# Columns overwritten when an incoming row matches an existing question_id
+UPSERT_FIELDS = [
+    'question_text', 'subject', 'chapter', 'difficulty', 'options', 'correct_index',
+    'explanation', 'tags', 'image_urls', 'is_pyq', 'year', 'chapter_id', 'subject_id',
+    'is_premium', 'updated_at',
+]
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# Characters that may follow a complete number inside an array
+_AFTER_NUMBER = _WHITESPACE + ',]'
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def iter_json_items(fileobj, chunk_size=1 << 16):
+    """
+    Yield the items of a top-level JSON array without loading the whole file.
+
+    A file holding a single JSON object yields just that object.
+    """
+    buffer = fileobj.read(chunk_size)
+    eof = not buffer
+    pos = 0
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if pos >= len(buffer):
+        return
+    if buffer[pos] != '[':
+        # Single question object
+        while not eof:
+            fill()
+        yield json.loads(buffer[pos:])
+        return
+    pos += 1
+
+    expect_item = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise json.JSONDecodeError('Unterminated array', buffer, pos)
+        char = buffer[pos]
+        if char == ']':
+            return
+        if not expect_item:
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            pos += 1
+            expect_item = True
+            continue
+
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if not eof and (
+            end >= len(buffer)
+            or (_is_number(item) and buffer[end] not in _AFTER_NUMBER)
+        ):
+            # A scalar may have been cut off mid-token ("1" of "1.5"); decode
+            # again with more data
+            fill()
+            continue
+        pos = end
+        expect_item = False
+        yield item
+
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def normalize_question(q_data):
+    """
+    Map one question from the bank's JSON format to ``Question`` field values.
+
+    Raises ``ValueError`` for rows that cannot be stored.
+    """
+    if not isinstance(q_data, dict):
+        raise ValueError('Question must be a JSON object')
+
+    # Extract question data
+    question_text = q_data.get('question') or q_data.get('questionText')
+    options_list = q_data.get('options') or q_data.get('choices', [])
+    if not question_text:
+        raise ValueError('Missing question text')
+    if not isinstance(options_list, list):
+        raise ValueError('Options must be a list')
+
+    # Handle different answer formats
+    correct_index = q_data.get('correctIndex')
+    if correct_index is None:
+        correct_answer = q_data.get('correctAnswer') or q_data.get('answer')
+        if isinstance(correct_answer, int):
+            correct_index = correct_answer
+        else:
+            # Find index of correct answer text
+            try:
+                correct_index = options_list.index(correct_answer)
+            except (ValueError, AttributeError):
+                correct_index = 0  # Default to first option
+
+    question_id = q_data.get('id')
+    return {
+        'question_id': str(question_id) if question_id is not None else None,
+        'question_text': question_text,
+        'subject': q_data.get('subject', 'PHYSICS'),
+        'chapter': q_data.get('chapter', 'Unknown'),
+        'difficulty': (q_data.get('difficulty') or 'MEDIUM').upper(),
+        'options': options_list,
+        'correct_index': int(correct_index),
+        'explanation': q_data.get('explanation', ''),
+        'tags': q_data.get('tags', []),
+        'image_urls': q_data.get('imageUrls', []),
+        'is_pyq': q_data.get('isPYQ', False),
+        'year': q_data.get('year'),
+        'chapter_id': q_data.get('chapterId', ''),
+        'subject_id': q_data.get('subjectId', ''),
+        'is_premium': q_data.get('isPremium', False) or q_data.get('is_premium', False),
+    }
+
+
+def parse_file(path):
+    """
+    Parse and validate a whole file without touching the database.
+
+    Safe to run in a worker process. Returns ``{'path', 'rows', 'errors',
+    'fatal'}`` where ``errors`` lists ``(message, snippet)`` per bad row and
+    ``fatal`` is set when the file itself could not be read.
+    """
+    result = {'path': path, 'rows': [], 'errors': [], 'fatal': None}
+    if not os.path.exists(path):
+        result['fatal'] = f'File not found: {path}'
+        return result
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for q_data in iter_json_items(f):
+                try:
+                    result['rows'].append(normalize_question(q_data))
+                except (ValueError, TypeError, AttributeError) as e:
+                    result['errors'].append((str(e), str(q_data)[:200]))
+    except json.JSONDecodeError as e:
+        result['fatal'] = f'Invalid JSON in {path}: {str(e)}'
+    except Exception as e:
+        result['fatal'] = f'Error processing {path}: {str(e)}'
+    return result
+
+
+def dedupe_rows(rows):
+    """Keep the last row per question_id (rows without an id are all kept)."""
+    by_id = {}
+    anonymous = []
+    for row in rows:
+        if row['question_id'] is None:
+            anonymous.append(row)
+        else:
+            by_id[row['question_id']] = row
+    # Sorted so concurrent imports lock rows in the same order
+    return sorted(by_id.values(), key=lambda row: row['question_id']) + anonymous
+
+
+def upsert_questions(rows):
+    """
+    Insert or update a batch of normalized rows in one transaction.
+
+    Uses ``INSERT ... ON CONFLICT (question_id) DO UPDATE``. Returns
+    ``(created, updated)`` counts.
+    """
+    rows = dedupe_rows(rows)
+    question_ids = [row['question_id'] for row in rows if row['question_id'] is not None]
+
+    with transaction.atomic():
+        existing = {
+            question_id: (subject, chapter)
+            for question_id, subject, chapter in Question.objects.filter(
+                question_id__in=question_ids
+            ).values_list('question_id', 'subject', 'chapter')
+        }
+        Question.objects.bulk_create(
+            [Question(**row) for row in rows],
+            update_conflicts=True,
+            unique_fields=['question_id'],
+            update_fields=UPSERT_FIELDS,
+        )
+        if existing:
+            # Changed questions invalidate the mock test payloads that embed them
+            touch_mock_tests(questions__question_id__in=list(existing))
+            # The upsert skips signals, so refile attempts of moved questions here
+            moved = [
+                row['question_id'] for row in rows
+                if row['question_id'] in existing and existing[row['question_id']] != (row['subject'], row['chapter'])
+            ]
+            if moved:
+                refile_attempts(
+                    Question.objects.filter(question_id__in=moved).values_list('pk', flat=True)
+                )
+
+    return len(rows) - len(existing), len(existing)
+
+
+def finish_import():
+    """Invalidate question-derived caches after bulk writes (which skip signals)."""
+    bump_version('questions')
+
+
+def delete_questions(queryset):
+    """
+    Delete questions and invalidate what embeds them with set-based writes.
+
+    Question deletes have no per-row signal receivers (they cost one
+    UPDATE per row), so every bulk or admin delete goes through here: the
+    mock tests holding any of the questions are touched in one UPDATE
+    before the cascade drops the memberships. Returns the number deleted.
+    """
+    with transaction.atomic():
+        touch_mock_tests(questions__in=queryset)
+        deleted = queryset.delete()[1].get(Question._meta.label, 0)
+    finish_import()
+    return deleted
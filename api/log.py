@@ -0,0 +1,140 @@
+"""
+Structured logging.
+
+Records are written as one JSON object per line. Application code logs an
+event name plus fields::
+
+    log_event(logger, logging.INFO, 'user_registered', user_id=user.pk)
+
+The request thread does little more than build the record: ``QueueHandler``
+snapshots it and hands it to a background thread, which encodes and writes
+it. ``SamplingFilter`` drops a configurable share of each event before it
+is queued, and ``RequestIdFilter`` stamps every record with the id of the
+request that produced it.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+# LogRecord attributes that are not user-supplied fields
+_RESERVED = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'event', 'request_id'}
+
+
+def log_event(logger, level, event, **fields):
+    """Log ``event`` with structured ``fields``; free when the level is off."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'event': event, **fields})
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id (``None`` outside requests)."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep each event with its configured probability.
+
+    ``rates`` maps event names to a rate in ``[0, 1]``; unlisted events use
+    ``default``. Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates=None, default=1.0):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.default = default
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'event', record.msg), self.default)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None) or record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler writing through a background ``QueueListener``.
+
+    The queue is bounded; when the writer falls behind, records are dropped
+    (and counted in ``dropped``) rather than stalling requests.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target, respect_handler_level=True)
+        self.dropped = 0
+        self._pid = None
+        self._start()
+        atexit.register(self.listener.stop)
+
+    def _start(self):
+        # A forked worker inherits the queue but not the listener thread
+        self._pid = os.getpid()
+        self.listener._thread = None
+        self.listener.start()
+
+    def prepare(self, record):
+        # Snapshot what may change after this call returns; formatting
+        # happens on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def dropped_records():
+    """Records dropped by full ``QueueHandler`` queues in this process."""
+    return sum(
+        handler.dropped
+        for logger in [logging.getLogger()] + list(logging.root.manager.loggerDict.values())
+        for handler in getattr(logger, 'handlers', ())
+        if isinstance(handler, QueueHandler)
+    )
@@ -0,0 +1,27 @@
+"""
+Management command to copy subject and chapter from questions onto their attempts.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.progress import backfill_attempt_chapters, rebuild_chapter_stats
+
+
+class Command(BaseCommand):
+    help = 'Fill QuestionAttempt.subject/chapter from Question in primary-key batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Attempts per UPDATE')
+        parser.add_argument(
+            '--rebuild-stats',
+            action='store_true',
+            help='Rebuild UserChapterStats afterwards if any attempt changed'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Backfilling subject/chapter on question attempts...')
+        changed = backfill_attempt_chapters(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated {changed} attempts'))
+        if changed and options['rebuild_stats']:
+            count = rebuild_chapter_stats()
+            self.stdout.write(self.style.SUCCESS(f'Wrote {count} chapter stats rows'))
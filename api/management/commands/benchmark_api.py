@@ -0,0 +1,201 @@
+"""
+Management command to load-test the API hot paths on a synthetic database.
+"""
+
+import json
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone as django_timezone
+
+from api.benchmarking import (
+    CHAPTERS_PER_SUBJECT, SUBJECTS, benchmark_database, seed_attempts, seed_mock_tests, seed_questions,
+    seed_test_results, seed_users, stub_firebase, summarize, wsgi_request,
+)
+from api.daily_practice import build_papers
+from api.db.instrumentation import track_queries
+from api.progress import rebuild_chapter_stats
+from api.test_stats import rebuild_test_stats
+
+
+# Path templates; placeholders are filled per request
+ENDPOINTS = {
+    'questions': '/api/questions/?subject={subject}&chapter={chapter}',
+    'chapter-stats': '/api/questions/chapter_stats/?subject={subject}',
+    'random': '/api/questions/random/?subject={subject}&count=10',
+    'mock-test': '/api/mock-tests/{mock_test}/',
+    'daily-practice': '/api/daily-practice/questions/?count=25',
+    'test-stats': '/api/tests/stats/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and drive the API hot paths with concurrent clients, '
+        'reporting latency percentiles, throughput and queries per request as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=100000, help='Questions to seed')
+        parser.add_argument('--users', type=int, default=50, help='Users to seed')
+        parser.add_argument('--attempts', type=int, default=500, help='Question attempts per user')
+        parser.add_argument('--results', type=int, default=20, help='Test results per user')
+        parser.add_argument('--mock-tests', type=int, default=5, help='Mock tests to seed')
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            choices=sorted(ENDPOINTS),
+            help='Only benchmark this endpoint (repeatable)'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for data and request mix')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+        parser.add_argument('--compare', help='Earlier JSON report to print deltas against')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        self.verbose = not options['json']
+        baseline = self.load_report(options['compare']) if options['compare'] else None
+        names = options['endpoints'] or list(ENDPOINTS)
+
+        with benchmark_database(), stub_firebase(), override_settings(ALLOWED_HOSTS=['*']):
+            fixtures = self.seed(options)
+            # Each endpoint starts from the same cache state, as after a deploy
+            results = {}
+            for name in names:
+                cache.clear()
+                results[name] = self.run_endpoint(name, fixtures, options)
+                if self.verbose:
+                    self.report_line(name, results[name], baseline)
+
+        report = {'meta': self.meta(options), 'endpoints': results}
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        self.log(f"Seeding {options['questions']} questions...")
+        seed_questions(options['questions'], seed=options['seed'])
+        self.log(f"Seeding {options['users']} users with {options['attempts']} attempts "
+                 f"and {options['results']} test results each...")
+        users = seed_users(options['users'])
+        seed_attempts(users, options['attempts'], seed=options['seed'])
+        seed_test_results(users, options['results'], seed=options['seed'])
+        mock_tests = seed_mock_tests(options['mock_tests'], seed=options['seed'])
+        # Derived rows the write paths and scheduled jobs would normally maintain
+        build_papers([django_timezone.now().date()])
+        rebuild_chapter_stats()
+        for user in users:
+            rebuild_test_stats(user.pk)
+        return {
+            'users': [user.firebase_uid for user in users],
+            'mock_tests': [test.pk for test in mock_tests],
+            'rng': rng,
+        }
+
+    def run_endpoint(self, name, fixtures, options):
+        rng = fixtures['rng']
+        # Draw the whole request mix up front so clients only send
+        plan = []
+        for _ in range(options['requests']):
+            subject = rng.choice(SUBJECTS)
+            path = ENDPOINTS[name].format(
+                subject=subject,
+                chapter=f'{subject} Chapter {rng.randrange(CHAPTERS_PER_SUBJECT) + 1}'.replace(' ', '+'),
+                mock_test=rng.choice(fixtures['mock_tests']) if fixtures['mock_tests'] else 0,
+            )
+            plan.append((path, {'Authorization': f"Bearer {rng.choice(fixtures['users'])}"}))
+
+        handler = WSGIHandler()
+        tickets = iter(plan)
+        lock = threading.Lock()
+        latencies, queries, errors = [], [], []
+
+        def client():
+            while True:
+                with lock:
+                    ticket = next(tickets, None)
+                if ticket is None:
+                    break
+                path, headers = ticket
+                started = time.perf_counter()
+                with track_queries() as stats:
+                    status = wsgi_request(handler, 'GET', path, headers=headers)
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(stats.count)
+                    if status >= 400:
+                        errors.append(status)
+            connection.close()
+
+        threads = [threading.Thread(target=client) for _ in range(options['clients'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        result = summarize(latencies, queries, len(errors), elapsed)
+        result['path'] = ENDPOINTS[name]
+        return result
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            **{key: options[key] for key in (
+                'questions', 'users', 'attempts', 'results', 'mock_tests', 'clients', 'requests', 'seed'
+            )},
+        }
+
+    def load_report(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline report {path}: {e}')
+
+    def report_line(self, name, result, baseline):
+        line = (
+            f"{name:15} | {result['requests_per_sec']:>7} req/s | p50 {result['p50_ms']:>8} ms"
+            f" | p95 {result['p95_ms']:>8} ms | p99 {result['p99_ms']:>8} ms"
+            f" | {result['queries_per_request']:>5} queries/req | {result['errors']} errors"
+        )
+        before = (baseline or {}).get('endpoints', {}).get(name)
+        if before:
+            line += (
+                f" | p95 {result['p95_ms'] - before['p95_ms']:+.3f} ms"
+                f", queries/req {result['queries_per_request'] - before['queries_per_request']:+.2f}"
+                f" vs {baseline['meta'].get('commit') or 'baseline'}"
+            )
+        style = self.style.ERROR if result['errors'] else self.style.SUCCESS
+        self.stdout.write(style(line))
+
+    def log(self, message):
+        if self.verbose:
+            self.stdout.write(message)
@@ -0,0 +1,164 @@
+"""
+Management command comparing WSGI and ASGI throughput against a slow upstream.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from api.benchmarking import (
+    asgi_request, benchmark_database, fake_gateway, percentile, stub_firebase, wsgi_request,
+)
+from api.models import User
+
+
+PATH = '/api/subscriptions/create_order/'
+BODY = json.dumps({'plan': 'DAILY_PRACTICE'}).encode()
+
+
+def headers(n):
+    # One user per request, so order idempotency never short-circuits the gateway
+    return {'Authorization': f'Bearer bench-user-{n}'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark create_order under WSGI (sync workers) and ASGI (async views) '
+        'with the same worker count, against a fake gateway with fixed latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Workers per mode')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per mode')
+        parser.add_argument('--concurrency', type=int, default=50, help='In-flight requests per ASGI worker')
+        parser.add_argument('--latency', type=float, default=0.2, help='Gateway latency in seconds')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], help='Internal: run one mode in this process')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            # Child process: settings (and so URL routing) already match the mode
+            self.stdout.write(json.dumps(self.run_mode(options)))
+            return
+
+        results = []
+        with fake_gateway(options['latency']) as gateway_url:
+            for mode in ('wsgi', 'asgi'):
+                results.append(self.spawn(mode, gateway_url, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['mode'].upper():4} | {result['workers']} workers | {result['requests']} requests"
+                f" | {result['errors']} errors | {result['requests_per_sec']} req/s"
+                f" | p50 {result['p50_ms']} ms | p95 {result['p95_ms']} ms"
+            ))
+
+    def spawn(self, mode, gateway_url, options):
+        """Run one mode in a fresh process, since routing is fixed at startup."""
+        env = dict(
+            os.environ,
+            DJANGO_ASYNC_VIEWS=str(mode == 'asgi'),
+            RAZORPAY_BASE_URL=gateway_url,
+        )
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_asgi', '--mode', mode,
+            '--workers', str(options['workers']), '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']), '--latency', str(options['latency']),
+        ]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise CommandError(f'{mode} run failed:\n{completed.stderr}')
+        # Request logging may share stdout; the result is the last line
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def run_mode(self, options):
+        with benchmark_database(), stub_firebase(), override_settings(ALLOWED_HOSTS=['*']):
+            User.objects.bulk_create([
+                User(firebase_uid=f'bench-user-{n}', email=f'bench{n}@example.com', name='Bench')
+                for n in range(options['requests'])
+            ])
+            run = self.run_asgi if options['mode'] == 'asgi' else self.run_wsgi
+            started = time.perf_counter()
+            latencies, statuses = run(options)
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'mode': options['mode'],
+            'workers': options['workers'],
+            'requests': len(latencies),
+            'errors': sum(1 for status in statuses if status != 200),
+            'requests_per_sec': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'upstream_latency_ms': options['latency'] * 1000,
+        }
+
+    def run_wsgi(self, options):
+        """Each worker thread handles one request at a time, like a sync worker."""
+        handler = WSGIHandler()
+        tickets = iter(range(options['requests']))
+        lock = threading.Lock()
+        latencies, statuses = [], []
+
+        def worker():
+            while True:
+                with lock:
+                    n = next(tickets, None)
+                if n is None:
+                    return
+                started = time.perf_counter()
+                status = wsgi_request(handler, 'POST', PATH, BODY, headers(n))
+                with lock:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses.append(status)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, statuses
+
+    def run_asgi(self, options):
+        """Each worker thread runs one event loop with many requests in flight."""
+        tickets = itertools.count()
+        lock = threading.Lock()
+        latencies, statuses = [], []
+
+        async def client(app):
+            while True:
+                with lock:
+                    n = next(tickets)
+                if n >= options['requests']:
+                    return
+                started = time.perf_counter()
+                status = await asgi_request(app, 'POST', PATH, BODY, headers(n))
+                with lock:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses.append(status)
+
+        async def worker():
+            app = get_asgi_application()
+            await asyncio.gather(*(client(app) for _ in range(options['concurrency'])))
+
+        threads = [threading.Thread(target=asyncio.run, args=(worker(),)) for _ in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, statuses
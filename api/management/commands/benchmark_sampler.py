@@ -0,0 +1,62 @@
+"""
+Management command to benchmark random question sampling.
+"""
+
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from api.benchmarking import benchmark_database, seed_questions, timed
+from api.models import Question
+from api.sampling import QuestionSampler
+
+
+class Command(BaseCommand):
+    help = 'Benchmark QuestionSampler against ORDER BY RANDOM() on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10000, 100000, 1000000],
+            help='Table sizes to benchmark'
+        )
+        parser.add_argument('--count', type=int, default=10, help='Questions drawn per call')
+        parser.add_argument('--repeat', type=int, default=20, help='Calls per measurement')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = options['repeat']
+        filters = {'subject': 'Physics'}
+        results = []
+
+        with benchmark_database():
+            seeded = 0
+            for size in sorted(options['sizes']):
+                self.stdout.write(f'Seeding {size} questions...')
+                seeded += seed_questions(size - seeded, seed=size)
+                cache.clear()
+
+                sampler = QuestionSampler()
+                queryset = Question.objects.filter(**filters)
+
+                result = {
+                    'rows': size,
+                    'order_by_random': timed(lambda: list(queryset.order_by('?')[:count]), repeat),
+                    'sampler_cold': timed(lambda: (cache.clear(), sampler.sample(filters, count)), repeat),
+                    'sampler_warm': timed(lambda: sampler.sample(filters, count), repeat),
+                }
+                results.append(result)
+
+                if not options['json']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{size:>9} rows | ORDER BY RANDOM() p50 {result['order_by_random']['p50_ms']} ms"
+                        f" | sampler cold p50 {result['sampler_cold']['p50_ms']} ms"
+                        f" | sampler warm p50 {result['sampler_warm']['p50_ms']} ms"
+                    ))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
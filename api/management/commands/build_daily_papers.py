@@ -0,0 +1,33 @@
+"""
+Management command to pre-generate daily practice papers.
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.daily_practice import build_papers
+
+
+class Command(BaseCommand):
+    help = 'Pre-build daily practice papers for the coming days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Number of days to build, starting at --start')
+        parser.add_argument('--start', type=str, help='First date to build (YYYY-MM-DD, default: today)')
+
+    def handle(self, *args, **options):
+        if options['start']:
+            try:
+                start = date.fromisoformat(options['start'])
+            except ValueError:
+                raise CommandError(f"Invalid --start date: {options['start']}")
+        else:
+            start = timezone.now().date()
+
+        days = [start + timedelta(days=offset) for offset in range(options['days'])]
+        created = build_papers(days)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} papers for {days[0]} .. {days[-1]}' if days else 'Nothing to build'
+        ))
@@ -0,0 +1,56 @@
+"""
+Management command to exercise every API route against its query budget.
+"""
+
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from api.benchmarking import (
+    API_REQUESTS, BENCH_METRICS_TOKEN, benchmark_database, fake_gateway, fill_placeholders, request_within_budget,
+    seed_api_fixtures, stub_firebase,
+)
+from api.checks import missing_budgets
+
+
+class Command(BaseCommand):
+    help = 'Request every API route on a seeded throwaway database and fail if any exceeds its query budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        results = []
+        with benchmark_database(), stub_firebase(), fake_gateway(latency=0) as gateway_url, override_settings(
+            ALLOWED_HOSTS=['*'], METRICS_TOKEN=BENCH_METRICS_TOKEN, QUERY_BUDGET_MODE='raise', RAZORPAY_BASE_URL=gateway_url,
+        ):
+            fixtures = seed_api_fixtures()
+            client = Client(raise_request_exception=True, HTTP_AUTHORIZATION=f"Bearer {fixtures['uid']}")
+            for method, path, body in API_REQUESTS:
+                cache.clear()
+                results.append(request_within_budget(
+                    client, method, fill_placeholders(path, fixtures), fill_placeholders(body, fixtures),
+                ))
+
+        unpinned = missing_budgets()
+        failed = [result for result in results if not result['ok']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({'requests': results, 'unpinned': unpinned}, indent=2))
+        else:
+            for result in results:
+                line = (
+                    f"{result['method']:6} {result['path']:60} {result['status']} "
+                    f"{result['queries']}/{result['budget']} queries"
+                )
+                self.stdout.write(self.style.SUCCESS(line) if result['ok'] else self.style.ERROR(line))
+                if result['error']:
+                    self.stdout.write(result['error'])
+            for route, method in unpinned:
+                self.stdout.write(self.style.WARNING(f'{method} {route} has no query budget'))
+
+        if failed or unpinned:
+            raise CommandError(f'{len(failed)} request(s) failed, {len(unpinned)} route(s) without a budget')
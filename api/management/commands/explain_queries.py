@@ -0,0 +1,123 @@
+"""
+Management command to EXPLAIN the queries behind every API route.
+"""
+
+import json
+import re
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from api.benchmarking import (
+    API_REQUESTS, BENCH_METRICS_TOKEN, benchmark_database, fake_gateway, fill_placeholders, seed_api_fixtures, stub_firebase,
+)
+from api.query_budget import fingerprint
+
+
+# Tables a full scan is expected on, with the reason
+SCAN_ALLOWED = {
+    'users': 'GET /api/users/ lists every user',
+    'subscription_plans': 'catalog of a handful of rows',
+    'ad_configs': 'catalog of a handful of rows',
+    'api_mocktest': 'catalog of tens of rows',
+}
+
+# Plan lines that read a whole table without an index
+SEQ_SCAN_RE = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'^SCAN (\w+)(?: AS \w+)?$'),
+}
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database, request every API route, EXPLAIN each query it ran '
+        'and fail if any plan scans a large table sequentially'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=1000000, help='Questions to seed')
+        parser.add_argument('--attempts', type=int, default=500000, help='Question attempts per seeded user')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SEQ_SCAN_RE:
+            raise CommandError(f'Cannot read {connection.vendor} query plans')
+        verbose = not options['json']
+        results = []
+
+        with benchmark_database(), stub_firebase(), fake_gateway(latency=0) as gateway_url, override_settings(
+            ALLOWED_HOSTS=['*'], METRICS_TOKEN=BENCH_METRICS_TOKEN, QUERY_BUDGET_MODE='off', RAZORPAY_BASE_URL=gateway_url,
+        ):
+            if verbose:
+                self.stdout.write(f"Seeding {options['questions']} questions and "
+                                  f"{options['attempts']} attempts per user...")
+            fixtures = seed_api_fixtures(questions=options['questions'], attempts=options['attempts'])
+            if connection.vendor == 'postgresql':
+                # SQLite plans without statistics, as if every table held ~1M rows
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {fixtures['uid']}")
+            for method, path, body in API_REQUESTS:
+                cache.clear()
+                path = fill_placeholders(path, fixtures)
+                for sql, params in self.capture(client, method, path, fill_placeholders(body, fixtures)):
+                    plan = self.explain(sql, params)
+                    results.append({
+                        'method': method, 'path': path, 'sql': fingerprint(sql), 'plan': plan,
+                        'seq_scans': self.seq_scans(plan),
+                    })
+
+        failed = [result for result in results if result['seq_scans']]
+        if options['json']:
+            self.stdout.write(json.dumps({'queries': results}, indent=2))
+        else:
+            for result in failed:
+                self.stdout.write(self.style.ERROR(
+                    f"{result['method']} {result['path']}: sequential scan of {', '.join(result['seq_scans'])}"
+                ))
+                self.stdout.write(f"  {result['sql']}")
+                for line in result['plan']:
+                    self.stdout.write(f'    {line}')
+            self.stdout.write(f'{len(results)} queries explained, {len(failed)} with sequential scans')
+
+        if failed:
+            raise CommandError(f'{len(failed)} query plan(s) scan a table sequentially')
+
+    def capture(self, client, method, path, body):
+        """Run one request and return the distinct explainable statements it executed."""
+        statements = {}
+
+        def record(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith(EXPLAINABLE):
+                statements.setdefault(fingerprint(sql), (sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = client.generic(
+                method, path, json.dumps(body) if body is not None else '', content_type='application/json',
+            )
+            if response.streaming:
+                # The streamed list runs its query while the body is consumed
+                b''.join(response.streaming_content)
+        return list(statements.values())
+
+    def explain(self, sql, params):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Only a missing index can still produce a Seq Scan, so small
+                # seeded tables do not report scans the planner would pick on cost
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+
+    def seq_scans(self, plan):
+        pattern = SEQ_SCAN_RE[connection.vendor]
+        tables = {match.group(1) for line in plan for match in [pattern.search(line.strip())] if match}
+        return sorted(tables - set(SCAN_ALLOWED))
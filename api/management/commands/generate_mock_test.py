@@ -1,17 +1,28 @@
 import os
-import json
 import random
-from django.core.management.base import BaseCommand
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import transaction
+from api.caching import bump_version
+from api.ingest import finish_import, iter_json_items
+from api.mock_blueprints import BlueprintError, bucket_index, load_blueprint, recent_question_ids, solve_blueprint
 from api.models import Question, MockTest
 
 class Command(BaseCommand):
-    help = 'Generates a full syllabus mock test from JSON question files'
+    help = 'Generates a full syllabus mock test from JSON question files, or from a blueprint over the question DB'
 
     def add_arguments(self, parser):
         parser.add_argument('--count', type=int, default=1, help='Number of mock tests to generate')
+        parser.add_argument('--blueprint', help='Blueprint key (NEET, JEE) or path to a blueprint JSON file; draws from the DB')
+        parser.add_argument('--overlap-window', type=int, default=5, help='Compare against the last K tests of the same exam type')
+        parser.add_argument('--max-overlap', type=float, default=0.1, help='Max fraction of questions shared with those tests')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible selection')
 
     def handle(self, *args, **kwargs):
+        if kwargs['blueprint']:
+            return self.generate_from_blueprint(**kwargs)
+
         count = kwargs['count']
         self.stdout.write(f'Starting generation of {count} mock tests...')
 
@@ -19,15 +30,142 @@ class Command(BaseCommand):
         questions_dir = os.path.join(settings.BASE_DIR, 'questions')
         target_subjects = ['Physics', 'Chemistry', 'Botany', 'Zoology']
         questions_per_subject = 45
-        
-        # Storage for questions
-        subject_questions = {subject: [] for subject in target_subjects}
-        
-        # 1. Load all questions from JSON files
+
+        # 1. Load all questions from JSON files once into an in-memory index
         if not os.path.exists(questions_dir):
             self.stdout.write(self.style.ERROR(f'Questions directory not found: {questions_dir}'))
             return
 
+        index = self._build_index(questions_dir, target_subjects)
+        subject_sizes = {subject: sum(map(len, index[subject].values())) for subject in target_subjects}
+        for subject in target_subjects:
+            self.stdout.write(
+                f'{subject}: {subject_sizes[subject]} questions in {len(index[subject])} chapter/difficulty buckets'
+            )
+
+        # 2. Select random questions for every test up front, spread over the buckets
+        rng = random.Random(kwargs['seed'])
+        planned_tests = []
+        for i in range(count):
+            selected = []
+            for subject in target_subjects:
+                if subject_sizes[subject] < questions_per_subject:
+                    self.stdout.write(self.style.WARNING(f'Not enough questions for {subject}. Taking all {subject_sizes[subject]}.'))
+                selected.extend(self._sample_buckets(index[subject], questions_per_subject, rng))
+
+            if not selected:
+                self.stdout.write(self.style.ERROR(f'No questions selected for test {i+1}. Skipping.'))
+                continue
+            planned_tests.append(selected)
+
+        if not planned_tests:
+            return
+
+        # 3. Resolve every selected question with one IN query plus one bulk insert
+        with transaction.atomic():
+            question_pks = self._resolve_questions([q for selected in planned_tests for q in selected])
+
+            # 4. Create Mock Tests and their question links in bulk
+            mock_tests = MockTest.objects.bulk_create([
+                MockTest(
+                    title=f'Full Syllabus Mock Test {rng.randint(1000, 9999)}',
+                    description='Automatically generated full syllabus mock test covering Physics, Chemistry, Botany, and Zoology.',
+                    exam_type='NEET', # Defaulting to NEET based on subjects
+                    duration_minutes=180, # 3 hours
+                    total_questions=len(selected),
+                    is_featured=False, # Only feature the first one or none
+                    is_premium=False,
+                    subjects=target_subjects
+                )
+                for selected in planned_tests
+            ])
+
+            Through = MockTest.questions.through
+            Through.objects.bulk_create(
+                [
+                    Through(mocktest_id=test.pk, question_id=pk)
+                    for test, selected in zip(mock_tests, planned_tests)
+                    for pk in {question_pks[id(q)] for q in selected}
+                ],
+                batch_size=1000,
+            )
+
+        # Bulk inserts skip model signals
+        finish_import()
+        bump_version('mock-tests')
+
+        for test, selected in zip(mock_tests, planned_tests):
+            self.stdout.write(self.style.SUCCESS(f'Successfully created Mock Test: "{test.title}" (ID: {test.pk}) with {len(selected)} questions.'))
+
+    def generate_from_blueprint(self, **kwargs):
+        try:
+            blueprint = load_blueprint(kwargs['blueprint'])
+        except BlueprintError as e:
+            raise CommandError(str(e))
+
+        exam_type = blueprint.get('exam_type', blueprint.get('key', 'NEET'))
+        target = sum(section['count'] for section in blueprint['subjects'])
+        rng = random.Random(kwargs['seed'])
+        # Recently used questions, extended with each test generated in this run
+        recent = recent_question_ids(exam_type, kwargs['overlap_window'])
+        max_overlap = int(target * kwargs['max_overlap'])
+        # One pass over the question table serves every test in this run
+        index = bucket_index([section['subject'] for section in blueprint['subjects']])
+
+        planned_tests = []
+        for i in range(kwargs['count']):
+            question_ids, report = solve_blueprint(
+                blueprint, rng=rng, avoid=recent, max_overlap=max_overlap, index=index,
+            )
+            for row in report:
+                if row['picked'] < row['requested']:
+                    self.stdout.write(self.style.WARNING(
+                        f"Test {i+1}: only {row['picked']}/{row['requested']} questions available for {row['subject']}."
+                    ))
+            if not question_ids:
+                self.stdout.write(self.style.ERROR(f'No questions selected for test {i+1}. Skipping.'))
+                continue
+            planned_tests.append(question_ids)
+            recent.update(question_ids)
+
+        if not planned_tests:
+            return
+
+        subjects = [section['subject'] for section in blueprint['subjects']]
+        with transaction.atomic():
+            mock_tests = MockTest.objects.bulk_create([
+                MockTest(
+                    title=f"{blueprint.get('title', exam_type + ' Mock Test')} {rng.randint(1000, 9999)}",
+                    description=blueprint.get('description', ''),
+                    exam_type=exam_type,
+                    duration_minutes=blueprint.get('duration_minutes', 180),
+                    total_questions=len(question_ids),
+                    is_featured=False,
+                    is_premium=blueprint.get('is_premium', False),
+                    subjects=subjects,
+                )
+                for question_ids in planned_tests
+            ])
+            Through = MockTest.questions.through
+            Through.objects.bulk_create(
+                [
+                    Through(mocktest_id=test.pk, question_id=pk)
+                    for test, question_ids in zip(mock_tests, planned_tests)
+                    for pk in question_ids
+                ],
+                batch_size=1000,
+            )
+
+        # Bulk inserts skip model signals
+        bump_version('mock-tests')
+
+        for test, question_ids in zip(mock_tests, planned_tests):
+            self.stdout.write(self.style.SUCCESS(f'Successfully created Mock Test: "{test.title}" (ID: {test.pk}) with {len(question_ids)} questions.'))
+
+    def _build_index(self, questions_dir, target_subjects):
+        """Read every JSON file once: {subject: {(chapter, difficulty): [q_data, ...]}}."""
+        index = {subject: defaultdict(list) for subject in target_subjects}
+
         json_files = [f for f in os.listdir(questions_dir) if f.endswith('.json')]
         self.stdout.write(f'Found {len(json_files)} JSON files.')
 
@@ -35,92 +173,87 @@ class Command(BaseCommand):
             file_path = os.path.join(questions_dir, filename)
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # Handle both list of questions and object with 'questions' key
-                    questions_list = []
-                    if isinstance(data, list):
-                        questions_list = data
-                    elif isinstance(data, dict) and 'questions' in data:
-                        questions_list = data['questions']
-                    
-                    for q_data in questions_list:
-                        # Normalize subject
-                        subject = q_data.get('subject', '')
-                        # Map sub-subjects if necessary (e.g., Organic Chemistry -> Chemistry)
-                        if 'Physics' in subject: subject = 'Physics'
-                        elif 'Chemistry' in subject: subject = 'Chemistry'
-                        elif 'Botany' in subject: subject = 'Botany'
-                        elif 'Zoology' in subject: subject = 'Zoology'
-                        elif 'Biology' in subject:
-                            pass
-                        
-                        if subject in target_subjects:
-                            subject_questions[subject].append(q_data)
-                            
+                    for item in iter_json_items(f):
+                        # Handle both list of questions and object with 'questions' key
+                        questions_list = item['questions'] if isinstance(item, dict) and 'questions' in item else [item]
+                        for q_data in questions_list:
+                            if not isinstance(q_data, dict):
+                                continue
+                            subject = self._canonical_subject(q_data.get('subject', ''))
+                            if subject in index:
+                                bucket = (q_data.get('chapter', 'Unknown'), (q_data.get('difficulty') or 'MEDIUM').upper())
+                                index[subject][bucket].append(q_data)
+
             except Exception as e:
                 self.stdout.write(self.style.WARNING(f'Error reading {filename}: {e}'))
 
-        # Loop for number of tests
-        for i in range(count):
-            self.stdout.write(f'Generating test {i+1}/{count}...')
-            
-            # 2. Select random questions and save to DB
-            selected_questions = []
-            
-            for subject in target_subjects:
-                available = subject_questions[subject]
-                available_count = len(available)
-                
-                if available_count < questions_per_subject:
-                    self.stdout.write(self.style.WARNING(f'Not enough questions for {subject}. Taking all {available_count}.'))
-                    selected = available
-                else:
-                    selected = random.sample(available, questions_per_subject)
-                
-                # Save/Get questions in DB
-                for q_data in selected:
-                    question_obj = self._get_or_create_question(q_data)
-                    selected_questions.append(question_obj)
-
-            # 3. Create Mock Test
-            if not selected_questions:
-                self.stdout.write(self.style.ERROR('No questions selected. Skipping.'))
-                continue
+        return index
 
-            mock_test = MockTest.objects.create(
-                title=f'Full Syllabus Mock Test {random.randint(1000, 9999)}',
-                description='Automatically generated full syllabus mock test covering Physics, Chemistry, Botany, and Zoology.',
-                exam_type='NEET', # Defaulting to NEET based on subjects
-                duration_minutes=180, # 3 hours
-                total_questions=len(selected_questions),
-                is_featured=False, # Only feature the first one or none
-                is_premium=False,
-                subjects=target_subjects
-            )
-            
-            mock_test.questions.set(selected_questions)
-            mock_test.save()
+    @staticmethod
+    def _sample_buckets(buckets, k, rng):
+        """
+        Draw ``k`` questions with each chapter/difficulty bucket giving its
+        proportional share, so a test mirrors the corpus mix.
+        """
+        total = sum(map(len, buckets.values()))
+        if total <= k:
+            return [q for bucket in buckets.values() for q in bucket]
+        shares = {key: k * len(bucket) / total for key, bucket in buckets.items()}
+        counts = {key: int(share) for key, share in shares.items()}
+        # The picks lost to rounding down go to the largest remainders, ties at random
+        leftover = k - sum(counts.values())
+        ranked = sorted(shares, key=lambda key: (shares[key] - counts[key], rng.random()), reverse=True)
+        for key in ranked[:leftover]:
+            counts[key] += 1
+        return [q for key, bucket in buckets.items() for q in rng.sample(bucket, counts[key])]
+
+    @staticmethod
+    def _canonical_subject(subject):
+        # Map sub-subjects if necessary (e.g., Organic Chemistry -> Chemistry)
+        if 'Physics' in subject: return 'Physics'
+        elif 'Chemistry' in subject: return 'Chemistry'
+        elif 'Botany' in subject: return 'Botany'
+        elif 'Zoology' in subject: return 'Zoology'
+        return subject
+
+    def _resolve_questions(self, selected):
+        """Map each selected q_data (by object identity) to a Question primary key."""
+        question_ids = {str(q['id']) for q in selected if q.get('id') is not None}
+        existing = dict(
+            Question.objects.filter(question_id__in=question_ids).values_list('question_id', 'id')
+        )
+
+        to_create = {}
+        anonymous = {}  # JSON rows without an id get one new Question each
+        for q_data in selected:
+            question_id = q_data.get('id')
+            if question_id is None:
+                anonymous[id(q_data)] = q_data
+            elif str(question_id) not in existing and str(question_id) not in to_create:
+                to_create[str(question_id)] = q_data
+
+        created = Question.objects.bulk_create(
+            [self._build_question(q) for q in to_create.values()] +
+            [self._build_question(q) for q in anonymous.values()],
+            batch_size=1000,
+        )
+        # PostgreSQL and SQLite >= 3.35 return primary keys from bulk inserts
+        existing.update((q.question_id, q.pk) for q in created[:len(to_create)])
 
-            self.stdout.write(self.style.SUCCESS(f'Successfully created Mock Test: "{mock_test.title}" (ID: {mock_test.id}) with {mock_test.questions.count()} questions.'))
+        pks = {key: q.pk for key, q in zip(anonymous, created[len(to_create):])}
+        for q_data in selected:
+            if q_data.get('id') is not None:
+                pks[id(q_data)] = existing[str(q_data['id'])]
+        return pks
 
-    def _get_or_create_question(self, data):
-        """Helper to create question object from JSON data."""
+    def _build_question(self, data):
+        """Helper to build (unsaved) question object from JSON data."""
         # Map JSON keys to Model fields
         # JSON: id, question, options, correctIndex, difficulty, explanation, subject, chapter, tags...
         # Model: question_id, question_text, options, correct_index, difficulty, explanation, subject, chapter...
-        
         question_id = data.get('id')
-        
-        # Try to find existing question
-        if question_id:
-            existing = Question.objects.filter(question_id=question_id).first()
-            if existing:
-                return existing
-
-        # Create new
-        return Question.objects.create(
-            question_id=question_id,
+        return Question(
+            question_id=str(question_id) if question_id is not None else None,
             question_text=data.get('question', ''),
             options=data.get('options', []),
             correct_index=data.get('correctIndex', 0),
@@ -0,0 +1,161 @@
+"""
+Management command to check that database connections stay bounded under load.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper as PlainPostgresWrapper
+from django.test import RequestFactory
+
+from api.benchmarking import percentile
+from api.db.pool import pool_stats
+
+
+BACKENDS_SQL = (
+    'SELECT count(*) FROM pg_stat_activity '
+    'WHERE datname = current_database() AND pid <> pg_backend_pid()'
+)
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent requests and report peak PostgreSQL connections against the pool bound'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=50, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per client')
+        parser.add_argument('--path', default='/api/_health/db/', help='Endpoint to request')
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server (e.g. http://127.0.0.1:8000); '
+                 'by default requests go through an in-process WSGI handler'
+        )
+        parser.add_argument(
+            '--max-connections',
+            type=int,
+            help='Expected bound on server connections (default: pool SIZE + MAX_OVERFLOW, '
+                 'which is right for a single in-process run)'
+        )
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        settings_dict = connections['default'].settings_dict
+        pool = settings_dict.get('POOL')
+        bound = options['max_connections']
+        if bound is None and pool:
+            bound = pool['SIZE'] + pool['MAX_OVERFLOW']
+
+        monitor = self.open_monitor(settings_dict)
+        baseline = self.count_backends(monitor)
+        samples = []
+        stop = threading.Event()
+
+        def sample():
+            while not stop.is_set():
+                samples.append(self.count_backends(monitor) - baseline)
+                time.sleep(0.05)
+
+        send = self.remote_sender(options['url']) if options['url'] else self.local_sender()
+        latencies = []
+        errors = []
+
+        def client(_):
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                try:
+                    status = send(options['path'])
+                    if status >= 500:
+                        errors.append(status)
+                except Exception as e:
+                    errors.append(str(e))
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        sampler = threading.Thread(target=sample, daemon=True) if monitor else None
+        if sampler:
+            sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            list(executor.map(client, range(options['threads'])))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        if sampler:
+            sampler.join()
+            monitor.close()
+
+        latencies.sort()
+        peak = max(samples) if samples else None
+        result = {
+            'engine': settings_dict['ENGINE'],
+            'threads': options['threads'],
+            'requests': len(latencies),
+            'errors': len(errors),
+            'requests_per_sec': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'peak_connections': peak,
+            'connection_bound': bound,
+            'bounded': None if peak is None or bound is None else peak <= bound,
+            # Only meaningful for in-process runs; see /api/_health/db/ on a server
+            'pool': pool_stats(),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        self.stdout.write(
+            f"{result['requests']} requests from {result['threads']} threads, "
+            f"{result['errors']} errors, {result['requests_per_sec']} req/s, "
+            f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms"
+        )
+        if peak is None:
+            self.stdout.write(self.style.WARNING('Connection counts need PostgreSQL; only latencies were measured.'))
+        elif result['bounded'] is False:
+            self.stdout.write(self.style.ERROR(f'Peak {peak} connections exceeded the bound of {bound}.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Peak {peak} connections (bound {bound}).'))
+        for alias, stats in result['pool'].items():
+            self.stdout.write(f'Pool {alias}: {stats}')
+
+    def open_monitor(self, settings_dict):
+        """A connection outside the pool for watching pg_stat_activity."""
+        if connections['default'].vendor != 'postgresql':
+            return None
+        monitor = PlainPostgresWrapper({**settings_dict, 'CONN_MAX_AGE': 0}, alias='__load_test_monitor__')
+        monitor.ensure_connection()
+        return monitor
+
+    def count_backends(self, monitor):
+        if monitor is None:
+            return 0
+        with monitor.cursor() as cursor:
+            cursor.execute(BACKENDS_SQL)
+            return cursor.fetchone()[0]
+
+    def remote_sender(self, base_url):
+        def send(path):
+            with urlopen(base_url.rstrip('/') + path, timeout=30) as response:
+                response.read()
+                return response.status
+        return send
+
+    def local_sender(self):
+        # Full request cycle, including the request_finished signal that hands
+        # the thread's connection back
+        handler = WSGIHandler()
+        factory = RequestFactory()
+
+        def send(path):
+            statuses = []
+            response = handler(factory.get(path).environ, lambda status, headers: statuses.append(status))
+            for _ in response:
+                pass
+            response.close()
+            return int(statuses[0].split()[0])
+        return send
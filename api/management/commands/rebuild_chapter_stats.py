@@ -0,0 +1,27 @@
+"""
+Management command to rebuild per-user chapter counters from question attempts.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.progress import rebuild_chapter_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild UserChapterStats from QuestionAttempt'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only rebuild counters for this user ID (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        scope = f'{len(user_ids)} user(s)' if user_ids else 'all users'
+        self.stdout.write(f'Rebuilding chapter stats for {scope}...')
+        count = rebuild_chapter_stats(user_ids=user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} chapter stats rows'))
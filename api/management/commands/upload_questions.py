@@ -2,9 +2,17 @@
 Management command to bulk upload questions from JSON files.
 """
 
+import itertools
 import json
+import multiprocessing
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
 from django.core.management.base import BaseCommand
+from api.ingest import delete_questions, finish_import, iter_json_items, normalize_question, parse_file, upsert_questions
 from api.models import Question
 
 
@@ -23,92 +31,181 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing questions before uploading'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows upserted per transaction'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parse and validate files in this many processes; one writer does the upserts'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only parse and validate (on all cores unless --workers is given); write nothing'
+        )
 
     def handle(self, *args, **options):
+        if options['dry_run']:
+            workers = options['workers'] if options['workers'] > 1 else (os.cpu_count() or 1)
+            return self.validate(options['json_files'], workers)
+
         if options['clear']:
-            count = Question.objects.all().count()
-            Question.objects.all().delete()
+            count = delete_questions(Question.objects.all())
             self.stdout.write(self.style.WARNING(f'Deleted {count} existing questions'))
 
-        total_created = 0
-        total_updated = 0
-        total_errors = 0
+        self.batch_size = max(1, options['batch_size'])
+        self.total_created = 0
+        self.total_updated = 0
+        self.total_errors = 0
+        started = time.perf_counter()
+
+        if options['workers'] > 1:
+            self.upload_parallel(options['json_files'], options['workers'])
+        else:
+            self.upload_sequential(options['json_files'])
 
-        for json_file in options['json_files']:
+        # Bulk writes skip model signals, so invalidate caches once at the end
+        finish_import()
+
+        # Summary
+        total = self.total_created + self.total_updated
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'\n=== Summary ==='))
+        self.stdout.write(self.style.SUCCESS(f'Created: {self.total_created}'))
+        self.stdout.write(self.style.SUCCESS(f'Updated: {self.total_updated}'))
+        if self.total_errors > 0:
+            self.stdout.write(self.style.ERROR(f'Errors: {self.total_errors}'))
+        self.stdout.write(self.style.SUCCESS(f'Total processed: {total}'))
+        self.stdout.write(self.style.SUCCESS(f'Throughput: {self.rate(total, elapsed)} rows/s'))
+
+    def upload_sequential(self, json_files):
+        """Stream each file in turn, upserting as batches fill up."""
+        for json_file in json_files:
             if not os.path.exists(json_file):
                 self.stdout.write(self.style.ERROR(f'File not found: {json_file}'))
                 continue
 
             self.stdout.write(f'Processing {json_file}...')
+            file_started = time.perf_counter()
+            rows = 0
 
             try:
                 with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                # Handle both single question and array of questions
-                questions = data if isinstance(data, list) else [data]
-
-                for q_data in questions:
-                    try:
-                        # Extract question data
-                        question_text = q_data.get('question') or q_data.get('questionText')
-                        options_list = q_data.get('options') or q_data.get('choices', [])
-                        
-                        # Handle different answer formats
-                        correct_index = q_data.get('correctIndex')
-                        if correct_index is None:
-                            correct_answer = q_data.get('correctAnswer') or q_data.get('answer')
-                            if isinstance(correct_answer, int):
-                                correct_index = correct_answer
-                            else:
-                                # Find index of correct answer text
-                                try:
-                                    correct_index = options_list.index(correct_answer)
-                                except (ValueError, AttributeError):
-                                    correct_index = 0  # Default to first option
-
-                        # Create or update question
-                        question, created = Question.objects.update_or_create(
-                            question_id=q_data.get('id'),
-                            defaults={
-                                'question_text': question_text,
-                                'subject': q_data.get('subject', 'PHYSICS'),
-                                'chapter': q_data.get('chapter', 'Unknown'),
-                                'difficulty': q_data.get('difficulty', 'MEDIUM').upper(),
-                                'options': options_list,
-                                'correct_index': correct_index,
-                                'explanation': q_data.get('explanation', ''),
-                                'tags': q_data.get('tags', []),
-                                'image_urls': q_data.get('imageUrls', []),
-                                'is_pyq': q_data.get('isPYQ', False),
-                                'year': q_data.get('year'),
-                                'chapter_id': q_data.get('chapterId', ''),
-                                'subject_id': q_data.get('subjectId', ''),
-                                'is_premium': q_data.get('isPremium', False) or q_data.get('is_premium', False),
-                            }
-                        )
-
-                        if created:
-                            total_created += 1
-                        else:
-                            total_updated += 1
-
-                    except Exception as e:
-                        total_errors += 1
-                        self.stdout.write(self.style.ERROR(f'Error processing question: {str(e)}'))
-                        self.stdout.write(self.style.ERROR(f'Question data: {q_data}'))
+                    batch = []
+                    for q_data in iter_json_items(f):
+                        try:
+                            batch.append(normalize_question(q_data))
+                        except (ValueError, TypeError, AttributeError) as e:
+                            self.total_errors += 1
+                            self.stdout.write(self.style.ERROR(f'Error processing question: {str(e)}'))
+                            self.stdout.write(self.style.ERROR(f'Question data: {str(q_data)[:200]}'))
+                            continue
+
+                        if len(batch) >= self.batch_size:
+                            rows += self.flush(batch)
+                            batch = []
+                    if batch:
+                        rows += self.flush(batch)
 
             except json.JSONDecodeError as e:
                 self.stdout.write(self.style.ERROR(f'Invalid JSON in {json_file}: {str(e)}'))
-                total_errors += 1
+                self.total_errors += 1
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'Error processing {json_file}: {str(e)}'))
-                total_errors += 1
-
-        # Summary
-        self.stdout.write(self.style.SUCCESS(f'\n=== Summary ==='))
-        self.stdout.write(self.style.SUCCESS(f'Created: {total_created}'))
-        self.stdout.write(self.style.SUCCESS(f'Updated: {total_updated}'))
-        if total_errors > 0:
-            self.stdout.write(self.style.ERROR(f'Errors: {total_errors}'))
-        self.stdout.write(self.style.SUCCESS(f'Total processed: {total_created + total_updated}'))
+                self.total_errors += 1
+
+            elapsed = time.perf_counter() - file_started
+            self.stdout.write(f'  {rows} rows in {elapsed:.2f}s ({self.rate(rows, elapsed)} rows/s)')
+
+    def parsed_files(self, json_files, workers):
+        """
+        Yield ``parse_file`` results in argument order, parsed by a process pool.
+
+        At most ``workers * 2`` files are in flight, so parsed rows waiting
+        for the writer never hold more than that many files in memory.
+        """
+        # Spawned, not forked: a fork would copy the logging listener's lock
+        # state and this process's open DB connections into every worker
+        context = multiprocessing.get_context('spawn')
+        paths = iter(json_files)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+            pending = deque(pool.submit(parse_file, path) for path in itertools.islice(paths, workers * 2))
+            while pending:
+                result = pending.popleft().result()
+                path = next(paths, None)
+                if path is not None:
+                    pending.append(pool.submit(parse_file, path))
+                yield result
+
+    def report_parse_errors(self, result):
+        if result['fatal']:
+            self.total_errors += 1
+            self.stdout.write(self.style.ERROR(result['fatal']))
+        for message, snippet in result['errors']:
+            self.total_errors += 1
+            self.stdout.write(self.style.ERROR(f'Error processing question: {message}'))
+            self.stdout.write(self.style.ERROR(f'Question data: {snippet}'))
+
+    def upload_parallel(self, json_files, workers):
+        """Parse files on ``workers`` cores and upsert from this single writer."""
+        self.stdout.write(f'Parsing {len(json_files)} files with {workers} workers...')
+        batch = []
+        for result in self.parsed_files(json_files, workers):
+            self.report_parse_errors(result)
+            if not result['fatal']:
+                self.stdout.write(f"Parsed {result['path']}: {len(result['rows'])} rows")
+            for row in result['rows']:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+        if batch:
+            self.flush(batch)
+
+    def validate(self, json_files, workers):
+        """--dry-run: parse and validate every file, report, write nothing."""
+        self.total_errors = 0
+        started = time.perf_counter()
+        self.stdout.write(f'Validating {len(json_files)} files with {workers} workers (dry run)...')
+
+        valid = 0
+        seen = set()
+        duplicates = 0
+        for result in self.parsed_files(json_files, workers):
+            self.report_parse_errors(result)
+            valid += len(result['rows'])
+            for row in result['rows']:
+                if row['question_id'] is None:
+                    continue
+                if row['question_id'] in seen:
+                    duplicates += 1
+                seen.add(row['question_id'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'\n=== Dry run ==='))
+        self.stdout.write(self.style.SUCCESS(f'Valid rows: {valid}'))
+        self.stdout.write(self.style.SUCCESS(f'Duplicate question ids: {duplicates}'))
+        if self.total_errors > 0:
+            self.stdout.write(self.style.ERROR(f'Errors: {self.total_errors}'))
+        self.stdout.write(self.style.SUCCESS(f'Throughput: {self.rate(valid, elapsed)} rows/s'))
+
+    def flush(self, batch):
+        """Upsert one batch; a failing batch is reported and skipped."""
+        try:
+            created, updated = upsert_questions(batch)
+        except Exception as e:
+            self.total_errors += 1
+            self.stdout.write(self.style.ERROR(f'Error upserting batch of {len(batch)} rows: {str(e)}'))
+            return 0
+        self.total_created += created
+        self.total_updated += updated
+        return created + updated
+
+    @staticmethod
+    def rate(rows, elapsed):
+        return int(rows / elapsed) if elapsed > 0 else rows
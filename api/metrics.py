@@ -0,0 +1,174 @@
+"""
+In-process request metrics.
+
+``PerformanceMiddleware`` times each request and splits the time into
+phases: ``auth`` (the Firebase middleware), ``db`` (all queries) and
+``serialize`` (rendering the response body). Phases may overlap: the
+user lookup counts towards both ``auth`` and ``db``. The split goes into a
+``Server-Timing`` header and into per-route histograms, which
+``/api/_metrics/`` serves in Prometheus text format.
+
+Metrics are per process: with several gunicorn workers, each scrape sees
+whichever worker answered. Scrape each worker, or aggregate upstream.
+"""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from rest_framework.renderers import JSONRenderer
+
+
+# Request duration buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ('auth', 'db', 'serialize')
+
+_timings = contextvars.ContextVar('phase_timings', default=None)
+
+
+@contextmanager
+def timed(phase):
+    """Add the block's wall time to ``phase`` of the current request, if any."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - started
+
+
+@contextmanager
+def collect_timings():
+    """Collect ``timed`` phases for the duration of a request."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class RouteMetrics:
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.errors = 0
+
+
+class MetricsRegistry:
+    """Per-route request metrics, shared by all threads of the process."""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, duration, timings, queries, status):
+        with self._lock:
+            metrics = self._routes.get(route)
+            if metrics is None:
+                metrics = self._routes[route] = RouteMetrics()
+            metrics.duration.observe(duration)
+            for phase, seconds in timings.items():
+                metrics.phases[phase] = metrics.phases.get(phase, 0.0) + seconds
+            metrics.queries += queries
+            if status >= 500:
+                metrics.errors += 1
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        """The registry in Prometheus text exposition format."""
+        lines = [
+            '# HELP api_request_duration_seconds Request wall time by route.',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            routes = sorted(self._routes.items())
+            for route, metrics in routes:
+                for bound, total in metrics.duration.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'api_request_duration_seconds_bucket{{route="{route}",le="{le}"}} {total}')
+                lines.append(f'api_request_duration_seconds_sum{{route="{route}"}} {metrics.duration.sum!r}')
+                lines.append(f'api_request_duration_seconds_count{{route="{route}"}} {metrics.duration.count}')
+
+            lines += [
+                '# HELP api_request_phase_seconds_total Request time spent per phase, by route.',
+                '# TYPE api_request_phase_seconds_total counter',
+            ]
+            for route, metrics in routes:
+                for phase, seconds in sorted(metrics.phases.items()):
+                    lines.append(f'api_request_phase_seconds_total{{route="{route}",phase="{phase}"}} {seconds!r}')
+
+            lines += [
+                '# HELP api_request_db_queries_total Database queries by route.',
+                '# TYPE api_request_db_queries_total counter',
+            ]
+            lines += [f'api_request_db_queries_total{{route="{route}"}} {m.queries}' for route, m in routes]
+
+            lines += [
+                '# HELP api_request_errors_total Responses with a 5xx status by route.',
+                '# TYPE api_request_errors_total counter',
+            ]
+            lines += [f'api_request_errors_total{{route="{route}"}} {m.errors}' for route, m in routes]
+        return lines
+
+
+registry = MetricsRegistry()
+
+
+def metric_lines(name, kind, help_text, samples):
+    """Prometheus lines for one metric; ``samples`` is ``[(labels, value)]``."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+    return lines
+
+
+def server_timing(duration, timings, queries):
+    """``Server-Timing`` header value; durations are in milliseconds."""
+    parts = [f'app;dur={duration * 1000:.2f}']
+    for phase in PHASES:
+        if phase in timings:
+            desc = f';desc="{queries} queries"' if phase == 'db' else ''
+            parts.append(f'{phase};dur={timings[phase] * 1000:.2f}{desc}')
+    return ', '.join(parts)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer that reports its time as the ``serialize`` phase."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -2,11 +2,31 @@
 Firebase authentication middleware for Django.
 """
 
+import logging
+import time
+import uuid
+
 import firebase_admin
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from firebase_admin import credentials, auth
 from django.conf import settings
 from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from .db.instrumentation import track_queries
+from .log import log_event, request_id
+from .metrics import collect_timings, registry, server_timing, timed
 from .models import User
+from .offload import run_blocking
+from .token_cache import token_cache
+from .user_cache import fetch_user, get_cached_user, remember_user
+
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger('api.request')
+
+
+# Methods that may use the cached user row; writes read it from the DB
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
 
 # Initialize Firebase Admin SDK
@@ -16,59 +36,246 @@ if settings.FIREBASE_CREDENTIALS_PATH:
 
 
 class FirebaseAuthenticationMiddleware:
-    """Middleware to authenticate requests using Firebase tokens."""
+    """
+    Middleware to authenticate requests using Firebase tokens.
+    
+    Runs natively under both WSGI and ASGI. In async mode the token check
+    (which may fetch Google's signing keys) runs on the bounded blocking-I/O
+    pool and the user lookup on Django's database thread, so the event loop
+    is never blocked.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    # Skip authentication for admin, static files, and public endpoints
+    skip_paths = [
+        '/admin/',
+        '/static/',
+        '/api/users/register/',
+        '/api/_health/',
+        '/api/_metrics/',
+    ]
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
     
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
+        token, error = self.bearer_token(request)
+        if error is not None:
+            return error
+        if token is None:
+            return self.get_response(request)
+        
+        try:
+            with timed('auth'):
+                cached = token_cache.get(token)
+                if cached is not None:
+                    decoded_token, user_pk = cached
+                else:
+                    # Verify Firebase token
+                    decoded_token, user_pk = auth.verify_id_token(token), None
+                error = self.attach_user(request, token, decoded_token, user_pk)
+        except Exception as e:
+            return self.token_error(e)
+        if error is not None:
+            return error
+        
+        return self.get_response(request)
+    
+    async def __acall__(self, request):
+        token, error = self.bearer_token(request)
+        if error is not None:
+            return error
+        if token is None:
+            return await self.get_response(request)
+        
+        try:
+            with timed('auth'):
+                cached = token_cache.get(token)
+                if cached is not None:
+                    decoded_token, user_pk = cached
+                else:
+                    decoded_token, user_pk = await run_blocking(auth.verify_id_token, token), None
+                error = await sync_to_async(self.attach_user)(request, token, decoded_token, user_pk)
+        except Exception as e:
+            return self.token_error(e)
+        if error is not None:
+            return error
+        
+        return await self.get_response(request)
+    
+    def bearer_token(self, request):
+        """
+        Return ``(token, error_response)``; both are ``None`` for paths that
+        skip authentication.
+        """
         # Mark all API requests as CSRF exempt
         if request.path.startswith('/api/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
         
-        # Skip authentication for admin, static files, and public endpoints
-        skip_paths = [
-            '/admin/',
-            '/static/',
-            '/api/users/register/',
-        ]
-        
         # Check if path should skip authentication
-        for skip_path in skip_paths:
+        for skip_path in self.skip_paths:
             if request.path.startswith(skip_path):
-                return self.get_response(request)
+                return None, None
         
         # Get token from Authorization header
         auth_header = request.headers.get('Authorization', '')
         
         if not auth_header.startswith('Bearer '):
-            return JsonResponse({'error': 'Missing or invalid authorization header'}, status=401)
+            return None, JsonResponse({'error': 'Missing or invalid authorization header'}, status=401)
         
-        token = auth_header.split('Bearer ')[1]
+        return auth_header.split('Bearer ')[1], None
+    
+    def attach_user(self, request, token, decoded_token, user_pk):
+        """Load the token's user and attach it; returns an error response or ``None``."""
+        firebase_uid = decoded_token['uid']
         
         try:
-            # Verify Firebase token
-            decoded_token = auth.verify_id_token(token)
-            firebase_uid = decoded_token['uid']
-            
-            # Get or create user
-            try:
-                user = User.objects.get(firebase_uid=firebase_uid)
-                # Store user in a custom attribute that won't be overwritten
-                request._firebase_user = user
-                request.user = user
-            except User.DoesNotExist:
-                # User not found - they need to complete registration
-                print(f"DEBUG: User with firebase_uid={firebase_uid} not found in database")
-                return JsonResponse({'error': 'User profile not found. Please complete registration.'}, status=404)
-            
-            print(f"DEBUG: User authenticated: {user.email}, path: {request.path}")
-            
-        except Exception as e:
-            print(f"DEBUG: Token verification failed: {str(e)}")
-            return JsonResponse({'error': f'Invalid token: {str(e)}'}, status=401)
+            if user_pk is None:
+                user = remember_user(User.objects.get(firebase_uid=firebase_uid))
+                token_cache.set(token, decoded_token, user.pk)
+            elif request.method in SAFE_METHODS:
+                user = get_cached_user(user_pk)
+            else:
+                # Writes must not act on a stale copy of the row
+                user = fetch_user(user_pk)
+            # Store user in a custom attribute that won't be overwritten
+            request._firebase_user = user
+            request.user = user
+        except User.DoesNotExist:
+            # User not found - they need to complete registration
+            log_event(logger, logging.INFO, 'user_not_registered', firebase_uid=firebase_uid)
+            return JsonResponse({'error': 'User profile not found. Please complete registration.'}, status=404)
         
-        response = self.get_response(request)
-        print(f"DEBUG: Response status: {response.status_code}")
+        log_event(logger, logging.DEBUG, 'user_authenticated', user_id=user.pk)
+        return None
+    
+    def token_error(self, e):
+        log_event(logger, logging.INFO, 'token_rejected', error=str(e))
+        return JsonResponse({'error': f'Invalid token: {str(e)}'}, status=401)
+
+
+class RequestLogMiddleware:
+    """
+    Give every request an id and log one summary line when it finishes.
+
+    The id comes from an incoming ``X-Request-ID`` header (set by a proxy)
+    or is generated, is echoed back in the response, and tags every log
+    record emitted while the request runs.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
+        token = request_id.set(self.request_id(request))
+        started = time.perf_counter()
+        try:
+            with track_queries() as queries:
+                response = self.get_response(request)
+            return self.finish(request, response, started, queries)
+        finally:
+            request_id.reset(token)
+    
+    async def __acall__(self, request):
+        token = request_id.set(self.request_id(request))
+        started = time.perf_counter()
+        try:
+            with track_queries() as queries:
+                response = await self.get_response(request)
+            return self.finish(request, response, started, queries)
+        finally:
+            request_id.reset(token)
+    
+    def request_id(self, request):
+        incoming = request.headers.get('X-Request-ID', '')
+        # Only trust short, printable ids
+        if incoming and len(incoming) <= 64 and incoming.isprintable():
+            return incoming
+        return uuid.uuid4().hex
+    
+    def finish(self, request, response, started, queries):
+        response['X-Request-ID'] = request_id.get()
+        user = getattr(request, '_firebase_user', None)
+        log_event(
+            request_logger,
+            logging.WARNING if response.status_code >= 500 else logging.INFO,
+            'request',
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            user_id=getattr(user, 'pk', None),
+            duration_ms=round((time.perf_counter() - started) * 1000, 2),
+            db_queries=queries.count,
+            db_time_ms=round(queries.duration * 1000, 2),
+        )
         return response
 
+
+class PerformanceMiddleware:
+    """
+    Split each request's time into auth, database and serialization phases.
+
+    The split is sent back in a ``Server-Timing`` header (when
+    ``SERVER_TIMING_HEADER`` is on) and recorded per route, named after the
+    URL pattern (e.g. ``question-chapter-stats``), for ``/api/_metrics/``.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
+        started = time.perf_counter()
+        with collect_timings() as timings, track_queries() as queries:
+            response = self.get_response(request)
+        return self.finish(request, response, started, timings, queries)
+    
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with collect_timings() as timings, track_queries() as queries:
+            response = await self.get_response(request)
+        return self.finish(request, response, started, timings, queries)
+    
+    def route(self, request):
+        match = request.resolver_match
+        if match is None:
+            # Rejected before URL resolution, e.g. by the auth middleware
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unmatched'
+        return match.url_name or match.view_name or 'unnamed'
+    
+    def finish(self, request, response, started, timings, queries):
+        duration = time.perf_counter() - started
+        if queries.count:
+            timings['db'] = queries.duration
+        registry.observe(self.route(request), duration, timings, queries.count, response.status_code)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(duration, timings, queries.count)
+        return response
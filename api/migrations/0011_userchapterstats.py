@@ -0,0 +1,58 @@
+# Generated by Django 4.2.8 on 2026-10-17 01:21
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def populate_chapter_stats(apps, schema_editor):
+    QuestionAttempt = apps.get_model('api', 'QuestionAttempt')
+    UserChapterStats = apps.get_model('api', 'UserChapterStats')
+
+    rows = QuestionAttempt.objects.values(
+        'user_id', 'question__subject', 'question__chapter'
+    ).annotate(
+        attempted=Count('id'),
+        solved=Count('id', filter=Q(is_correct=True)),
+    ).order_by()
+
+    UserChapterStats.objects.bulk_create(
+        (
+            UserChapterStats(
+                user_id=row['user_id'],
+                subject=row['question__subject'],
+                chapter=row['question__chapter'],
+                attempted=row['attempted'],
+                solved=row['solved'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_dailypracticepaper'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserChapterStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=100)),
+                ('chapter', models.CharField(max_length=200)),
+                ('attempted', models.IntegerField(default=0)),
+                ('solved', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chapter_stats', to='api.user')),
+            ],
+            options={
+                'db_table': 'user_chapter_stats',
+                'unique_together': {('user', 'subject', 'chapter')},
+            },
+        ),
+        migrations.RunPython(populate_chapter_stats, migrations.RunPython.noop),
+    ]
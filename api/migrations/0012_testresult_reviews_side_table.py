@@ -0,0 +1,66 @@
+# Generated by Django 4.2.8 on 2026-10-17 01:31
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_reviews_out(apps, schema_editor):
+    TestResult = apps.get_model('api', 'TestResult')
+    TestResultReviews = apps.get_model('api', 'TestResultReviews')
+
+    batch = []
+    for pk, reviews in TestResult.objects.values_list('id', 'question_reviews').iterator(chunk_size=500):
+        data = zlib.compress(json.dumps(reviews or [], separators=(',', ':')).encode('utf-8'))
+        batch.append(TestResultReviews(result_id=pk, data=data))
+        if len(batch) >= 500:
+            TestResultReviews.objects.bulk_create(batch)
+            batch = []
+    TestResultReviews.objects.bulk_create(batch)
+
+
+def move_reviews_back(apps, schema_editor):
+    TestResult = apps.get_model('api', 'TestResult')
+    TestResultReviews = apps.get_model('api', 'TestResultReviews')
+
+    for row in TestResultReviews.objects.iterator(chunk_size=500):
+        TestResult.objects.filter(pk=row.result_id).update(
+            question_reviews=json.loads(zlib.decompress(bytes(row.data)))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_userchapterstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestResultReviews',
+            fields=[
+                ('result', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reviews', serialize=False, to='api.testresult')),
+                ('data', models.BinaryField()),
+            ],
+            options={
+                'db_table': 'test_result_reviews',
+            },
+        ),
+        # A default lets the column be re-added on rollback
+        migrations.AlterField(
+            model_name='testresult',
+            name='question_reviews',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(move_reviews_out, move_reviews_back),
+        migrations.RemoveField(
+            model_name='testresult',
+            name='question_reviews',
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='test_result_user_id_0108e7_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.8 on 2026-10-17 01:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_testresult_reviews_side_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTestStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='test_stats', serialize=False, to='api.user')),
+                ('total_tests', models.IntegerField(default=0)),
+                ('total_questions', models.IntegerField(default=0)),
+                ('total_correct', models.IntegerField(default=0)),
+                ('by_subject', models.JSONField(default=dict)),
+                ('by_test_type', models.JSONField(default=dict)),
+                ('daily', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'user_test_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.8 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_adconfig_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailypracticeattempt',
+            index=models.Index(fields=['user', '-date', '-created_at'], name='daily_pract_user_id_928666_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['subject', 'id'], name='api_questio_subject_bb0802_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['updated_at'], name='api_questio_updated_735bd4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questionattempt',
+            index=models.Index(condition=models.Q(('is_correct', True)), fields=['user', 'question'], name='question_attempts_solved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', '-created_at'], name='subscriptio_user_id_dbd9bf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['user', 'expires_at', 'plan'], name='subscriptions_active_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_query_shape_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='questionattempt',
+            name='question_attempts_solved_idx',
+        ),
+        migrations.AddField(
+            model_name='questionattempt',
+            name='chapter',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='questionattempt',
+            name='subject',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='questionattempt',
+            index=models.Index(fields=['user', 'subject', 'chapter', 'is_correct', 'question'], name='question_attempts_chapter_idx'),
+        ),
+    ]
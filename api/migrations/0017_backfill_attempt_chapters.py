@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-17 02:30
+
+from django.db import migrations
+from django.db.models import Max, Min, OuterRef, Subquery
+
+
+def copy_question_chapters(apps, schema_editor):
+    QuestionAttempt = apps.get_model('api', 'QuestionAttempt')
+    Question = apps.get_model('api', 'Question')
+
+    bounds = QuestionAttempt.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    question = Question.objects.filter(pk=OuterRef('question_id'))
+    batch_size = 10000
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        QuestionAttempt.objects.filter(id__gte=start, id__lt=start + batch_size).update(
+            subject=Subquery(question.values('subject')),
+            chapter=Subquery(question.values('chapter')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_questionattempt_subject_chapter'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_question_chapters, migrations.RunPython.noop),
+    ]
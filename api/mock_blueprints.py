@@ -0,0 +1,245 @@
+"""
+Blueprint-driven mock test assembly.
+
+A blueprint (see ``api/blueprints/*.json``) sets how many questions each
+subject contributes, optional per-chapter weights and a difficulty mix.
+Questions are drawn from an index of question IDs per
+(subject, chapter, difficulty) bucket, memoised per process until any
+question changes (and also cached when the cache is shared between
+processes). With the index in hand, building a test costs O(questions
+picked) and does not depend on the corpus size.
+"""
+
+import json
+import os
+import random
+from array import array
+
+from django.core.cache import cache
+
+from .caching import cache_is_shared, make_key
+from .models import MockTest, Question
+
+
+BLUEPRINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'blueprints')
+DEFAULT_DIFFICULTY_MIX = {'EASY': 0.3, 'MEDIUM': 0.5, 'HARD': 0.2}
+
+# subject names -> (versioned cache key, index); only the latest version is kept
+_bucket_indexes = {}
+
+
+class BlueprintError(ValueError):
+    """Raised for blueprints that are missing or malformed."""
+
+
+def load_blueprint(name):
+    """Load a bundled blueprint by key (``NEET``, ``JEE``) or a JSON file path."""
+    path = name if name.endswith('.json') else os.path.join(BLUEPRINT_DIR, f'{name.lower()}.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            blueprint = json.load(f)
+    except FileNotFoundError:
+        raise BlueprintError(f'Blueprint not found: {name}')
+    except json.JSONDecodeError as e:
+        raise BlueprintError(f'Invalid blueprint {name}: {e}')
+
+    if not isinstance(blueprint, dict) or not isinstance(blueprint.get('subjects'), list) or not blueprint['subjects']:
+        raise BlueprintError(f'Blueprint {name} has no subjects')
+    for section in blueprint['subjects']:
+        try:
+            count = int(section.get('count', 0))
+        except (AttributeError, TypeError, ValueError):
+            count = 0
+        if count <= 0 or not section.get('subject'):
+            raise BlueprintError(f'Blueprint {name}: every subject needs a name and a positive count')
+        section['count'] = count
+    for weights in [blueprint] + blueprint['subjects']:
+        for field in ('difficulty_mix', 'chapters'):
+            if weights.get(field) is not None and not _valid_weights(weights[field]):
+                raise BlueprintError(f'Blueprint {name}: {field} must map names to non-negative numbers')
+    return blueprint
+
+
+def _valid_weights(weights):
+    return isinstance(weights, dict) and all(
+        isinstance(weight, (int, float)) and not isinstance(weight, bool) and weight >= 0
+        for weight in weights.values()
+    )
+
+
+def allocate(total, weights, rng=None):
+    """
+    Split ``total`` over ``{key: weight}`` by largest remainder.
+
+    Ties are broken randomly when ``rng`` is given, so small quotas do not
+    always land on the same keys.
+    """
+    weight_sum = sum(weights.values())
+    if total <= 0 or weight_sum <= 0:
+        return {key: 0 for key in weights}
+    exact = {key: total * weight / weight_sum for key, weight in weights.items()}
+    quotas = {key: int(value) for key, value in exact.items()}
+    leftover = total - sum(quotas.values())
+    tie_break = {key: rng.random() if rng else 0 for key in exact}
+    order = sorted(exact, key=lambda k: (exact[k] - quotas[k], tie_break[k]), reverse=True)
+    for key in order[:leftover]:
+        quotas[key] += 1
+    return quotas
+
+
+def allocate_capped(total, weights, capacity, rng=None):
+    """Like ``allocate`` but never exceeds ``capacity[key]``; spare demand is redistributed."""
+    quotas = {key: 0 for key in weights}
+    remaining = total
+    open_keys = {key for key in weights if weights[key] > 0 and capacity.get(key, 0) > 0}
+    while remaining > 0 and open_keys:
+        share = allocate(remaining, {key: weights[key] for key in open_keys}, rng)
+        for key, extra in share.items():
+            granted = min(extra, capacity[key] - quotas[key])
+            quotas[key] += granted
+            remaining -= granted
+            if quotas[key] >= capacity[key]:
+                open_keys.discard(key)
+    return quotas
+
+
+def bucket_index(subjects):
+    """
+    ``{subject_lower: {chapter: {difficulty: array of ids}}}`` for the given
+    subjects.
+
+    Kept in a per-process memo and, when the cache is shared between
+    processes, in the cache too. Both are keyed on the ``questions`` cache
+    version, so any question change rebuilds the index.
+    """
+    names = sorted({subject.lower() for subject in subjects})
+    key = make_key('questions', 'blueprint-buckets', names)
+    memo = _bucket_indexes.get(tuple(names))
+    if memo is not None and memo[0] == key:
+        return memo[1]
+    shared = cache_is_shared()
+    index = cache.get(key) if shared else None
+    if index is not None:
+        _bucket_indexes[tuple(names)] = (key, index)
+        return index
+
+    index = {name: {} for name in names}
+    rows = Question.objects.order_by('id').values_list('id', 'subject', 'chapter', 'difficulty')
+    for pk, subject, chapter, difficulty in rows.iterator(chunk_size=5000):
+        chapters = index.get(subject.lower())
+        if chapters is None:
+            continue
+        chapters.setdefault(chapter, {}).setdefault(difficulty, array('q')).append(pk)
+    if shared:
+        cache.set(key, index, 3600)
+    _bucket_indexes[tuple(names)] = (key, index)
+    return index
+
+
+def recent_question_ids(exam_type, window):
+    """IDs used by the last ``window`` mock tests of an exam type."""
+    if window <= 0:
+        return set()
+    recent_tests = MockTest.objects.filter(exam_type=exam_type).order_by('-created_at', '-id').values_list('id', flat=True)[:window]
+    Through = MockTest.questions.through
+    return set(
+        Through.objects.filter(mocktest_id__in=list(recent_tests)).values_list('question_id', flat=True)
+    )
+
+
+def _draw(ids, count, rng, chosen, avoid, overlap_budget):
+    """
+    Pick up to ``count`` unseen IDs from ``ids`` by random probes, taking at
+    most ``overlap_budget[0]`` IDs from ``avoid``.
+    """
+    picked = []
+    attempts = count * 20 + 20
+    while len(picked) < count and attempts > 0:
+        attempts -= 1
+        pk = ids[rng.randrange(len(ids))]
+        if pk in chosen:
+            continue
+        if pk in avoid:
+            if overlap_budget[0] <= 0:
+                continue
+            overlap_budget[0] -= 1
+        chosen.add(pk)
+        picked.append(pk)
+
+    if len(picked) < count:
+        # Bucket is nearly exhausted; finish with one linear pass
+        for pk in ids:
+            if len(picked) >= count:
+                break
+            if pk in chosen or (pk in avoid and overlap_budget[0] <= 0):
+                continue
+            if pk in avoid:
+                overlap_budget[0] -= 1
+            chosen.add(pk)
+            picked.append(pk)
+    return picked
+
+
+def solve_blueprint(blueprint, rng=None, exclude=(), avoid=(), max_overlap=0, index=None):
+    """
+    Fill a blueprint's quotas and return ``(question_ids, report)``.
+
+    ``exclude`` IDs are never picked (e.g. questions a user already solved,
+    for personalized tests); at most ``max_overlap`` IDs are taken from
+    ``avoid`` (e.g. questions in recently generated tests). Pass ``index``
+    from ``bucket_index`` to reuse it across several tests.
+    """
+    rng = rng or random.Random()
+    chosen = set(exclude)
+    avoid = set(avoid)
+    overlap_budget = [max_overlap]
+    if index is None:
+        index = bucket_index([section['subject'] for section in blueprint['subjects']])
+    default_mix = blueprint.get('difficulty_mix') or DEFAULT_DIFFICULTY_MIX
+
+    question_ids = []
+    report = []
+    for section in blueprint['subjects']:
+        subject = section['subject']
+        count = int(section['count'])
+        mix = section.get('difficulty_mix') or default_mix
+        chapters = index.get(subject.lower(), {})
+
+        # Chapters without explicit weights are weighted by their size
+        if section.get('chapters'):
+            wanted = {name.lower(): weight for name, weight in section['chapters'].items()}
+            chapter_weights = {chapter: wanted[chapter.lower()] for chapter in chapters if chapter.lower() in wanted}
+        else:
+            chapter_weights = {
+                chapter: sum(len(ids) for ids in buckets.values()) for chapter, buckets in chapters.items()
+            }
+
+        # Fix the difficulty split for the whole subject first, then spread
+        # each difficulty's quota over chapters
+        difficulty_capacity = {
+            difficulty: sum(len(buckets.get(difficulty, ())) for chapter, buckets in chapters.items() if chapter in chapter_weights)
+            for difficulty in mix
+        }
+        picked_for_subject = []
+        for difficulty, quota in allocate_capped(count, mix, difficulty_capacity, rng).items():
+            capacity = {chapter: len(chapters[chapter].get(difficulty, ())) for chapter in chapter_weights}
+            for chapter, chapter_quota in allocate_capped(quota, chapter_weights, capacity, rng).items():
+                if chapter_quota:
+                    picked_for_subject.extend(
+                        _draw(chapters[chapter][difficulty], chapter_quota, rng, chosen, avoid, overlap_budget)
+                    )
+
+        # Buckets that ran dry (excluded or overlapping IDs) are made up from
+        # the rest of the subject's chapters
+        for chapter in chapter_weights:
+            for ids in chapters[chapter].values():
+                if len(picked_for_subject) >= count:
+                    break
+                picked_for_subject.extend(
+                    _draw(ids, count - len(picked_for_subject), rng, chosen, avoid, overlap_budget)
+                )
+
+        question_ids.extend(picked_for_subject)
+        report.append({'subject': subject, 'requested': count, 'picked': len(picked_for_subject)})
+
+    return question_ids, report
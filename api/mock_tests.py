@@ -0,0 +1,42 @@
+"""
+Pre-rendered mock test detail payloads.
+
+A mock test's detail response (180 nested questions) is identical for every
+student, so it is rendered once, gzip-compressed and cached under the test's
+id plus ``updated_at``. Any change to the test or to one of its questions
+touches ``updated_at`` (see ``api.signals``), which moves readers to a new key.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .caching import bump_version, compress_body
+from .metrics import timed
+from .models import MockTest
+from .serializers import MockTestDetailSerializer
+
+
+def _payload_key(mock_test):
+    return f'mock-test-detail:{mock_test.pk}:{mock_test.updated_at.timestamp()}'
+
+
+def get_detail_body(mock_test):
+    """Return the cached ``CachedBody`` for a test, rendering it on a miss."""
+    key = _payload_key(mock_test)
+    body = cache.get(key)
+    if body is None:
+        test = MockTest.objects.prefetch_related('questions').get(pk=mock_test.pk)
+        with timed('serialize'):
+            body = compress_body(JSONRenderer().render(MockTestDetailSerializer(test).data))
+        cache.set(key, body, settings.MOCK_TEST_PAYLOAD_TTL)
+    return body
+
+
+def touch_mock_tests(**filters):
+    """Bump ``updated_at`` on matching tests so their payloads are rebuilt."""
+    touched = MockTest.objects.filter(**filters).update(updated_at=timezone.now())
+    if touched:
+        bump_version('mock-tests')
+    return touched
@@ -2,7 +2,10 @@
 Database models for PrepShark API.
 """
 
-from django.db import models
+import json
+import zlib
+
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -56,23 +59,19 @@ class User(models.Model):
         # Kept for backward compatibility, now checks for YEARLY_ELITE
         return 'YEARLY_ELITE' in self.active_plans
 
+    @property
+    def entitlements(self):
+        """Snapshot of active plan keys, their features and the earliest expiry."""
+        from .entitlements import get_entitlements
+        return get_entitlements(self)
+
     @property
     def active_plans(self):
         """Get list of active subscription plan keys."""
-        # Get all active, non-expired subscriptions
-        active_subs = self.subscriptions.filter(
-            status='ACTIVE',
-            expires_at__gt=timezone.now()
-        ).values_list('plan', flat=True)
-        
-        plans = set(active_subs)
-        
+        # Served from a per-request / cached snapshot rather than a fresh query.
         # If user has YEARLY_ELITE, they effectively have all plans
-        # But we'll just return what they have. The checks should handle the hierarchy.
-        # Or we can explicitly add others if YEARLY_ELITE is present?
-        # Better to keep it simple: return what is active. The consumer checks for specific OR elite.
-        
-        return list(plans)
+        # But we'll just return what they have. The consumer checks for specific OR elite.
+        return list(self.entitlements.plans)
 
 
 
@@ -95,12 +94,15 @@ class DailyPracticeAttempt(models.Model):
         db_table = 'daily_practice_attempts'
         ordering = ['-date', '-created_at']
         unique_together = ['user', 'date', 'practice_type'] # One attempt per type per day? Or just one per day?
+        indexes = [
+            models.Index(fields=['user', '-date', '-created_at']),  # History, newest first
+        ]
         # User requirement: "streak will on the bassis of this either daily 25 question attempte or 50 dialy question attempted"
         # So completing either counts. 
         # But can they do both? Probably yes.
     
     def __str__(self):
-        return f"{self.user.name} - {self.date} ({self.practice_type})"
+        return f"User {self.user_id} - {self.date} ({self.practice_type})"
 
 
 class SubscriptionPlan(models.Model):
@@ -153,9 +155,18 @@ class Subscription(models.Model):
     class Meta:
         db_table = 'subscriptions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),  # Per-user list
+            # Entitlement lookups read only active rows; plan keeps it index-only
+            models.Index(
+                fields=['user', 'expires_at', 'plan'],
+                condition=models.Q(status='ACTIVE'),
+                name='subscriptions_active_idx',
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.user.name} - {self.plan} ({self.status})"
+        return f"User {self.user_id} - {self.plan} ({self.status})"
 
 
 class Question(models.Model):
@@ -194,12 +205,21 @@ class Question(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['subject', 'chapter']),
+            models.Index(fields=['subject', 'id']),  # Sampler ID pools, in id order
             models.Index(fields=['difficulty']),
+            models.Index(fields=['updated_at']),  # Catalog cache fingerprint (MAX)
         ]
     
     def __str__(self):
         return f"{self.subject} - {self.chapter} ({self.difficulty})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets save signals skip refiling attempts when the chapter did not change
+        instance._loaded_location = (instance.__dict__.get('subject'), instance.__dict__.get('chapter'))
+        return instance
+
 
 class MockTest(models.Model):
     """Mock test model for full-length practice tests."""
@@ -240,6 +260,9 @@ class MockTest(models.Model):
     @property
     def question_count(self):
         """Get actual number of questions."""
+        # List views annotate the count to avoid a COUNT query per test
+        if 'num_questions' in self.__dict__:
+            return self.num_questions
         return self.questions.count()
 
 
@@ -277,15 +300,87 @@ class TestResult(models.Model):
     total_questions = models.IntegerField()
     correct_answers = models.IntegerField()
     time_taken = models.IntegerField()  # in seconds
-    question_reviews = models.JSONField()  # Array of question review data
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'test_results'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),  # History keyset pages
+        ]
     
     def __str__(self):
-        return f"{self.user.name} - {self.test_type} ({self.score}/{self.total_questions})"
+        return f"User {self.user_id} - {self.test_type} ({self.score}/{self.total_questions})"
+    
+    @property
+    def question_reviews(self):
+        """Array of question review data, loaded from the side table on first access."""
+        if '_question_reviews' not in self.__dict__:
+            reviews = []
+            if self.pk is not None:
+                try:
+                    reviews = self.reviews.load()
+                except TestResultReviews.DoesNotExist:
+                    pass
+            self.__dict__['_question_reviews'] = reviews
+        return self.__dict__['_question_reviews']
+    
+    @question_reviews.setter
+    def question_reviews(self, value):
+        self.__dict__['_question_reviews'] = value
+        self.__dict__['_question_reviews_dirty'] = True
+    
+    def save(self, *args, **kwargs):
+        """Save the result row, plus its reviews when they were assigned."""
+        if not self.__dict__.get('_question_reviews_dirty'):
+            return super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            data = TestResultReviews.pack(self.question_reviews)
+            if adding:
+                # A new result cannot have reviews yet; skip the lookup
+                TestResultReviews.objects.create(result=self, data=data)
+            else:
+                TestResultReviews.objects.update_or_create(result=self, defaults={'data': data})
+        self.__dict__['_question_reviews_dirty'] = False
+
+
+class TestResultReviews(models.Model):
+    """Per-question reviews of a test result, stored as compressed JSON away from the hot row."""
+    result = models.OneToOneField(TestResult, on_delete=models.CASCADE, primary_key=True, related_name='reviews')
+    data = models.BinaryField()
+    
+    class Meta:
+        db_table = 'test_result_reviews'
+    
+    def __str__(self):
+        return f"Reviews for test result {self.result_id}"
+    
+    @staticmethod
+    def pack(reviews):
+        return zlib.compress(json.dumps(reviews, separators=(',', ':')).encode('utf-8'))
+    
+    def load(self):
+        return json.loads(zlib.decompress(bytes(self.data)))
+
+
+class UserTestStats(models.Model):
+    """Rolling per-user summary of test results, maintained by ``api.test_stats``."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='test_stats')
+    total_tests = models.IntegerField(default=0)
+    total_questions = models.IntegerField(default=0)
+    total_correct = models.IntegerField(default=0)
+    by_subject = models.JSONField(default=dict)  # {subject: [tests, questions, correct]}
+    by_test_type = models.JSONField(default=dict)  # {test_type: [tests, questions, correct]}
+    daily = models.JSONField(default=dict)  # {'YYYY-MM-DD': [tests, questions, correct]}, last 30 days
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'user_test_stats'
+    
+    def __str__(self):
+        return f"User {self.user_id} - {self.total_tests} tests"
 
 
 class UserProgress(models.Model):
@@ -304,7 +399,7 @@ class UserProgress(models.Model):
         ordering = ['-last_practiced']
     
     def __str__(self):
-        return f"{self.user.name} - {self.subject}/{self.chapter}"
+        return f"User {self.user_id} - {self.subject}/{self.chapter}"
     
     @property
     def accuracy(self):
@@ -318,6 +413,9 @@ class QuestionAttempt(models.Model):
     """Track individual question attempts."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='question_attempts')
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='attempts')
+    # Copied from the question on write so chapter queries skip the join
+    subject = models.CharField(max_length=100, blank=True)
+    chapter = models.CharField(max_length=200, blank=True)
     is_correct = models.BooleanField()
     selected_index = models.IntegerField()
     attempted_at = models.DateTimeField(auto_now=True)  # Updates on every attempt
@@ -326,10 +424,34 @@ class QuestionAttempt(models.Model):
         db_table = 'question_attempts'
         unique_together = ['user', 'question']  # One record per question per user
         ordering = ['-attempted_at']
+        indexes = [
+            # Chapter resets and rebuilds use the prefix; solved IDs are index-only
+            models.Index(
+                fields=['user', 'subject', 'chapter', 'is_correct', 'question'],
+                name='question_attempts_chapter_idx',
+            ),
+        ]
 
     def __str__(self):
         status = "Correct" if self.is_correct else "Incorrect"
-        return f"{self.user.name} - {self.question.id} ({status})"
+        return f"User {self.user_id} - {self.question_id} ({status})"
+
+
+class UserChapterStats(models.Model):
+    """Per-user attempted/solved counters for a chapter, kept in step with QuestionAttempt."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chapter_stats')
+    subject = models.CharField(max_length=100)
+    chapter = models.CharField(max_length=200)
+    attempted = models.IntegerField(default=0)
+    solved = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'user_chapter_stats'
+        unique_together = ['user', 'subject', 'chapter']  # Also serves (user, subject) lookups
+
+    def __str__(self):
+        return f"User {self.user_id} - {self.subject}/{self.chapter} ({self.solved}/{self.attempted})"
 
 
 class AdConfig(models.Model):
@@ -346,6 +468,7 @@ class AdConfig(models.Model):
     frequency = models.IntegerField(default=5)  # Show after N questions
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'ad_configs'
@@ -0,0 +1,25 @@
+"""
+Bounded thread pool for blocking calls made from async code.
+
+Third-party SDKs (Firebase Admin, Razorpay) only offer blocking APIs. Under
+ASGI they run here instead of on the event loop. The pool has a fixed size,
+so a slow upstream cannot spawn an unbounded number of threads; extra calls
+queue until a thread frees up.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+_executor = ThreadPoolExecutor(max_workers=settings.BLOCKING_IO_WORKERS, thread_name_prefix='blocking-io')
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` run on the blocking-I/O pool."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
@@ -0,0 +1,154 @@
+"""
+Pagination and streaming helpers for large list endpoints.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a fixed, unique ordering.
+
+    Unlike offset pagination no rows before the cursor are read and thrown
+    away. When an index covers ``ordering`` each page is an index range scan
+    starting after the last row of the previous page; otherwise the filtered
+    rows are sorted on every page, so the cost follows the filtered set's
+    size rather than the page's position.
+    """
+
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+
+    @classmethod
+    def is_requested(cls, request):
+        """Cursor mode is opt-in so clients expecting plain arrays keep working."""
+        params = request.query_params
+        return cls.cursor_query_param in params or cls.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        position = [getattr(row, field.lstrip('-')) for field in self.ordering]
+        raw = json.dumps(position, cls=JSONEncoder).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        return position
+
+    def build_filter(self, position):
+        """Rows strictly after ``position`` in the configured ordering."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.build_filter(position))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+
+class QuestionCursorPagination(KeysetPagination):
+    """
+    Cursor pagination matching ``QuestionViewSet``'s Easy -> Hard sort.
+
+    ``difficulty_rank`` is a ``Case`` annotation, not a column, so no index
+    serves this ordering: each page reads the subject/chapter rows through
+    their index and sorts them. Fine for a chapter's few hundred questions.
+    """
+
+    ordering = ('difficulty_rank', 'id')
+    page_size = 100
+
+
+class TestHistoryPagination(KeysetPagination):
+    """Newest-first cursor pagination for test result history."""
+
+    ordering = ('-created_at', '-id')
+    page_size = 20
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_json_array(queryset, serializer_class, chunk_size=500, context=None):
+    """
+    Stream a queryset as a plain JSON array.
+
+    Rows are fetched with ``.iterator()`` and serialized ``chunk_size`` at a
+    time, so memory stays flat and the first byte goes out immediately.
+    """
+    # Same compact, unicode output as DRF's JSONRenderer
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def generate():
+        yield '['
+        separator = ''
+        for chunk in _chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            data = serializer_class(chunk, many=True, context=context).data
+            yield separator + ','.join(encoder.encode(item) for item in data)
+            separator = ','
+        yield ']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
@@ -0,0 +1,269 @@
+"""
+Subscription payment flow shared by the sync (DRF) and async views.
+
+Database work and gateway calls are separate functions so async views can
+run each on the right thread: the ORM through ``sync_to_async`` and the
+blocking Razorpay SDK on the blocking-I/O pool.
+
+All gateway calls share one Razorpay client. Its HTTP session keeps pooled
+keep-alive connections and applies connect/read timeouts. A circuit breaker
+in front of it fails fast while the gateway is unhealthy.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+import razorpay
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import Subscription, SubscriptionPlan
+
+
+def order_amount(plan_key):
+    """Price of a plan in paise."""
+    try:
+        plan_obj = SubscriptionPlan.objects.get(key=plan_key)
+        return int(plan_obj.price * 100)  # Convert to paise
+    except SubscriptionPlan.DoesNotExist:
+        # Fallback for legacy or if DB not populated yet
+        return settings.SUBSCRIPTION_PRICES.get(plan_key, 29900)
+
+
+class GatewayUnavailable(Exception):
+    """The payment gateway is failing or timing out; try again later."""
+
+
+class OrderInProgress(Exception):
+    """Another request is already creating this user's order for the plan."""
+
+
+class CircuitBreaker:
+    """
+    Process-local circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail immediately for ``reset_timeout`` seconds. Then a single
+    trial call is let through: success closes the circuit, failure opens it
+    again. A 4xx answer counts as success, since the gateway is up.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def call(self, func, *args, **kwargs):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self.trial_running):
+                raise GatewayUnavailable('Payment gateway is unavailable, please retry shortly')
+            if state == 'half-open':
+                self.trial_running = True
+        try:
+            result = func(*args, **kwargs)
+        except GATEWAY_FAILURES as e:
+            self.record_failure()
+            raise GatewayUnavailable(f'Payment gateway error: {e}') from e
+        except razorpay.errors.BadRequestError:
+            self.record_success()
+            raise
+        finally:
+            # Any other error says nothing about the gateway, but must not
+            # leave the trial slot taken
+            if state == 'half-open':
+                with self._lock:
+                    self.trial_running = False
+        self.record_success()
+        return result
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# Transport errors and 5xx answers count against the breaker; 4xx (bad
+# requests) are our fault and are raised as-is
+GATEWAY_FAILURES = (requests.RequestException, razorpay.errors.ServerError, razorpay.errors.GatewayError)
+
+
+class TimeoutSession(requests.Session):
+    """Session that applies a default ``(connect, read)`` timeout to every request."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class RazorpayClient(razorpay.Client):
+
+    def _get_version(self):
+        # The SDK looks its own version up through pkg_resources on every request
+        if not hasattr(RazorpayClient, '_version'):
+            RazorpayClient._version = super()._get_version()
+        return RazorpayClient._version
+
+
+_client = None
+_client_lock = threading.Lock()
+gateway_breaker = CircuitBreaker(
+    failure_threshold=settings.RAZORPAY_BREAKER_THRESHOLD,
+    reset_timeout=settings.RAZORPAY_BREAKER_RESET,
+)
+
+
+@receiver(setting_changed)
+def reset_razorpay_client(setting, **kwargs):
+    """Rebuild the client after tests override a gateway setting."""
+    global _client
+    if setting.startswith('RAZORPAY_'):
+        _client = None
+
+
+def get_razorpay_client():
+    """The shared Razorpay client, built on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                session = TimeoutSession((settings.RAZORPAY_CONNECT_TIMEOUT, settings.RAZORPAY_READ_TIMEOUT))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.RAZORPAY_POOL_SIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _client = RazorpayClient(
+                    session=session,
+                    auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+                    base_url=settings.RAZORPAY_BASE_URL,
+                )
+    return _client
+
+
+def create_gateway_order(amount, receipt=None):
+    """Create a Razorpay order (blocking HTTP call, behind the circuit breaker)."""
+    data = {
+        'amount': amount,
+        'currency': 'INR',
+        'payment_capture': 1
+    }
+    if receipt:
+        data['receipt'] = receipt
+    return gateway_breaker.call(get_razorpay_client().order.create, data)
+
+
+def _order_key(user_id, plan_key):
+    return f'razorpay-order:{user_id}:{plan_key}'
+
+
+def get_or_create_order(user_id, plan_key, amount):
+    """
+    Create an order at most once per (user, plan) while it is unpaid.
+
+    Retried requests (double taps, client timeouts) get the order created
+    by the first request instead of a duplicate. A concurrent duplicate is
+    turned away with ``OrderInProgress`` rather than waiting for it.
+
+    The order and the lock live in the default cache, so this only holds
+    across workers when that cache is shared (see check ``api.W002``).
+    """
+    key = _order_key(user_id, plan_key)
+    cached = cache.get(key)
+    if cached is not None and cached['amount'] == amount:
+        return cached['order']
+
+    lock_key = f'{key}:lock'
+    lock_timeout = settings.RAZORPAY_CONNECT_TIMEOUT + settings.RAZORPAY_READ_TIMEOUT
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        raise OrderInProgress('Order creation already in progress, please retry')
+
+    try:
+        # Same receipt for every retry of the same purchase
+        order = create_gateway_order(amount, receipt=f'{user_id}-{plan_key}-{amount}'[:40])
+        cache.set(key, {'amount': amount, 'order': order}, settings.RAZORPAY_ORDER_TTL)
+    finally:
+        cache.delete(lock_key)
+    return order
+
+
+def order_response(order, amount):
+    return {
+        'order_id': order['id'],
+        'amount': amount,
+        'currency': 'INR',
+        'key_id': settings.RAZORPAY_KEY_ID,
+    }
+
+
+def plan_terms(plan_key):
+    """``(duration_days, amount)`` for a plan."""
+    try:
+        plan_obj = SubscriptionPlan.objects.get(key=plan_key)
+        return plan_obj.duration_days, plan_obj.price
+    except SubscriptionPlan.DoesNotExist:
+        # Fallback logic
+        if plan_key in ['DAILY_PRACTICE', 'MOCK_TEST_MASTER']:
+            return 30, 299 if plan_key == 'DAILY_PRACTICE' else 499
+        elif plan_key == 'YEARLY_ELITE':
+            return 365, 2999
+        return 30, 299
+
+
+def activate_subscription(user, plan_key, payment_id):
+    """Record a paid subscription and upgrade the user; returns the expiry."""
+    duration_days, amount = plan_terms(plan_key)
+    expires_at = timezone.now() + timedelta(days=duration_days)
+    
+    # Create subscription record
+    Subscription.objects.create(
+        user=user,
+        plan=plan_key,
+        status='ACTIVE',
+        expires_at=expires_at,
+        payment_id=payment_id,
+        amount=amount
+    )
+    
+    # Update user subscription
+    user.subscription_tier = 'PREMIUM'
+    user.subscription_expires = expires_at
+    user.save()
+    
+    # The next purchase of this plan needs a fresh order
+    cache.delete(_order_key(user.pk, plan_key))
+    return expires_at
+
+
+def activation_response(expires_at):
+    return {
+        'message': 'Subscription activated successfully',
+        'expires_at': expires_at,
+    }
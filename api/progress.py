@@ -0,0 +1,304 @@
+"""
+Write paths for question attempts and the per-chapter counters derived from them.
+
+``UserChapterStats`` is only ever changed from here, inside the same
+transaction as the ``QuestionAttempt`` rows it summarises.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Min, OuterRef, Q, Subquery, Value, When
+from rest_framework import serializers
+
+from .models import Question, QuestionAttempt, UserChapterStats
+
+
+# Upper bound on answers accepted by a single batch submission
+MAX_BATCH_ANSWERS = 500
+
+
+def apply_chapter_deltas(user, deltas):
+    """
+    Add ``{(subject, chapter): (attempted, solved)}`` deltas to a user's counters.
+
+    A batch costs the same handful of statements however many chapters it
+    spans. Must be called inside a transaction.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if len(deltas) == 1:
+        [((subject, chapter), (attempted, solved))] = deltas.items()
+        _apply_chapter_delta(user, subject, chapter, attempted, solved)
+        return
+    if not deltas:
+        return
+
+    rows = UserChapterStats.objects.filter(user=user)
+    wanted = Q()
+    for subject, chapter in deltas:
+        wanted |= Q(subject=subject, chapter=chapter)
+    existing = set(rows.filter(wanted).values_list('subject', 'chapter'))
+
+    if existing:
+        # One UPDATE for every existing row; only those rows, so a row created
+        # concurrently below is left to the fallback and not counted twice
+        match = Q()
+        attempted_when, solved_when = [], []
+        for subject, chapter in existing:
+            attempted, solved = deltas[(subject, chapter)]
+            match |= Q(subject=subject, chapter=chapter)
+            attempted_when.append(When(subject=subject, chapter=chapter, then=Value(attempted)))
+            solved_when.append(When(subject=subject, chapter=chapter, then=Value(solved)))
+        rows.filter(match).update(
+            attempted=F('attempted') + Case(*attempted_when, default=Value(0)),
+            solved=F('solved') + Case(*solved_when, default=Value(0)),
+        )
+
+    missing = [key for key in deltas if key not in existing]
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            UserChapterStats.objects.bulk_create([
+                UserChapterStats(
+                    user=user, subject=subject, chapter=chapter,
+                    attempted=deltas[(subject, chapter)][0], solved=deltas[(subject, chapter)][1],
+                )
+                for subject, chapter in missing
+            ])
+    except IntegrityError:
+        # A concurrent request created one of the rows first
+        for subject, chapter in missing:
+            _apply_chapter_delta(user, subject, chapter, *deltas[(subject, chapter)])
+
+
+def _apply_chapter_delta(user, subject, chapter, attempted, solved):
+    rows = UserChapterStats.objects.filter(user=user, subject=subject, chapter=chapter)
+    if rows.update(attempted=F('attempted') + attempted, solved=F('solved') + solved):
+        return
+    try:
+        with transaction.atomic():
+            UserChapterStats.objects.create(
+                user=user, subject=subject, chapter=chapter,
+                attempted=attempted, solved=solved,
+            )
+    except IntegrityError:
+        # A concurrent request created the row first
+        rows.update(attempted=F('attempted') + attempted, solved=F('solved') + solved)
+
+
+def parse_is_correct(value):
+    """
+    Parse a submitted ``is_correct`` the way a serializer ``BooleanField`` would.
+
+    ``"false"``, ``"0"`` and the like are False; a missing or unrecognised
+    value raises ``ValueError`` instead of being coerced.
+    """
+    try:
+        return serializers.BooleanField().to_internal_value(value)
+    except serializers.ValidationError:
+        raise ValueError('Missing or invalid is_correct')
+
+
+def record_attempt(user, question, is_correct, selected_index):
+    """
+    Create or update a user's attempt at a question and adjust chapter counters.
+
+    Raises ``ValueError`` if ``is_correct`` is not a boolean.
+    """
+    is_correct = parse_is_correct(is_correct)
+    with transaction.atomic():
+        previous = QuestionAttempt.objects.select_for_update().filter(
+            user=user, question=question
+        ).values_list('is_correct', flat=True).first()
+
+        attempt, created = QuestionAttempt.objects.update_or_create(
+            user=user,
+            question=question,
+            defaults={
+                'subject': question.subject,
+                'chapter': question.chapter,
+                'is_correct': is_correct,
+                'selected_index': selected_index
+            }
+        )
+
+        solved = int(is_correct) - int(bool(previous))
+        apply_chapter_deltas(user, {
+            (question.subject, question.chapter): (1 if created else 0, solved),
+        })
+    return attempt
+
+
+def record_attempts(user, answers):
+    """
+    Upsert a batch of attempts in a single statement and adjust chapter counters.
+
+    ``answers`` is a list of ``{'question_id', 'selected_index', 'is_correct'}``
+    dicts. Returns one result dict per answer, in input order; invalid items
+    are reported individually and do not prevent the rest from being saved.
+    """
+    results = []
+    valid = {}  # question_id -> answer; a later answer for the same question wins
+    for answer in answers:
+        raw_id = answer.get('question_id') if isinstance(answer, dict) else None
+        result = {'question_id': raw_id, 'status': 'success'}
+        results.append(result)
+        try:
+            question_id = int(raw_id)
+        except (TypeError, ValueError):
+            result.update(status='error', error='Missing or invalid question_id')
+            continue
+        try:
+            selected_index = int(answer['selected_index'])
+        except (KeyError, TypeError, ValueError):
+            result.update(status='error', error='Missing or invalid selected_index')
+            continue
+        try:
+            is_correct = parse_is_correct(answer.get('is_correct'))
+        except ValueError as e:
+            result.update(status='error', error=str(e))
+            continue
+        result['question_id'] = question_id
+        valid[question_id] = {'selected_index': selected_index, 'is_correct': is_correct}
+
+    questions = Question.objects.only('id', 'subject', 'chapter').in_bulk(list(valid))
+    for result in results:
+        if result['status'] == 'success' and result['question_id'] not in questions:
+            result.update(status='error', error='Question not found')
+            valid.pop(result['question_id'], None)
+
+    if not valid:
+        return results
+
+    with transaction.atomic():
+        previous = dict(
+            QuestionAttempt.objects.select_for_update().filter(
+                user=user, question_id__in=list(valid)
+            ).values_list('question_id', 'is_correct')
+        )
+
+        QuestionAttempt.objects.bulk_create(
+            [
+                QuestionAttempt(
+                    user=user,
+                    question_id=question_id,
+                    subject=questions[question_id].subject,
+                    chapter=questions[question_id].chapter,
+                    is_correct=answer['is_correct'],
+                    selected_index=answer['selected_index'],
+                )
+                for question_id, answer in valid.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'question'],
+            update_fields=['subject', 'chapter', 'is_correct', 'selected_index', 'attempted_at'],
+        )
+
+        deltas = {}
+        for question_id, answer in valid.items():
+            question = questions[question_id]
+            key = (question.subject, question.chapter)
+            attempted, solved = deltas.get(key, (0, 0))
+            was_correct = previous.get(question_id)
+            deltas[key] = (
+                attempted + (0 if question_id in previous else 1),
+                solved + int(answer['is_correct']) - int(bool(was_correct)),
+            )
+        apply_chapter_deltas(user, deltas)
+
+    return results
+
+
+def reset_chapter(user, subject, chapter):
+    """Delete a user's attempts for a chapter and zero its counters."""
+    with transaction.atomic():
+        # Nothing cascades from attempts, so this is one DELETE on the chapter index
+        deleted_count, _ = QuestionAttempt.objects.filter(
+            user=user,
+            subject=subject,
+            chapter=chapter
+        ).delete()
+        UserChapterStats.objects.filter(user=user, subject=subject, chapter=chapter).delete()
+    return deleted_count
+
+
+def rebuild_chapter_stats(user_ids=None, batch_size=1000):
+    """Recompute counters from ``QuestionAttempt``, optionally for some users only."""
+    attempts = QuestionAttempt.objects.all()
+    stats = UserChapterStats.objects.all()
+    if user_ids is not None:
+        attempts = attempts.filter(user_id__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+
+    rows = attempts.values(
+        'user_id', 'subject', 'chapter'
+    ).annotate(
+        attempted=Count('id'),
+        solved=Count('id', filter=Q(is_correct=True)),
+    ).order_by()
+
+    with transaction.atomic():
+        stats.delete()
+        created = UserChapterStats.objects.bulk_create(
+            [
+                UserChapterStats(
+                    user_id=row['user_id'],
+                    subject=row['subject'],
+                    chapter=row['chapter'],
+                    attempted=row['attempted'],
+                    solved=row['solved'],
+                )
+                for row in rows.iterator()
+            ],
+            batch_size=batch_size,
+        )
+    return len(created)
+
+
+def _stale_attempts(attempts):
+    """Attempts whose copied subject/chapter no longer match their question."""
+    question = Question.objects.filter(pk=OuterRef('question_id'))
+    return attempts.exclude(
+        subject=Subquery(question.values('subject')), chapter=Subquery(question.values('chapter')),
+    )
+
+
+def _refile(attempts):
+    question = Question.objects.filter(pk=OuterRef('question_id'))
+    return attempts.update(
+        subject=Subquery(question.values('subject')), chapter=Subquery(question.values('chapter')),
+    )
+
+
+def refile_attempts(question_ids):
+    """
+    Copy the current subject and chapter of some questions onto their attempts.
+
+    For questions that moved chapter. Rebuilds the counters of the users
+    whose attempts moved; returns how many attempts changed.
+    """
+    with transaction.atomic():
+        stale = _stale_attempts(QuestionAttempt.objects.filter(question_id__in=list(question_ids)))
+        user_ids = list(stale.order_by().values_list('user_id', flat=True).distinct())
+        if not user_ids:
+            return 0
+        moved = _refile(stale)
+        rebuild_chapter_stats(user_ids=user_ids)
+    return moved
+
+
+def backfill_attempt_chapters(batch_size=10000):
+    """
+    Copy subject and chapter from ``Question`` onto attempts that lack or disagree with them.
+
+    Works through the table in primary-key batches, each its own UPDATE,
+    so it can run against a live database. Returns the number of rows changed.
+    """
+    bounds = QuestionAttempt.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0
+    changed = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        changed += _refile(_stale_attempts(
+            QuestionAttempt.objects.filter(id__gte=start, id__lt=start + batch_size)
+        ))
+    return changed
@@ -0,0 +1,135 @@
+"""
+Per-view query budgets.
+
+Viewsets declare how many queries each action may run::
+
+    class TestResultViewSet(viewsets.ModelViewSet):
+        query_budgets = {'list': 1, 'retrieve': 1, 'stats': 1}
+
+and function views use the ``query_budget`` decorator. Budgets count the
+queries run by the view itself, not by middleware such as authentication,
+nor those run later while a streaming response is consumed.
+
+``QueryBudgetMiddleware`` checks every request against its budget. What it
+does on an overrun depends on ``QUERY_BUDGET_MODE``: ``'log'`` logs a
+warning, ``'raise'`` raises ``QueryBudgetExceeded`` and ``'off'`` skips the
+check. Both reports list the SQL statements that ran more than once, the
+usual sign of an N+1.
+"""
+
+import logging
+import re
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .db.instrumentation import track_queries
+from .log import log_event
+
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its budget allows."""
+
+
+def query_budget(limit):
+    """Declare the query budget of a function view."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    """SQL with literals and ``IN`` list lengths normalized away."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _NUMBER_RE.sub('N', sql)
+
+
+def view_budget(callback, method):
+    """The budget of a resolved view for an HTTP method, or ``None``."""
+    budget = getattr(callback, 'query_budget', None)
+    if budget is not None:
+        return budget
+    # DRF viewsets: as_view() records the class and method -> action map
+    cls = getattr(callback, 'cls', None)
+    actions = getattr(callback, 'actions', None)
+    if cls is None or not actions:
+        return None
+    action = actions.get(method.lower())
+    return getattr(cls, 'query_budgets', {}).get(action)
+
+
+def repeated_queries(statements):
+    """``[(fingerprint, count)]`` for statements run more than once, most first."""
+    counts = Counter(fingerprint(sql) for sql in statements)
+    return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+
+class QueryBudgetMiddleware:
+    """
+    Enforce per-view query budgets.
+
+    Placed last, so only the view's own queries count against its budget.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if settings.QUERY_BUDGET_MODE == 'off':
+            return self.get_response(request)
+
+        with track_queries(record_sql=True) as queries:
+            response = self.get_response(request)
+        self.check(request, queries)
+        return response
+
+    async def __acall__(self, request):
+        if settings.QUERY_BUDGET_MODE == 'off':
+            return await self.get_response(request)
+
+        with track_queries(record_sql=True) as queries:
+            response = await self.get_response(request)
+        self.check(request, queries)
+        return response
+
+    def check(self, request, queries):
+        # Read by check_query_budgets to report usage
+        request._view_query_count = queries.count
+        match = request.resolver_match
+        if match is None:
+            return
+        budget = view_budget(match.func, request.method)
+        if budget is None or queries.count <= budget:
+            return
+
+        repeated = repeated_queries(queries.statements)
+        if settings.QUERY_BUDGET_MODE == 'raise':
+            details = ''.join(f'\n  {count}x {sql}' for sql, count in repeated)
+            raise QueryBudgetExceeded(
+                f'{request.method} {request.path} ({match.view_name}) ran {queries.count} queries, '
+                f'budget is {budget}.' + (f' Repeated:{details}' if details else '')
+            )
+        log_event(
+            logger, logging.WARNING, 'query_budget_exceeded',
+            view=match.view_name, method=request.method, path=request.path,
+            queries=queries.count, budget=budget,
+            repeated=[{'sql': sql, 'count': count} for sql, count in repeated],
+        )
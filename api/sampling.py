@@ -0,0 +1,91 @@
+"""
+Random question sampling without ORDER BY RANDOM().
+"""
+
+import random
+from array import array
+
+from django.core.cache import cache
+from django.db.models import Max, Min, Q
+
+from .caching import make_key
+from .models import Question
+
+
+class QuestionSampler:
+    """
+    Draw random questions matching a set of filters.
+
+    Small and medium result sets are sampled from a cached, sorted list of
+    matching IDs; ``max_cached_ids`` keeps that list to a few hundred KB per
+    cache read. Larger sets are sampled from narrow ID windows at random
+    points of the ID range, sized to hold about ``window_rows`` matching rows
+    each and read in one query; every row inside a window is equally likely,
+    so gaps in the ID sequence do not favour the rows after them. Passing a
+    ``seed`` makes a draw repeatable for as long as the underlying questions
+    do not change.
+    """
+
+    def __init__(self, max_cached_ids=50000, timeout=300, probe_attempts=5, window_rows=4, max_windows=50):
+        self.max_cached_ids = max_cached_ids
+        self.timeout = timeout
+        self.probe_attempts = probe_attempts
+        self.window_rows = window_rows
+        self.max_windows = max_windows
+
+    def _id_pool(self, filters):
+        """Return ``('ids', [...])`` or ``('range', (min_id, max_id, total))``."""
+        # v2: range pools carry the row count; older two-field entries must not be read
+        key = make_key('questions', 'sample-pool-v2', filters)
+        pool = cache.get(key)
+        if pool is not None:
+            return pool
+
+        queryset = Question.objects.filter(**filters)
+        total = queryset.count()
+        if total <= self.max_cached_ids:
+            # A typed array pickles ~6x faster than a list through the cache
+            pool = ('ids', array('q', queryset.order_by('id').values_list('id', flat=True)))
+        else:
+            bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+            pool = ('range', (bounds['low'], bounds['high'], total))
+        cache.set(key, pool, self.timeout)
+        return pool
+
+    def sample_ids(self, filters, count, seed=None):
+        """Return up to ``count`` distinct question IDs in random order."""
+        rng = random.Random(seed)
+        kind, pool = self._id_pool(filters)
+
+        if kind == 'ids':
+            return rng.sample(pool, min(count, len(pool)))
+
+        low, high, total = pool
+        queryset = Question.objects.filter(**filters).order_by('id').values_list('id', flat=True)
+        picked = []
+        seen = set()
+        for _ in range(self.probe_attempts):
+            needed = count - len(picked)
+            if needed <= 0:
+                break
+            windows = min(needed, self.max_windows)
+            # ID span holding ~window_rows matches per wanted row at the average density
+            width = max(1, (high - low + 1) * self.window_rows * needed // (windows * total))
+            ranges = Q()
+            for _ in range(windows):
+                start = rng.randint(low, high)
+                ranges |= Q(id__gte=start, id__lt=start + width)
+            candidates = [pk for pk in dict.fromkeys(queryset.filter(ranges)) if pk not in seen]
+            for question_id in rng.sample(candidates, min(needed, len(candidates))):
+                seen.add(question_id)
+                picked.append(question_id)
+        return picked
+
+    def sample(self, filters, count, seed=None):
+        """Return up to ``count`` random ``Question`` objects."""
+        ids = self.sample_ids(filters, count, seed=seed)
+        questions = Question.objects.in_bulk(ids)
+        return [questions[pk] for pk in ids if pk in questions]
+
+
+question_sampler = QuestionSampler()
@@ -101,6 +101,8 @@ class MockTestDetailSerializer(serializers.ModelSerializer):
 class TestResultSerializer(serializers.ModelSerializer):
     """Test result serializer."""
     
+    question_reviews = serializers.JSONField()  # Stored in TestResultReviews
+    
     class Meta:
         model = TestResult
         fields = [
@@ -110,6 +112,18 @@ class TestResultSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at']
 
 
+class TestResultSummarySerializer(serializers.ModelSerializer):
+    """Test result without its per-question reviews, for lists and history."""
+    
+    class Meta:
+        model = TestResult
+        fields = [
+            'id', 'user', 'test_type', 'subject', 'chapter', 'score', 'total_questions',
+            'correct_answers', 'time_taken', 'created_at'
+        ]
+        read_only_fields = fields
+
+
 class QuestionAttemptSerializer(serializers.ModelSerializer):
     """Serializer for question attempts."""
     
@@ -0,0 +1,89 @@
+"""
+Signal handlers keeping in-process caches consistent with the database.
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import bump_version
+from .entitlements import invalidate_entitlements
+from .mock_tests import touch_mock_tests
+from .progress import refile_attempts
+from .models import AdConfig, MockTest, Question, Subscription, SubscriptionPlan, User
+from .token_cache import token_cache
+from .user_cache import invalidate_user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached row and tokens so the next request reads the user again."""
+    token_cache.invalidate_uid(instance.firebase_uid)
+    invalidate_user(instance.pk)
+
+
+# Question deletes go through api.ingest.delete_questions, which invalidates
+# once per delete instead of once per row
+@receiver(post_save, sender=Question)
+def invalidate_question_caches(sender, **kwargs):
+    """Questions changed: drop cached ID pools and derived data."""
+    bump_version('questions')
+
+
+@receiver(post_save, sender=Question)
+def refile_question_attempts(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the subject/chapter copied onto attempts in step with an edited question."""
+    location = (instance.subject, instance.chapter)
+    moved = getattr(instance, '_loaded_location', None) != location
+    instance._loaded_location = location
+    if created or not moved or (update_fields is not None and not {'subject', 'chapter'} & set(update_fields)):
+        return
+    refile_attempts([instance.pk])
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def invalidate_plan_catalog(sender, **kwargs):
+    """Drop cached plan listings."""
+    bump_version('subscription-plans')
+
+
+@receiver(post_save, sender=AdConfig)
+@receiver(post_delete, sender=AdConfig)
+def invalidate_ad_configs(sender, **kwargs):
+    """Drop cached ad configuration responses."""
+    bump_version('ad-configs')
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscription_entitlements(sender, instance, **kwargs):
+    """A subscription was created, changed or removed: recompute entitlements."""
+    user = instance.user if Subscription.user.is_cached(instance) else None
+    invalidate_entitlements(instance.user_id, user)
+
+
+@receiver(post_save, sender=Question)
+def touch_mock_tests_for_question(sender, instance, **kwargs):
+    """Rebuild payloads of every mock test that includes a changed question."""
+    touch_mock_tests(questions=instance)
+
+
+@receiver(post_save, sender=MockTest)
+@receiver(post_delete, sender=MockTest)
+def invalidate_mock_test_lists(sender, **kwargs):
+    """Drop cached mock test listings."""
+    bump_version('mock-tests')
+
+
+@receiver(m2m_changed, sender=MockTest.questions.through)
+def touch_mock_tests_for_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Questions were added to or removed from a mock test."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch_mock_tests(pk=instance.pk)
+    elif pk_set:
+        touch_mock_tests(pk__in=pk_set)
+    else:
+        touch_mock_tests(questions=instance)
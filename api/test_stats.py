@@ -0,0 +1,130 @@
+"""
+Per-user rolling test statistics.
+
+``UserTestStats`` holds running totals plus per-subject, per-test-type and
+per-day ``[tests, questions, correct]`` counters. A new result is folded in
+with one locked read-modify-write, so the stats endpoint reads one row
+however many tests a user has taken. Edits and deletes rebuild the row with
+a few grouped SQL aggregates.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import TestResult, UserTestStats
+
+
+# Daily buckets older than this are dropped
+WINDOW_DAYS = 30
+
+
+def _add(buckets, key, tests, questions, correct):
+    counters = buckets.setdefault(key, [0, 0, 0])
+    counters[0] += tests
+    counters[1] += questions
+    counters[2] += correct
+
+
+def _prune(daily, today):
+    cutoff = (today - timedelta(days=WINDOW_DAYS - 1)).isoformat()
+    return {day: counters for day, counters in daily.items() if day >= cutoff}
+
+
+def _grouped(results, field):
+    rows = results.values(field).annotate(
+        tests=Count('id'), questions=Sum('total_questions'), correct=Sum('correct_answers'),
+    ).order_by()
+    return {
+        str(row[field]): [row['tests'], row['questions'] or 0, row['correct'] or 0]
+        for row in rows if row[field]
+    }
+
+
+def rebuild_test_stats(user_id):
+    """Recompute a user's summary from ``TestResult`` with grouped aggregates."""
+    results = TestResult.objects.filter(user_id=user_id)
+    totals = results.aggregate(
+        tests=Count('id'), questions=Sum('total_questions'), correct=Sum('correct_answers'),
+    )
+    today = timezone.localdate()
+    # A plain range on created_at stays on the (user, -created_at) index; __date would not
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=WINDOW_DAYS - 1), time.min))
+    recent = results.filter(created_at__gte=since)
+    stats, _ = UserTestStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'total_tests': totals['tests'],
+            'total_questions': totals['questions'] or 0,
+            'total_correct': totals['correct'] or 0,
+            'by_subject': _grouped(results, 'subject'),
+            'by_test_type': _grouped(results, 'test_type'),
+            'daily': _grouped(recent.annotate(day=TruncDate('created_at')), 'day'),
+        },
+    )
+    return stats
+
+
+def add_test_result(result):
+    """Fold a newly created result into its user's summary."""
+    with transaction.atomic():
+        stats = UserTestStats.objects.select_for_update().filter(user_id=result.user_id).first()
+        if stats is None:
+            # First result, or stats never built: the aggregate includes this result
+            return rebuild_test_stats(result.user_id)
+
+        counts = (1, result.total_questions, result.correct_answers)
+        stats.total_tests += 1
+        stats.total_questions += result.total_questions
+        stats.total_correct += result.correct_answers
+        if result.subject:
+            _add(stats.by_subject, result.subject, *counts)
+        _add(stats.by_test_type, result.test_type, *counts)
+        today = timezone.localdate()
+        _add(stats.daily, timezone.localdate(result.created_at).isoformat(), *counts)
+        stats.daily = _prune(stats.daily, today)
+        stats.save()
+    return stats
+
+
+def get_test_stats(user):
+    """The user's summary row, built on first use."""
+    stats = UserTestStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = rebuild_test_stats(user.pk)
+    return stats
+
+
+def _summary(tests, questions, correct):
+    return {
+        'total_tests': tests,
+        'total_questions': questions,
+        'total_correct': correct,
+        'accuracy': round(correct / questions * 100, 2) if questions > 0 else 0,
+    }
+
+
+def _window(daily, today, days):
+    cutoff = (today - timedelta(days=days - 1)).isoformat()
+    totals = [0, 0, 0]
+    for day, counters in daily.items():
+        if day >= cutoff:
+            for i in range(3):
+                totals[i] += counters[i]
+    return _summary(*totals)
+
+
+def stats_payload(stats):
+    """Response body for the stats endpoint."""
+    today = timezone.localdate()
+    payload = _summary(stats.total_tests, stats.total_questions, stats.total_correct)
+    payload.update({
+        'by_subject': {key: _summary(*counters) for key, counters in stats.by_subject.items()},
+        'by_test_type': {key: _summary(*counters) for key, counters in stats.by_test_type.items()},
+        'last_7_days': _window(stats.daily, today, 7),
+        'last_30_days': _window(stats.daily, today, 30),
+    })
+    return payload
@@ -0,0 +1,759 @@
+"""
+Tests for the API app.
+"""
+
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+from contextlib import ExitStack
+from datetime import timedelta
+
+import razorpay
+import requests
+from asgiref.sync import async_to_sync
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncRequestFactory, Client, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import override_settings
+
+from . import async_views
+from .benchmarking import (
+    API_REQUESTS, BENCH_METRICS_TOKEN, fake_gateway, fill_placeholders, request_within_budget, seed_api_fixtures,
+    seed_mock_tests, seed_questions, seed_test_results, stub_firebase,
+)
+from .caching import bump_version, get_version, make_key
+from .checks import missing_budgets
+from .db.pool import ConnectionPool, PoolTimeout
+from .ingest import delete_questions, iter_json_items, upsert_questions
+from .management.commands.generate_mock_test import Command as GenerateMockTest
+from .mock_blueprints import BlueprintError, bucket_index, load_blueprint
+from .payments import CircuitBreaker, GatewayUnavailable, gateway_breaker
+from .models import AdConfig, MockTest, Question, QuestionAttempt, TestResult, User, UserChapterStats
+from .progress import record_attempt, record_attempts
+from .sampling import QuestionSampler
+from .token_cache import token_cache
+
+
+def question_row(question_id, chapter, subject='Physics'):
+    return {
+        'question_id': question_id, 'question_text': f'Question {question_id}', 'subject': subject,
+        'chapter': chapter, 'difficulty': 'MEDIUM', 'options': ['A', 'B'], 'correct_index': 0,
+        'explanation': '', 'tags': [], 'image_urls': [], 'is_pyq': False, 'year': None,
+        'chapter_id': '', 'subject_id': '', 'is_premium': False,
+    }
+
+
+class IterJsonItemsTests(SimpleTestCase):
+
+    DOCUMENTS = [
+        '[1.5, 2]',
+        '[-12.5e-3,1E+2, 0 ,-0.25]',
+        ' [ {"a": [1, {"b": "c"}], "d": "e\\"]f"}, "x,y]", true, false, null ] ',
+        '[{"text": "caf\u00e9 \\u00e9", "n": 123456789}, [], {}, [[1], [2.0]]]',
+        '[]',
+        '{"question": "single", "options": [1, 2]}',
+    ]
+
+    def test_every_chunk_size_matches_json_loads(self):
+        for document in self.DOCUMENTS:
+            expected = json.loads(document)
+            if not isinstance(expected, list):
+                expected = [expected]
+            for chunk_size in range(1, len(document) + 2):
+                with self.subTest(document=document, chunk_size=chunk_size):
+                    self.assertEqual(list(iter_json_items(io.StringIO(document), chunk_size=chunk_size)), expected)
+
+    def test_truncated_array_raises(self):
+        for chunk_size in (1, 4, 64):
+            with self.subTest(chunk_size=chunk_size), self.assertRaises(json.JSONDecodeError):
+                list(iter_json_items(io.StringIO('[1, 2'), chunk_size=chunk_size))
+
+
+class RefileAttemptsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+        upsert_questions([question_row('q1', 'Kinematics'), question_row('q2', 'Kinematics')])
+        for question in Question.objects.all():
+            record_attempt(self.user, question, True, 0)
+
+    def chapter_stats(self):
+        return set(UserChapterStats.objects.values_list('chapter', 'attempted', 'solved'))
+
+    def test_reimport_moves_attempts_and_counters(self):
+        upsert_questions([question_row('q1', 'Motion')])
+
+        attempt = QuestionAttempt.objects.get(question__question_id='q1')
+        self.assertEqual((attempt.subject, attempt.chapter), ('Physics', 'Motion'))
+        self.assertEqual(self.chapter_stats(), {('Kinematics', 1, 1), ('Motion', 1, 1)})
+
+    def test_reimport_without_move_leaves_attempts(self):
+        upsert_questions([question_row('q1', 'Kinematics')])
+
+        self.assertEqual(self.chapter_stats(), {('Kinematics', 2, 2)})
+
+    def test_edit_moves_attempts(self):
+        question = Question.objects.get(question_id='q2')
+        question.chapter = 'Motion'
+        question.save()
+
+        self.assertEqual(QuestionAttempt.objects.get(question=question).chapter, 'Motion')
+        self.assertEqual(self.chapter_stats(), {('Kinematics', 1, 1), ('Motion', 1, 1)})
+
+    def test_save_without_move_skips_refile(self):
+        question = Question.objects.get(question_id='q2')
+        question.explanation = 'Edited'
+        # The save itself plus the mock test touch; no attempt lookups
+        with self.assertNumQueries(2):
+            question.save()
+
+
+class SubmitAnswerTests(TestCase):
+
+    def setUp(self):
+        firebase = stub_firebase()
+        firebase.__enter__()
+        self.addCleanup(firebase.__exit__, None, None, None)
+        token_cache.clear()
+        User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+        upsert_questions([question_row('q1', 'Kinematics')])
+        self.question = Question.objects.get()
+
+    def submit(self, is_correct):
+        return self.client.post(
+            '/api/questions/submit_answer/',
+            {'question_id': self.question.pk, 'selected_index': 1, 'is_correct': is_correct},
+            content_type='application/json', HTTP_AUTHORIZATION='Bearer u1',
+        )
+
+    def test_string_booleans_are_parsed(self):
+        for value, expected in (('false', False), ('False', False), ('0', False), ('true', True), (True, True)):
+            with self.subTest(value=value):
+                self.assertEqual(self.submit(value).status_code, 200)
+                self.assertEqual(QuestionAttempt.objects.get().is_correct, expected)
+
+    def test_invalid_or_missing_is_correct_is_rejected(self):
+        for value in ('maybe', None):
+            with self.subTest(value=value):
+                self.assertEqual(self.submit(value).status_code, 400)
+        self.assertFalse(QuestionAttempt.objects.exists())
+
+
+class DeleteQuestionsTests(TestCase):
+
+    def test_delete_is_set_based(self):
+        seed_questions(300)
+        mock_tests = seed_mock_tests(2, questions_per_test=50)
+        before = MockTest.objects.get(pk=mock_tests[0].pk).updated_at
+        version = get_version('mock-tests')
+
+        # One mock test UPDATE, one SELECT, one DELETE per related table and
+        # the question DELETEs in batches of 100, not one UPDATE per question
+        with self.assertNumQueries(10):
+            self.assertEqual(delete_questions(Question.objects.all()), 300)
+
+        self.assertGreater(MockTest.objects.get(pk=mock_tests[0].pk).updated_at, before)
+        self.assertGreater(get_version('mock-tests'), version)
+
+
+class RecordAttemptsTests(TestCase):
+
+    def test_batch_updates_and_creates_chapter_counters(self):
+        user = User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+        upsert_questions([question_row('q1', 'Kinematics'), question_row('q2', 'Kinematics'),
+                          question_row('q3', 'Motion'), question_row('q4', 'Optics')])
+        questions = {question.question_id: question for question in Question.objects.all()}
+        record_attempt(user, questions['q1'], False, 1)
+
+        record_attempts(user, [
+            {'question_id': questions[question_id].pk, 'selected_index': 0, 'is_correct': True}
+            for question_id in ('q1', 'q2', 'q3', 'q4')
+        ])
+
+        self.assertEqual(
+            set(UserChapterStats.objects.values_list('chapter', 'attempted', 'solved')),
+            {('Kinematics', 2, 2), ('Motion', 1, 1), ('Optics', 1, 1)},
+        )
+
+    def test_batch_parses_is_correct_and_rejects_bad_items(self):
+        user = User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+        upsert_questions([question_row(f'q{n}', 'Kinematics') for n in range(4)])
+        pks = [Question.objects.get(question_id=f'q{n}').pk for n in range(4)]
+
+        results = record_attempts(user, [
+            {'question_id': pks[0], 'selected_index': 0, 'is_correct': 'false'},
+            {'question_id': pks[1], 'selected_index': 0, 'is_correct': 'True'},
+            {'question_id': pks[2], 'selected_index': 0},
+            {'question_id': pks[3], 'selected_index': 0, 'is_correct': 'maybe'},
+        ])
+
+        self.assertEqual([result['status'] for result in results], ['success', 'success', 'error', 'error'])
+        self.assertEqual(
+            dict(QuestionAttempt.objects.values_list('question_id', 'is_correct')), {pks[0]: False, pks[1]: True},
+        )
+        self.assertEqual(
+            set(UserChapterStats.objects.values_list('chapter', 'attempted', 'solved')), {('Kinematics', 2, 1)},
+        )
+
+
+class LoadBlueprintTests(SimpleTestCase):
+
+    def load(self, blueprint):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(blueprint, f)
+        self.addCleanup(os.remove, f.name)
+        return load_blueprint(f.name)
+
+    def test_malformed_sections_raise_blueprint_error(self):
+        for blueprint in (
+            {'subjects': [{'subject': 'Physics', 'count': 'ten'}]},
+            {'subjects': [{'subject': 'Physics', 'count': None}]},
+            {'subjects': ['Physics']},
+            {'subjects': [{'subject': 'Physics', 'count': 10, 'chapters': {'Motion': 'high'}}]},
+        ):
+            with self.subTest(blueprint=blueprint), self.assertRaises(BlueprintError):
+                self.load(blueprint)
+
+    def test_count_is_normalised_to_int(self):
+        blueprint = self.load({'subjects': [{'subject': 'Physics', 'count': '10'}]})
+        self.assertEqual(blueprint['subjects'][0]['count'], 10)
+
+
+class SampleBucketsTests(SimpleTestCase):
+
+    def test_each_bucket_gives_its_share(self):
+        buckets = {'small': list(range(10)), 'large': list(range(100, 130)), 'tiny': [999]}
+        for seed in range(20):
+            picked = GenerateMockTest._sample_buckets(buckets, 20, random.Random(seed))
+            self.assertEqual(len(set(picked)), 20)
+            self.assertIn(sum(q < 100 for q in picked), (5, 6))
+            self.assertIn(sum(100 <= q < 999 for q in picked), (14, 15))
+
+    def test_takes_everything_when_short(self):
+        picked = GenerateMockTest._sample_buckets({'a': [1, 2], 'b': [3]}, 5, random.Random(0))
+        self.assertEqual(sorted(picked), [1, 2, 3])
+
+
+class QuestionSamplerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        seed_questions(400)
+        # Leave a wide gap in the ID sequence
+        Question.objects.filter(pk__in=list(Question.objects.order_by('id').values_list('pk', flat=True)[100:300])).delete()
+        cache.clear()
+
+    def test_large_pools_sample_from_id_windows(self):
+        sampler = QuestionSampler(max_cached_ids=10)
+        physics = set(Question.objects.filter(subject='Physics').values_list('pk', flat=True))
+
+        # Count and ID bounds for the pool, then one read of the windows
+        with self.assertNumQueries(3):
+            ids = sampler.sample_ids({'subject': 'Physics'}, 20, seed=7)
+        self.assertEqual(len(set(ids)), 20)
+        self.assertTrue(set(ids) <= physics)
+        self.assertEqual(sampler.sample_ids({'subject': 'Physics'}, 20, seed=7), ids)
+
+
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        firebase = stub_firebase()
+        firebase.__enter__()
+        self.addCleanup(firebase.__exit__, None, None, None)
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+
+    def profile(self):
+        response = self.client.get('/api/users/profile/', HTTP_AUTHORIZATION='Bearer u1')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cached_token_and_user_skip_the_database(self):
+        self.profile()
+        with self.assertNumQueries(0):
+            self.profile()
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_saving_the_user_drops_the_cached_row(self):
+        self.profile()
+        # As another worker would: a fresh instance, saved through the ORM
+        user = User.objects.get(pk=self.user.pk)
+        user.name = 'Renamed'
+        user.save()
+
+        self.assertEqual(self.profile()['name'], 'Renamed')
+
+    def test_writes_read_the_row_from_the_database(self):
+        self.profile()
+        User.objects.filter(pk=self.user.pk).update(name='Renamed')
+        response = self.client.patch(
+            '/api/users/update_profile/', {'exam_type': 'JEE'},
+            content_type='application/json', HTTP_AUTHORIZATION='Bearer u1',
+        )
+        self.assertEqual(response.json()['name'], 'Renamed')
+
+
+class BucketIndexTests(TestCase):
+
+    def test_index_is_memoised_until_a_question_changes(self):
+        cache.clear()
+        upsert_questions([question_row('q1', 'Kinematics'), question_row('q2', 'Optics')])
+        bucket_index(['Physics'])
+        with self.assertNumQueries(0):
+            index = bucket_index(['physics'])
+        self.assertEqual(set(index['physics']), {'Kinematics', 'Optics'})
+
+        question = Question.objects.get(question_id='q2')
+        question.chapter = 'Motion'
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        self.assertEqual(set(bucket_index(['Physics'])['physics']), {'Kinematics', 'Motion'})
+
+
+class MockTestListQueryTests(TestCase):
+
+    def setUp(self):
+        firebase = stub_firebase()
+        firebase.__enter__()
+        self.addCleanup(firebase.__exit__, None, None, None)
+        cache.clear()
+        token_cache.clear()
+        User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+        seed_questions(100)
+
+    def list_mock_tests(self):
+        # Drop the cached listing so every call builds it from the database
+        bump_version('mock-tests')
+        response = self.client.get('/api/mock-tests/', HTTP_AUTHORIZATION='Bearer u1')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_query_count_does_not_grow_with_tests(self):
+        seed_mock_tests(5, questions_per_test=10)
+        # Warm the token, user and entitlement caches so only the view's queries remain
+        self.list_mock_tests()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.list_mock_tests()), 5)
+
+        seed_mock_tests(5, questions_per_test=10, seed=1)
+        with self.assertNumQueries(1):
+            tests = self.list_mock_tests()
+        self.assertEqual(len(tests), 10)
+        self.assertEqual({test['question_count'] for test in tests}, {10})
+
+
+class CachedResponseTests(TestCase):
+
+    def setUp(self):
+        firebase = stub_firebase()
+        firebase.__enter__()
+        self.addCleanup(firebase.__exit__, None, None, None)
+        cache.clear()
+        token_cache.clear()
+        User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+        self.banner = AdConfig.objects.create(ad_unit_id='unit-1', ad_type='BANNER')
+        AdConfig.objects.create(ad_unit_id='unit-2', ad_type='BANNER')
+
+    def list_ads(self, **headers):
+        return self.client.get('/api/ads/', HTTP_AUTHORIZATION='Bearer u1', **headers)
+
+    def expire_fingerprint(self):
+        # As CATALOG_FINGERPRINT_TTL running out would
+        cache.delete(make_key('ad-configs', 'fingerprint'))
+
+    def test_matching_etag_gets_304(self):
+        response = self.list_ads()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                revalidated = self.list_ads(HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated.content, b'')
+                self.assertEqual(revalidated['ETag'], etag)
+
+        self.assertEqual(self.list_ads(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_gzip_is_served_when_accepted(self):
+        plain = self.list_ads()
+        compressed = self.list_ads(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed['ETag'], plain['ETag'])
+        self.assertNotEqual(compressed.content, plain.content)
+
+    def test_fingerprint_catches_an_update_the_signals_missed(self):
+        etag = self.list_ads()['ETag']
+        # A queryset update sends no post_save, so the namespace is not bumped
+        AdConfig.objects.filter(pk=self.banner.pk).update(
+            frequency=9, updated_at=self.banner.updated_at + timedelta(seconds=1),
+        )
+        self.assertEqual(self.list_ads(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.expire_fingerprint()
+        response = self.list_ads(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(9, [ad['frequency'] for ad in response.json()['results']])
+
+    def test_fingerprint_catches_a_delete_the_signals_missed(self):
+        etag = self.list_ads()['ETag']
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {AdConfig._meta.db_table} WHERE id = %s', [self.banner.pk])
+        self.expire_fingerprint()
+
+        response = self.list_ads(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([ad['ad_unit_id'] for ad in response.json()['results']], ['unit-2'])
+
+    def test_saving_through_the_orm_invalidates_at_once(self):
+        etag = self.list_ads()['ETag']
+        self.banner.delete()
+        response = self.list_ads(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        firebase = stub_firebase()
+        firebase.__enter__()
+        self.addCleanup(firebase.__exit__, None, None, None)
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+
+    def get(self, path):
+        response = self.client.get(path, HTTP_AUTHORIZATION='Bearer u1')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def page_through(self, path, limit):
+        ids, pages = [], 0
+        page = self.get(f'{path}&limit={limit}')
+        while True:
+            pages += 1
+            self.assertLessEqual(len(page['results']), limit)
+            ids.extend(row['id'] for row in page['results'])
+            if page['next_cursor'] is None:
+                self.assertIsNone(page['next'])
+                return ids, pages
+            page = self.get(f"{path}&limit={limit}&cursor={page['next_cursor']}")
+
+    def test_history_pages_break_timestamp_ties_by_id(self):
+        seed_questions(20)
+        seed_test_results([self.user], 9, questions_per_test=3)
+        results = list(TestResult.objects.order_by('id'))
+        # Two groups of results sharing a created_at, as a batch import would leave them
+        TestResult.objects.filter(pk__in=[r.pk for r in results[:5]]).update(created_at=results[0].created_at)
+        TestResult.objects.filter(pk__in=[r.pk for r in results[5:]]).update(created_at=results[-1].created_at)
+        expected = list(TestResult.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+        for limit in (1, 2, 4, 9, 20):
+            with self.subTest(limit=limit):
+                ids, pages = self.page_through('/api/tests/history/?', limit)
+                self.assertEqual(ids, expected)
+                self.assertEqual(pages, max(1, -(-len(expected) // limit)))
+
+    def test_question_pages_break_difficulty_ties_by_id(self):
+        seed_questions(60)
+        rank = {'EASY': 1, 'MEDIUM': 2, 'HARD': 3}
+        expected = [
+            pk for _, pk in sorted(
+                (rank[difficulty], pk)
+                for pk, difficulty in Question.objects.filter(subject='Physics').values_list('pk', 'difficulty')
+            )
+        ]
+
+        # 15 questions: a limit of 5 ends on a full last page with no next cursor
+        for limit in (1, 4, 5, 15):
+            with self.subTest(limit=limit):
+                ids, _ = self.page_through('/api/questions/?subject=Physics', limit)
+                self.assertEqual(ids, expected)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/tests/history/?cursor=bm90LWpzb24', HTTP_AUTHORIZATION='Bearer u1')
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryBudgetTests(TransactionTestCase):
+    # Not TestCase: its wrapping transaction turns each BEGIN into a
+    # SAVEPOINT/RELEASE pair and every write path would count one more query
+
+    def setUp(self):
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        stack.enter_context(stub_firebase())
+        gateway_url = stack.enter_context(fake_gateway(latency=0))
+        stack.enter_context(override_settings(
+            ALLOWED_HOSTS=['*'], METRICS_TOKEN=BENCH_METRICS_TOKEN, QUERY_BUDGET_MODE='raise',
+            RAZORPAY_BASE_URL=gateway_url,
+        ))
+        cache.clear()
+        token_cache.clear()
+        self.fixtures = seed_api_fixtures()
+
+    def request(self, method, path, body, uid=None):
+        client = Client(raise_request_exception=True, HTTP_AUTHORIZATION=f"Bearer {uid or self.fixtures['uid']}")
+        cache.clear()
+        return request_within_budget(
+            client, method, fill_placeholders(path, self.fixtures), fill_placeholders(body, self.fixtures),
+        )
+
+    def test_every_route_within_budget(self):
+        for method, path, body in API_REQUESTS:
+            with self.subTest(method=method, path=path):
+                result = self.request(method, path, body)
+                self.assertTrue(result['ok'], result['error'])
+
+    def test_first_test_result_within_budget(self):
+        # The second user has results but no summary row, so the create rebuilds it
+        other = User.objects.get(pk=self.fixtures['other_user'])
+        result = self.request('POST', '/api/tests/', {
+            'test_type': 'CHAPTER', 'subject': '{subject}', 'chapter': '{chapter}', 'score': 8,
+            'total_questions': 3, 'correct_answers': 2, 'time_taken': 90, 'question_reviews': [],
+        }, uid=other.firebase_uid)
+        self.assertTrue(result['ok'], result['error'])
+
+    def test_every_route_has_budget(self):
+        self.assertEqual(missing_budgets(), [])
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        self.calls = 0
+
+    def gateway(self, error=None):
+        self.calls += 1
+        if error is not None:
+            raise error
+        return 'ok'
+
+    def fail(self):
+        with self.assertRaises(GatewayUnavailable):
+            self.breaker.call(self.gateway, requests.ConnectionError('down'))
+
+    def expire(self):
+        self.breaker.opened_at -= self.breaker.reset_timeout
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        self.fail()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.fail()
+        self.assertEqual(self.breaker.state, 'open')
+
+        with self.assertRaises(GatewayUnavailable):
+            self.breaker.call(self.gateway)
+        self.assertEqual(self.calls, 2)
+
+    def test_half_open_trial_success_closes(self):
+        self.fail()
+        self.fail()
+        self.expire()
+        self.assertEqual(self.breaker.state, 'half-open')
+
+        self.assertEqual(self.breaker.call(self.gateway), 'ok')
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_half_open_trial_failure_reopens(self):
+        self.fail()
+        self.fail()
+        self.expire()
+
+        self.fail()
+        self.assertEqual(self.breaker.state, 'open')
+
+    def test_only_one_trial_at_a_time(self):
+        self.fail()
+        self.fail()
+        self.expire()
+
+        def concurrent_call():
+            # A second request arriving while the trial is still running
+            with self.assertRaises(GatewayUnavailable):
+                self.breaker.call(self.gateway)
+            return 'ok'
+
+        self.assertEqual(self.breaker.call(concurrent_call), 'ok')
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_bad_request_counts_as_success(self):
+        self.fail()
+        with self.assertRaises(razorpay.errors.BadRequestError):
+            self.breaker.call(self.gateway, razorpay.errors.BadRequestError('bad'))
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_unrelated_error_releases_the_trial(self):
+        self.fail()
+        self.fail()
+        self.expire()
+        with self.assertRaises(KeyError):
+            self.breaker.call(self.gateway, KeyError('bug'))
+
+        self.assertFalse(self.breaker.trial_running)
+        self.assertEqual(self.breaker.call(self.gateway), 'ok')
+
+
+class CreateOrderTests(TestCase):
+
+    def setUp(self):
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        stack.enter_context(stub_firebase())
+        self.gateway_url = stack.enter_context(fake_gateway(latency=0))
+        stack.enter_context(override_settings(RAZORPAY_BASE_URL=self.gateway_url))
+        cache.clear()
+        token_cache.clear()
+        gateway_breaker.record_success()
+        self.addCleanup(gateway_breaker.record_success)
+        self.user = User.objects.create(firebase_uid='u1', email='u1@example.com', name='U1', exam_type='NEET')
+
+    def create_order(self, plan='DAILY_PRACTICE'):
+        return self.client.post(
+            '/api/subscriptions/create_order/', {'plan': plan},
+            content_type='application/json', HTTP_AUTHORIZATION='Bearer u1',
+        )
+
+    def test_retry_gets_the_same_order(self):
+        first = self.create_order()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.create_order().json()['order_id'], first.json()['order_id'])
+        self.assertNotEqual(self.create_order(plan='FULL_ACCESS').json()['order_id'], first.json()['order_id'])
+
+    def test_async_view_replays_the_same_order(self):
+        order_id = self.create_order().json()['order_id']
+        request = AsyncRequestFactory().post(
+            '/api/subscriptions/create_order/', {'plan': 'DAILY_PRACTICE'}, content_type='application/json',
+        )
+        request._firebase_user = self.user
+        response = async_to_sync(async_views.create_order)(request)
+        self.assertEqual(json.loads(response.content)['order_id'], order_id)
+
+    def test_concurrent_duplicate_is_turned_away(self):
+        cache.add(f'razorpay-order:{self.user.pk}:DAILY_PRACTICE:lock', 1)
+        self.assertEqual(self.create_order().status_code, 409)
+
+    def test_gateway_failures_open_the_breaker_and_it_recovers(self):
+        with override_settings(RAZORPAY_BASE_URL=f'{self.gateway_url}/status/500'):
+            for _ in range(gateway_breaker.failure_threshold):
+                self.assertEqual(self.create_order().status_code, 503)
+            # The lock is released after a failure, so retries reach the breaker
+            self.assertEqual(gateway_breaker.state, 'open')
+
+        # The gateway is back, but the circuit stays open until the reset timeout
+        self.assertEqual(self.create_order().status_code, 503)
+        gateway_breaker.opened_at -= gateway_breaker.reset_timeout
+        self.assertEqual(self.create_order().status_code, 200)
+        self.assertEqual(gateway_breaker.state, 'closed')
+
+
+class FakeConnection:
+
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.opened = []
+
+    def factory(self):
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+    def pool(self, **options):
+        options = {'size': 2, 'max_overflow': 1, 'timeout': 0.05, **options}
+        return ConnectionPool(self.factory, **options)
+
+    def test_returned_connections_are_lent_out_again(self):
+        pool = self.pool()
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(pool.getconn(), first)
+        self.assertEqual(len(self.opened), 1)
+
+        second = pool.getconn()
+        self.assertIsNot(second, first)
+        stats = pool.stats()
+        self.assertEqual((stats['open'], stats['checked_out'], stats['checkouts'], stats['connects']), (2, 2, 3, 2))
+
+    def test_exhausted_pool_times_out(self):
+        pool = self.pool()
+        held = [pool.getconn() for _ in range(3)]
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        stats = pool.stats()
+        self.assertEqual((stats['open'], stats['peak_open'], stats['waits'], stats['timeouts']), (3, 3, 1, 1))
+
+        # A slot freed by a return is usable again
+        pool.putconn(held[0])
+        self.assertIs(pool.getconn(), held[0])
+
+    def test_waiter_gets_a_connection_returned_by_another_thread(self):
+        pool = self.pool(size=1, max_overflow=0, timeout=5)
+        held = pool.getconn()
+        returner = threading.Timer(0.05, pool.putconn, [held])
+        returner.start()
+        self.addCleanup(returner.join)
+
+        self.assertIs(pool.getconn(), held)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_overflow_connections_are_closed_on_return(self):
+        pool = self.pool()
+        held = [pool.getconn() for _ in range(3)]
+        for connection in held:
+            pool.putconn(connection)
+        self.assertEqual([c.closed for c in held], [False, False, True])
+        stats = pool.stats()
+        self.assertEqual((stats['open'], stats['idle'], stats['discards']), (2, 2, 1))
+
+    def test_unusable_connections_are_replaced(self):
+        pool = self.pool(reset=lambda connection: False)
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.getconn(), first)
+        self.assertEqual(pool.stats()['open'], 1)
+
+        pool = self.pool(ping=lambda connection: connection.number != 2)
+        stale = pool.getconn()
+        pool.putconn(stale)
+        self.assertIsNot(pool.getconn(), stale)
+        self.assertTrue(stale.closed)
+
+    def test_failed_connect_gives_the_slot_back(self):
+        def refuse():
+            raise OSError('refused')
+
+        pool = ConnectionPool(refuse, size=1, max_overflow=0, timeout=0.05)
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                pool.getconn()
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_close_all_closes_idle_connections(self):
+        pool = self.pool()
+        idle, held = pool.getconn(), pool.getconn()
+        pool.putconn(idle)
+        pool.close_all()
+        self.assertTrue(idle.closed)
+        self.assertFalse(held.closed)
+        self.assertEqual(pool.stats()['open'], 1)
@@ -0,0 +1,108 @@
+"""
+In-process cache of verified Firebase ID tokens.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache mapping a token digest to its decoded claims and user pk.
+
+    Only the outcome of signature verification is cached here; the user
+    row itself lives in the shared cache (``api.user_cache``), so a change
+    made by another process is seen at once. Entries expire at the token's own ``exp`` claim or after
+    ``max_ttl`` seconds, whichever comes first. All access is guarded by a
+    lock so the cache can be shared between gunicorn threads.
+    """
+
+    def __init__(self, max_size=1024, max_ttl=300):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token):
+        """Hash the raw token so it is never kept in memory as-is."""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        """Return ``(claims, user_pk)`` for a cached token, or ``None``."""
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, user_pk, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return claims, user_pk
+
+    def set(self, token, claims, user_pk):
+        """Cache a verified token until its expiry (capped by ``max_ttl``)."""
+        if self.max_size <= 0:
+            return
+        now = time.time()
+        expires_at = now + self.max_ttl
+        if claims.get('exp'):
+            expires_at = min(expires_at, float(claims['exp']))
+        if expires_at <= now:
+            return
+
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (claims, user_pk, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_uid(self, firebase_uid):
+        """Drop every cached token belonging to a Firebase user."""
+        with self._lock:
+            stale = [
+                key for key, (claims, _, _) in self._entries.items()
+                if claims.get('uid') == firebase_uid
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+
+token_cache = VerifiedTokenCache(
+    max_size=settings.FIREBASE_TOKEN_CACHE_SIZE,
+    max_ttl=settings.FIREBASE_TOKEN_CACHE_TTL,
+)
@@ -2,12 +2,14 @@
 URL configuration for API app.
 """
 
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     UserViewSet, QuestionViewSet, MockTestViewSet, TestResultViewSet,
     UserProgressViewSet, SubscriptionViewSet, SubscriptionPlanViewSet, AdConfigViewSet,
-    DailyPracticeViewSet
+    DailyPracticeViewSet, database_health, metrics
 )
 
 router = DefaultRouter()
@@ -22,5 +24,17 @@ router.register(r'daily-practice', DailyPracticeViewSet, basename='daily-practic
 router.register(r'ads', AdConfigViewSet, basename='ad')
 
 urlpatterns = [
+    path('_health/db/', database_health, name='database-health'),
+    path('_metrics/', metrics, name='metrics'),
+]
+
+if settings.ASYNC_VIEWS:
+    # Under ASGI, these take over the SubscriptionViewSet actions' URLs
+    urlpatterns += [
+        path('subscriptions/create_order/', async_views.create_order, name='subscription-create-order'),
+        path('subscriptions/verify_payment/', async_views.verify_payment, name='subscription-verify-payment'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
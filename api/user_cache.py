@@ -0,0 +1,44 @@
+"""
+Shared cache of ``User`` rows for request authentication.
+
+Rows live in the Django cache, so with a shared backend every worker sees
+the same copy, and a save or delete anywhere drops it for all of them
+(see ``api.signals``). Each read unpickles a fresh instance, so requests
+never share model state.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import User
+
+
+def _cache_key(user_id):
+    return f'user:{user_id}'
+
+
+def remember_user(user):
+    """Cache a row just read from the database."""
+    cache.set(_cache_key(user.pk), user, settings.USER_CACHE_TTL)
+    return user
+
+
+def get_cached_user(user_id):
+    """Return the user row, reading the database only on a cache miss."""
+    user = cache.get(_cache_key(user_id))
+    if user is None:
+        user = fetch_user(user_id)
+    return user
+
+
+def fetch_user(user_id):
+    """Read the user row from the database and refresh the cached copy."""
+    return remember_user(User.objects.get(pk=user_id))
+
+
+def invalidate_user(user_id):
+    """Drop the cached row now and again once the current transaction commits."""
+    # The second delete covers a reader that re-cached the old row before commit
+    cache.delete(_cache_key(user_id))
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
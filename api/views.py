@@ -2,22 +2,51 @@
 API Views for PrepShark.
 """
 
+import hmac
+import logging
+
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import JSONRenderer
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Q
-import razorpay
+from django.db import DatabaseError, connection
+from django.db.models import Q, Count
+from django.core.cache import cache
 from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
 
-from .models import User, Subscription, Question, MockTest, TestResult, UserProgress, AdConfig, QuestionAttempt, SubscriptionPlan
+from .models import User, Subscription, Question, MockTest, TestResult, UserProgress, AdConfig, QuestionAttempt, SubscriptionPlan, UserChapterStats
 from .serializers import (
     UserSerializer, SubscriptionSerializer, QuestionSerializer,
     QuestionListSerializer, MockTestListSerializer, MockTestDetailSerializer,
-    TestResultSerializer, UserProgressSerializer, AdConfigSerializer, SubscriptionPlanSerializer
+    TestResultSerializer, TestResultSummarySerializer, UserProgressSerializer, AdConfigSerializer, SubscriptionPlanSerializer
+)
+from .pagination import QuestionCursorPagination, TestHistoryPagination, stream_json_array
+from .sampling import question_sampler
+from .db.pool import pool_stats
+from .caching import CachedResponseMixin, compress_body, make_key, serve_cached_body
+from .mock_tests import get_detail_body
+from .daily_practice import get_paper_questions
+from .payments import (
+    GatewayUnavailable, OrderInProgress, activate_subscription, activation_response, get_or_create_order,
+    order_amount, order_response,
 )
+from .test_stats import add_test_result, get_test_stats, rebuild_test_stats, stats_payload
+from .progress import (
+    MAX_BATCH_ANSWERS, parse_is_correct, record_attempt, record_attempts, reset_chapter as reset_chapter_progress,
+)
+from .log import dropped_records, log_event
+from .metrics import metric_lines, registry, timed
+from .query_budget import query_budget
+from .token_cache import token_cache
+
+
+logger = logging.getLogger(__name__)
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -25,17 +54,24 @@ class UserViewSet(viewsets.ModelViewSet):
     
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    # Entitlements are looked up per listed user on a cold cache
+    query_budgets = {
+        'list': 5, 'retrieve': 3, 'create': 3, 'update': 5, 'partial_update': 4,
+        # Two user reads, the cascade collector's lookups, then one DELETE per
+        # table that references the user
+        'destroy': 12,
+        'register': 3, 'profile': 2, 'update_profile': 3,
+    }
     
     @action(detail=False, methods=['post'])
     def register(self, request):
         """Register a new user profile or return existing one."""
-        print(f"DEBUG: Registration request data: {request.data}")
         firebase_uid = request.data.get('firebase_uid')
         
         # Check if user already exists
         try:
             user = User.objects.get(firebase_uid=firebase_uid)
-            print(f"DEBUG: User already exists: {user.email}, firebase_uid={user.firebase_uid}")
+            log_event(logger, logging.INFO, 'user_register_existing', user_id=user.pk)
             serializer = self.get_serializer(user)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except User.DoesNotExist:
@@ -43,7 +79,7 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             user = serializer.save()
-            print(f"DEBUG: User registered: {user.email}, firebase_uid={user.firebase_uid}")
+            log_event(logger, logging.INFO, 'user_registered', user_id=user.pk)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     @action(detail=False, methods=['get'])
@@ -65,12 +101,26 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
+class QuestionViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Question management."""
     
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
     pagination_class = None  # Disable pagination to return plain arrays
+    cache_namespace = 'questions'
+    cache_models = (Question,)
+    cache_actions = ()  # Only the chapters/count catalog actions are cached
+    # The streamed list runs its query after the view returns
+    query_budgets = {
+        'list': 1, 'retrieve': 1, 'by_ids': 1, 'solved_ids': 2,
+        'chapter_stats': 2, 'reset_chapter': 3, 'random': 3, 'chapters': 2, 'count': 2,
+        # Question read, locked previous attempt, update_or_create in savepoints,
+        # then the counter UPDATE; the first answer in a chapter also INSERTs it
+        'submit_answer': 13,
+        # Fixed however many chapters the batch spans: questions, locked previous
+        # attempts, one upsert, then counter SELECT, UPDATE and savepointed INSERT
+        'submit_answers': 9,
+    }
     
     def get_serializer_class(self):
         """Use simplified serializer for list view."""
@@ -78,30 +128,38 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
             return QuestionListSerializer
         return QuestionSerializer
     
-    def get_queryset(self):
-        """Filter questions based on user subscription and query params."""
-        queryset = Question.objects.all()
-        user = self.request.user
-        
-        # Filter premium questions for free users
-        # if not user.is_premium:
-        #     queryset = queryset.filter(is_premium=False)
-        pass # TEMPORARY: Allow access to all questions
+    def get_question_filters(self):
+        """Build ORM filters from the subject/chapter/difficulty query params."""
+        filters = {}
         
         # Filter by subject
         subject = self.request.query_params.get('subject')
         if subject:
-            queryset = queryset.filter(subject=subject)
+            filters['subject'] = subject
         
         # Filter by chapter
         chapter = self.request.query_params.get('chapter')
         if chapter:
-            queryset = queryset.filter(chapter=chapter)
+            filters['chapter'] = chapter
         
         # Filter by difficulty
         difficulty = self.request.query_params.get('difficulty')
         if difficulty:
-            queryset = queryset.filter(difficulty=difficulty.upper())
+            filters['difficulty'] = difficulty.upper()
+        
+        return filters
+    
+    def get_queryset(self):
+        """Filter questions based on user subscription and query params."""
+        queryset = Question.objects.all()
+        user = self.request.user
+        
+        # Filter premium questions for free users
+        # if not user.is_premium:
+        #     queryset = queryset.filter(is_premium=False)
+        pass # TEMPORARY: Allow access to all questions
+        
+        queryset = queryset.filter(**self.get_question_filters())
             
         # Sort by difficulty: Easy -> Medium -> Hard
         # We use Case/When to assign numeric values for sorting
@@ -118,6 +176,24 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """
+        List questions as a streamed plain array.
+        
+        Passing ``limit`` and/or ``cursor`` switches to keyset pagination
+        and returns ``{'next', 'next_cursor', 'results'}`` instead.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer_class = self.get_serializer_class()
+        
+        if QuestionCursorPagination.is_requested(request):
+            paginator = QuestionCursorPagination()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+            return paginator.get_paginated_response(serializer.data)
+        
+        return stream_json_array(queryset, serializer_class, context=self.get_serializer_context())
+    
     @action(detail=False, methods=['post'])
     def by_ids(self, request):
         """Get multiple questions by their IDs."""
@@ -138,21 +214,18 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         
         if not question_id or selected_index is None:
             return Response({'error': 'Missing required fields'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            is_correct = parse_is_correct(is_correct)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
         try:
             # Use filter().first() to avoid error if question doesn't exist (though it should)
             # Or get_object_or_404
             question = Question.objects.get(id=question_id)
             
-            # Update or create attempt
-            attempt, created = QuestionAttempt.objects.update_or_create(
-                user=request.user,
-                question=question,
-                defaults={
-                    'is_correct': is_correct,
-                    'selected_index': selected_index
-                }
-            )
+            # Update or create attempt (and the chapter counters) atomically
+            attempt = record_attempt(request.user, question, is_correct, selected_index)
             
             return Response({'status': 'success', 'attempt_id': attempt.id})
         except Question.DoesNotExist:
@@ -160,6 +233,23 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def submit_answers(self, request):
+        """Submit a batch of answers in one request."""
+        answers = request.data if isinstance(request.data, list) else request.data.get('answers')
+        
+        if not isinstance(answers, list) or not answers:
+            return Response({'error': 'No answers provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(answers) > MAX_BATCH_ANSWERS:
+            return Response(
+                {'error': f'At most {MAX_BATCH_ANSWERS} answers per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = record_attempts(request.user, answers)
+        saved = sum(1 for result in results if result['status'] == 'success')
+        return Response({'status': 'success', 'saved': saved, 'results': results})
+
     @action(detail=False, methods=['get'])
     def solved_ids(self, request):
         """Get IDs of solved questions for a chapter."""
@@ -168,14 +258,22 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         
         if not subject or not chapter:
             return Response({'error': 'Subject and chapter required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Counters let us skip the join entirely for untouched chapters
+        solved_count = UserChapterStats.objects.filter(
+            user=request.user, subject=subject, chapter=chapter
+        ).values_list('solved', flat=True).first()
+        if not solved_count:
+            return Response([])
             
-        # Get IDs of questions where is_correct=True
+        # Get IDs of questions where is_correct=True (subject/chapter are
+        # copied onto attempts, so no join to questions)
         solved_ids = QuestionAttempt.objects.filter(
             user=request.user,
-            question__subject=subject,
-            question__chapter=chapter,
+            subject=subject,
+            chapter=chapter,
             is_correct=True
-        ).values_list('question_id', flat=True)
+        ).order_by().values_list('question_id', flat=True)  # A set; skip the attempted_at sort
         
         return Response(list(solved_ids))
 
@@ -186,18 +284,21 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         if not subject:
             return Response({'error': 'Subject is required'}, status=status.HTTP_400_BAD_REQUEST)
             
-        # Optimize: Use aggregation instead of looping through chapters
-        from django.db.models import Count
-        
-        # 1. Get total questions per chapter
-        total_counts = Question.objects.filter(subject=subject).values('chapter').annotate(total=Count('id'))
+        # 1. Get total questions per chapter (shared by all users, cached
+        #    until any question changes)
+        cache_key = make_key('questions', 'chapter-totals', subject)
+        total_counts = cache.get(cache_key)
+        if total_counts is None:
+            total_counts = list(
+                Question.objects.filter(subject=subject).values('chapter').annotate(total=Count('id')).order_by()
+            )
+            cache.set(cache_key, total_counts, 3600)
         
-        # 2. Get solved questions per chapter for this user
-        solved_counts = QuestionAttempt.objects.filter(
+        # 2. Get solved questions per chapter for this user (one indexed lookup)
+        solved_counts = UserChapterStats.objects.filter(
             user=request.user,
-            question__subject=subject,
-            is_correct=True
-        ).values('question__chapter').annotate(solved=Count('id'))
+            subject=subject,
+        ).values('chapter', 'solved')
         
         # 3. Merge results
         stats = {}
@@ -213,7 +314,7 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
             
         # Update with solved counts
         for item in solved_counts:
-            chapter = item['question__chapter']
+            chapter = item['chapter']
             if chapter in stats:
                 stats[chapter]['solved'] = item['solved']
                 
@@ -228,26 +329,26 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         if not subject or not chapter:
             return Response({'error': 'Subject and chapter required'}, status=status.HTTP_400_BAD_REQUEST)
             
-        # Delete attempts for this chapter
-        deleted_count, _ = QuestionAttempt.objects.filter(
-            user=request.user,
-            question__subject=subject,
-            question__chapter=chapter
-        ).delete()
+        # Delete attempts and counters for this chapter
+        deleted_count = reset_chapter_progress(request.user, subject, chapter)
         
         return Response({'status': 'success', 'deleted_count': deleted_count})
 
     @action(detail=False, methods=['get'])
     def random(self, request):
-        """Get random questions."""
+        """Get random questions, optionally repeatable via ?seed=."""
         count = int(request.query_params.get('count', 10))
-        queryset = self.get_queryset().order_by('?')[:count]
-        serializer = QuestionListSerializer(queryset, many=True)
+        seed = request.query_params.get('seed')
+        questions = question_sampler.sample(self.get_question_filters(), count, seed=seed)
+        serializer = QuestionListSerializer(questions, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def chapters(self, request):
         """Get list of chapters for a subject."""
+        return self.cached_response(request, lambda: self.build_chapters(request))
+    
+    def build_chapters(self, request):
         subject = request.query_params.get('subject')
         if not subject:
             return Response({'error': 'Subject is required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -268,6 +369,7 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         #     is_unlocked_all = True
         
         # TEMPORARY: Unlock all chapters for everyone
+        # (if this becomes per-user again, vary the cache key in get_cache_key)
         is_unlocked_all = True
         
         # Specific chapters that are always free
@@ -313,6 +415,9 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def count(self, request):
         """Get question count for a subject/chapter."""
+        return self.cached_response(request, lambda: self.build_count(request))
+    
+    def build_count(self, request):
         queryset = self.get_queryset()
         
         subject = request.query_params.get('subject')
@@ -332,6 +437,7 @@ class MockTestViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = MockTest.objects.all()
     serializer_class = MockTestListSerializer
     pagination_class = None  # Disable pagination
+    query_budgets = {'list': 1, 'retrieve': 3}
     
     def get_serializer_class(self):
         """Use detail serializer for retrieve action."""
@@ -339,6 +445,11 @@ class MockTestViewSet(viewsets.ReadOnlyModelViewSet):
             return MockTestDetailSerializer
         return MockTestListSerializer
     
+    def retrieve(self, request, *args, **kwargs):
+        """Serve the pre-rendered detail payload, honouring If-None-Match."""
+        mock_test = get_object_or_404(self.get_queryset().only('id', 'updated_at'), pk=kwargs['pk'])
+        return serve_cached_body(request, get_detail_body(mock_test))
+    
     def get_queryset(self):
         """Filter mock tests based on user subscription and exam type."""
         queryset = MockTest.objects.all()
@@ -347,7 +458,7 @@ class MockTestViewSet(viewsets.ReadOnlyModelViewSet):
         # Filter premium tests for free users
         # Filter premium tests for free users
         # Check if user has mock test master plan, combo, or yearly elite
-        has_mock_access = any(plan in user.active_plans for plan in ['MOCK_TEST_MASTER', 'CHAPTER_MOCK_COMBO', 'YEARLY_ELITE'])
+        # (see has_mock_access(); only evaluated if a filter below needs it)
         
         # Mock tests are now accessible to everyone (Ad-Supported)
         # But we might still want to differentiate "Premium" mocks if any?
@@ -375,7 +486,7 @@ class MockTestViewSet(viewsets.ReadOnlyModelViewSet):
         # A safer bet for code: Allow access to ALL tests, but frontend handles Ads.
         
         # So, we remove the filter:
-        # if not has_mock_access:
+        # if not self.has_mock_access():
         #    queryset = queryset.filter(is_premium=False)
         
         # Actually, let's keep the filter IF there are truly "Premium Only" tests that even Ads don't unlock.
@@ -391,7 +502,27 @@ class MockTestViewSet(viewsets.ReadOnlyModelViewSet):
         if user.exam_type:
             queryset = queryset.filter(exam_type=user.exam_type)
         
+        if self.action == 'list':
+            # One GROUP BY query instead of a COUNT per row for question_count
+            # (GROUP BY queries drop Meta.ordering, so restate it)
+            queryset = queryset.annotate(num_questions=Count('questions')).order_by(*MockTest._meta.ordering)
+        
         return queryset
+    
+    def has_mock_access(self):
+        """Check if user has mock test master plan, combo, or yearly elite."""
+        return any(plan in self.request.user.active_plans for plan in ['MOCK_TEST_MASTER', 'CHAPTER_MOCK_COMBO', 'YEARLY_ELITE'])
+    
+    def list(self, request, *args, **kwargs):
+        """List mock tests for the user's exam type from a short-lived shared cache."""
+        cache_key = make_key('mock-tests', 'list', request.user.exam_type or '')
+        body = cache.get(cache_key)
+        if body is None:
+            serializer = self.get_serializer(self.get_queryset(), many=True)
+            with timed('serialize'):
+                body = compress_body(JSONRenderer().render(serializer.data))
+            cache.set(cache_key, body, settings.MOCK_TEST_LIST_TTL)
+        return serve_cached_body(request, body)
 
 
 
@@ -401,39 +532,72 @@ class TestResultViewSet(viewsets.ModelViewSet):
     queryset = TestResult.objects.all()
     serializer_class = TestResultSerializer
     pagination_class = None  # Disable pagination
+    # Edits and deletes rebuild the user's stats row
+    query_budgets = {
+        'list': 1, 'retrieve': 1, 'history': 1,
+        # Summary read; the first read for a user builds the row from four
+        # aggregates and a savepointed INSERT
+        'stats': 10,
+        # Result and reviews INSERTs plus the locked summary fold; a user's first
+        # result rebuilds the summary instead
+        'create': 15,
+        # Result read and write, reviews rewrite, then the summary rebuild
+        'update': 14,
+        # As update, minus the reviews rewrite
+        'partial_update': 10,
+        # Reviews and result DELETEs, then the summary rebuild
+        'destroy': 11,
+    }
     
     def get_queryset(self):
         """Get test results for current user."""
-        return TestResult.objects.filter(user=self.request.user)
+        queryset = TestResult.objects.filter(user=self.request.user)
+        if self.action == 'retrieve':
+            # Reviews only ever load on the detail view, in the same query
+            queryset = queryset.select_related('reviews')
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action in ('list', 'history'):
+            return TestResultSummarySerializer
+        return TestResultSerializer
     
     def perform_create(self, serializer):
         """Save test result and update user progress."""
-        serializer.save(user=self.request.user)
+        result = serializer.save(user=self.request.user)
+        add_test_result(result)
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        rebuild_test_stats(self.request.user.pk)
+    
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        rebuild_test_stats(self.request.user.pk)
+    
+    def list(self, request, *args, **kwargs):
+        """
+        List test summaries (without reviews), newest first.
+        
+        Passing ``limit`` and/or ``cursor`` switches to keyset pagination
+        and returns ``{'next', 'next_cursor', 'results'}`` instead.
+        """
+        results = self.get_queryset()
+        if TestHistoryPagination.is_requested(request):
+            paginator = TestHistoryPagination()
+            page = paginator.paginate_queryset(results, request, view=self)
+            return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(results, many=True).data)
     
     @action(detail=False, methods=['get'])
     def history(self, request):
-        """Get test history."""
-        results = self.get_queryset()
-        serializer = self.get_serializer(results, many=True)
-        return Response(serializer.data)
+        """Get test history as lightweight summaries; see ``list`` for pagination."""
+        return self.list(request)
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get user statistics."""
-        user = request.user
-        results = self.get_queryset()
-        
-        total_tests = results.count()
-        total_questions = sum(r.total_questions for r in results)
-        total_correct = sum(r.correct_answers for r in results)
-        accuracy = (total_correct / total_questions * 100) if total_questions > 0 else 0
-        
-        return Response({
-            'total_tests': total_tests,
-            'total_questions': total_questions,
-            'total_correct': total_correct,
-            'accuracy': round(accuracy, 2),
-        })
+        """Get user statistics, with per-subject, per-test-type and 7/30-day breakdowns."""
+        return Response(stats_payload(get_test_stats(request.user)))
 
 
 class UserProgressViewSet(viewsets.ModelViewSet):
@@ -442,6 +606,7 @@ class UserProgressViewSet(viewsets.ModelViewSet):
     queryset = UserProgress.objects.all()
     serializer_class = UserProgressSerializer
     pagination_class = None  # Disable pagination
+    query_budgets = {'list': 1, 'retrieve': 1, 'create': 1, 'update': 2, 'partial_update': 2, 'destroy': 2}
     
     def get_queryset(self):
         """Get progress for current user."""
@@ -452,12 +617,16 @@ class UserProgressViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class SubscriptionPlanViewSet(viewsets.ReadOnlyModelViewSet):
+class SubscriptionPlanViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Subscription plans."""
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [AllowAny]  # Allow anyone to see plans
     pagination_class = None  # Disable pagination
+    cache_namespace = 'subscription-plans'
+    cache_models = (SubscriptionPlan,)
+    cache_control = 'public, no-cache'  # Same for every user
+    query_budgets = {'list': 2, 'retrieve': 2}
 
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
@@ -465,6 +634,10 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     
     queryset = Subscription.objects.all()
     serializer_class = SubscriptionSerializer
+    query_budgets = {
+        'list': 2, 'retrieve': 1, 'create': 2, 'update': 2, 'partial_update': 2, 'destroy': 3,
+        'status': 2, 'create_order': 1, 'verify_payment': 3,
+    }
     
     def get_queryset(self):
         """Get subscriptions for current user."""
@@ -484,80 +657,32 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     def create_order(self, request):
         """Create Razorpay order for subscription."""
         plan_key = request.data.get('plan', 'DAILY_PRACTICE')
-        
+        amount = order_amount(plan_key)
         try:
-            plan_obj = SubscriptionPlan.objects.get(key=plan_key)
-            amount = int(plan_obj.price * 100)  # Convert to paise
-        except SubscriptionPlan.DoesNotExist:
-            # Fallback for legacy or if DB not populated yet
-            amount = settings.SUBSCRIPTION_PRICES.get(plan_key, 29900)
-        
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-        
-        order = client.order.create({
-            'amount': amount,
-            'currency': 'INR',
-            'payment_capture': 1
-        })
-        
-        return Response({
-            'order_id': order['id'],
-            'amount': amount,
-            'currency': 'INR',
-            'key_id': settings.RAZORPAY_KEY_ID,
-        })
+            order = get_or_create_order(request.user.pk, plan_key, amount)
+        except GatewayUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except OrderInProgress as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(order_response(order, amount))
     
     @action(detail=False, methods=['post'])
     def verify_payment(self, request):
         """Verify payment and activate subscription."""
         payment_id = request.data.get('payment_id')
         plan_key = request.data.get('plan', 'DAILY_PRACTICE')
-        
-        # Calculate expiry date
-        try:
-            plan_obj = SubscriptionPlan.objects.get(key=plan_key)
-            duration_days = plan_obj.duration_days
-            amount = plan_obj.price
-        except SubscriptionPlan.DoesNotExist:
-            # Fallback logic
-            if plan_key in ['DAILY_PRACTICE', 'MOCK_TEST_MASTER']:
-                duration_days = 30
-                amount = 299 if plan_key == 'DAILY_PRACTICE' else 499
-            elif plan_key == 'YEARLY_ELITE':
-                duration_days = 365
-                amount = 2999
-            else:
-                duration_days = 30
-                amount = 299
-        
-        expires_at = timezone.now() + timedelta(days=duration_days)
-        
-        # Create subscription record
-        subscription = Subscription.objects.create(
-            user=request.user,
-            plan=plan_key,
-            status='ACTIVE',
-            expires_at=expires_at,
-            payment_id=payment_id,
-            amount=amount
-        )
-        
-        # Update user subscription
-        request.user.subscription_tier = 'PREMIUM'
-        request.user.subscription_expires = expires_at
-        request.user.save()
-        
-        return Response({
-            'message': 'Subscription activated successfully',
-            'expires_at': expires_at,
-        })
+        expires_at = activate_subscription(request.user, plan_key, payment_id)
+        return Response(activation_response(expires_at))
 
 
-class AdConfigViewSet(viewsets.ReadOnlyModelViewSet):
+class AdConfigViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Ad configuration."""
     
     queryset = AdConfig.objects.filter(is_active=True)
     serializer_class = AdConfigSerializer
+    cache_namespace = 'ad-configs'
+    cache_models = (AdConfig,)
+    query_budgets = {'list': 3, 'retrieve': 2, 'config': 4}
     
     @action(detail=False, methods=['get'])
     def config(self, request):
@@ -568,6 +693,9 @@ class AdConfigViewSet(viewsets.ReadOnlyModelViewSet):
         if user.is_premium:
             return Response({'show_ads': False})
         
+        return self.cached_response(request, self.build_config)
+    
+    def build_config(self):
         configs = self.get_queryset()
         serializer = self.get_serializer(configs, many=True)
         
@@ -581,6 +709,7 @@ class DailyPracticeViewSet(viewsets.ViewSet):
     """Daily Practice Paper management."""
     
     permission_classes = [IsAuthenticated]
+    query_budgets = {'questions': 2, 'submit': 3, 'history': 1, 'status': 1}
 
     @action(detail=False, methods=['get'])
     def questions(self, request):
@@ -591,67 +720,9 @@ class DailyPracticeViewSet(viewsets.ViewSet):
             
         today = timezone.now().date()
         
-        # Check if paper already exists
-        from .models import DailyPracticePaper
-        
-        try:
-            paper = DailyPracticePaper.objects.get(date=today, practice_type=count)
-            questions = paper.questions.all()
-            serializer = QuestionListSerializer(questions, many=True)
-            return Response(serializer.data)
-        except DailyPracticePaper.DoesNotExist:
-            # Generate new paper
-            pass
-            
-        # Seed random with today's date for consistency across users (fallback if DB fails)
-        # But now we persist it, so seed is less critical for consistency, but good for reproducibility
-        seed = int(today.strftime('%Y%m%d'))
-        
-        # We need questions from Physics, Chemistry, Botany, Zoology
-        # Let's distribute them roughly equally
-        subjects = ['Physics', 'Chemistry', 'Botany', 'Zoology']
-        questions_per_subject = count // 4
-        remainder = count % 4
-        
-        all_questions = []
-        
-        import random
-        # Use a deterministic random generator seeded with date
-        rng = random.Random(seed)
-        
-        for i, subject in enumerate(subjects):
-            # Calculate how many questions for this subject
-            limit = questions_per_subject + (1 if i < remainder else 0)
-            
-            # Get IDs of all questions for this subject
-            # We fetch IDs first to be efficient, then pick random IDs
-            q_ids = list(Question.objects.filter(subject__iexact=subject).values_list('id', flat=True))
-            
-            if not q_ids:
-                continue
-                
-            # Shuffle deterministically
-            rng.shuffle(q_ids)
-            
-            # Pick top N
-            selected_ids = q_ids[:limit]
-            
-            # Fetch actual objects
-            # We need to preserve order, or just return them
-            questions = Question.objects.filter(id__in=selected_ids)
-            all_questions.extend(questions)
-            
-        # Create persistent paper
-        if all_questions:
-            paper = DailyPracticePaper.objects.create(
-                date=today,
-                practice_type=count
-            )
-            paper.questions.set(all_questions)
-            
-        # Serialize
-        serializer = QuestionListSerializer(all_questions, many=True)
-        return Response(serializer.data)
+        # Papers are pre-built by build_daily_papers; this only builds one
+        # (under a lock) if the scheduled job has not run yet
+        return Response(get_paper_questions(today, count))
 
     @action(detail=False, methods=['post'])
     def submit(self, request):
@@ -765,3 +836,59 @@ class DailyPracticeViewSet(viewsets.ViewSet):
             'max_streak': user.max_streak,
             'last_practice_date': user.last_practice_date
         })
+
+
+@query_budget(1)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def database_health(request):
+    """Database liveness plus this process's connection pool metrics."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        database = 'ok'
+    except DatabaseError as e:
+        # Driver messages can name hosts and users; keep them in the server log
+        log_event(logger, logging.ERROR, 'database_health_failed', error=str(e))
+        database = 'error'
+    return Response(
+        {'database': database, 'pool': pool_stats()},
+        status=status.HTTP_200_OK if database == 'ok' else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+@query_budget(0)
+@require_GET
+def metrics(request):
+    """
+    This process's request metrics and cache/pool state, in Prometheus text
+    format. A plain Django view, so scrapers' Accept headers never hit DRF
+    content negotiation.
+    """
+    expected = settings.METRICS_TOKEN
+    if not expected:
+        # Open only in development; production must set a token (check api.E002)
+        if not settings.DEBUG:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {expected}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+    tokens = token_cache.stats()
+    lines = registry.render()
+    lines += metric_lines('api_token_cache_size', 'gauge', 'Verified Firebase tokens cached.', [({}, tokens['size'])])
+    lines += metric_lines('api_token_cache_requests_total', 'counter', 'Token cache lookups by result.', [
+        ({'result': 'hit'}, tokens['hits']),
+        ({'result': 'miss'}, tokens['misses']),
+    ])
+    lines += metric_lines('api_token_cache_evictions_total', 'counter', 'Tokens evicted from the cache.',
+                          [({}, tokens['evictions'])])
+    pools = pool_stats()
+    for field in ('open', 'idle', 'checked_out'):
+        lines += metric_lines(f'api_db_pool_{field}', 'gauge', f'Pooled database connections: {field}.',
+                              [({'alias': alias}, stats[field]) for alias, stats in pools.items()])
+    for field in ('checkouts', 'waits', 'timeouts'):
+        lines += metric_lines(f'api_db_pool_{field}_total', 'counter', f'Database pool {field}.',
+                              [({'alias': alias}, stats[field]) for alias, stats in pools.items()])
+    lines += metric_lines('api_log_dropped_total', 'counter', 'Log records dropped by a full queue.',
+                          [({}, dropped_records())])
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
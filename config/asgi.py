@@ -0,0 +1,14 @@
+"""
+ASGI config for PrepShark project.
+
+Serves I/O-bound endpoints with async views, e.g.:
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
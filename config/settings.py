@@ -3,8 +3,11 @@ Django settings for PrepShark backend.
 """
 
 import os
+import sys
 from pathlib import Path
+from urllib.parse import urlparse
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 
 # Build paths
@@ -33,17 +36,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the summary line covers the whole stack
+    'api.middleware.RequestLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # Wraps the Firebase middleware so its time shows up as the auth phase
+    'api.middleware.PerformanceMiddleware',
     # Firebase middleware BEFORE CSRF so we can skip CSRF for API
     'api.middleware.FirebaseAuthenticationMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so it only counts the view's own queries
+    'api.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -70,7 +79,59 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default=config('DATABASE_URL', default='sqlite:///db.sqlite3'),
-        conn_max_age=600
+        conn_max_age=600,
+        # Reused connections are checked before each request, so a database
+        # restart does not surface as errors
+        conn_health_checks=True,
+    )
+}
+
+# Connection pooling for PostgreSQL (DATABASE_POOL_SIZE=0 turns it off).
+# Each process holds at most SIZE + MAX_OVERFLOW connections; requests wait
+# up to TIMEOUT seconds for one before failing.
+DATABASE_POOL_SIZE = config('DATABASE_POOL_SIZE', default=5, cast=int)
+if DATABASE_POOL_SIZE > 0 and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'api.db.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,  # Connections go back to the pool after every request
+        'POOL': {
+            'SIZE': DATABASE_POOL_SIZE,
+            'MAX_OVERFLOW': config('DATABASE_POOL_MAX_OVERFLOW', default=5, cast=int),
+            'TIMEOUT': config('DATABASE_POOL_TIMEOUT', default=10, cast=float),
+            'RECYCLE': config('DATABASE_POOL_RECYCLE', default=1800, cast=int),
+        },
+    })
+
+# Cache
+# CACHE_URL selects the backend: locmem:// (default, per process),
+# file:///path/to/dir (shared by workers on one host) or redis://host:port/db
+# (shared by every instance; needs the redis package).
+def cache_from_url(url, max_entries):
+    parsed = urlparse(url)
+    if parsed.scheme == 'locmem':
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': parsed.netloc or 'default',
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        }
+    if parsed.scheme == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': parsed.path,
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        }
+    if parsed.scheme in ('redis', 'rediss'):
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+        }
+    raise ImproperlyConfigured(f'Unsupported CACHE_URL scheme: {parsed.scheme}')
+
+
+CACHES = {
+    'default': cache_from_url(
+        config('CACHE_URL', default='locmem://'),
+        config('CACHE_MAX_ENTRIES', default=10000, cast=int),
     )
 }
 
@@ -104,6 +165,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [],  # Using custom middleware for auth
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # CORS
@@ -116,9 +181,99 @@ CORS_ALLOW_CREDENTIALS = True
 # Firebase
 FIREBASE_CREDENTIALS_PATH = config('FIREBASE_CREDENTIALS', default=None)
 
+# Verified token cache (entries also expire at the token's own exp claim)
+FIREBASE_TOKEN_CACHE_SIZE = config('FIREBASE_TOKEN_CACHE_SIZE', default=4096, cast=int)
+FIREBASE_TOKEN_CACHE_TTL = config('FIREBASE_TOKEN_CACHE_TTL', default=300, cast=int)
+
+# Upper bound on how long an authenticated user's row is cached (it is also
+# dropped whenever the user is saved or deleted)
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=300, cast=int)
+
 # Razorpay
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID', default='')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET', default='')
+# Point at a local fake gateway for benchmarks and manual testing
+RAZORPAY_BASE_URL = config('RAZORPAY_BASE_URL', default='https://api.razorpay.com')
+RAZORPAY_CONNECT_TIMEOUT = config('RAZORPAY_CONNECT_TIMEOUT', default=3.05, cast=float)
+RAZORPAY_READ_TIMEOUT = config('RAZORPAY_READ_TIMEOUT', default=10, cast=float)
+RAZORPAY_POOL_SIZE = config('RAZORPAY_POOL_SIZE', default=20, cast=int)
+# Consecutive gateway failures that open the circuit, and how long it stays open
+RAZORPAY_BREAKER_THRESHOLD = config('RAZORPAY_BREAKER_THRESHOLD', default=5, cast=int)
+RAZORPAY_BREAKER_RESET = config('RAZORPAY_BREAKER_RESET', default=30, cast=int)
+# An unpaid order is handed out again to retries for the same user and plan
+RAZORPAY_ORDER_TTL = config('RAZORPAY_ORDER_TTL', default=900, cast=int)
+
+# Async mode (set by config/asgi.py): payment endpoints are served by async
+# views, and blocking SDK calls run on a pool of this many threads
+ASYNC_VIEWS = config('DJANGO_ASYNC_VIEWS', default=False, cast=bool)
+BLOCKING_IO_WORKERS = config('BLOCKING_IO_WORKERS', default=32, cast=int)
+
+# Upper bound on how long an entitlement snapshot is cached (it is also
+# dropped when a subscription changes or expires)
+ENTITLEMENT_CACHE_TTL = config('ENTITLEMENT_CACHE_TTL', default=900, cast=int)
+
+# Rendered mock test detail payloads are keyed by updated_at, so this only
+# bounds how long unused versions linger
+MOCK_TEST_PAYLOAD_TTL = config('MOCK_TEST_PAYLOAD_TTL', default=86400, cast=int)
+
+# Per-exam-type mock test listings are shared by all users for this long
+MOCK_TEST_LIST_TTL = config('MOCK_TEST_LIST_TTL', default=60, cast=int)
+
+# Rendered catalog responses (plans, chapters, counts, ad configs) are
+# dropped by save signals; the table fingerprint in their key is re-checked
+# this often to also catch bulk writes that skip signals
+CATALOG_CACHE_TTL = config('CATALOG_CACHE_TTL', default=3600, cast=int)
+CATALOG_FINGERPRINT_TTL = config('CATALOG_FINGERPRINT_TTL', default=30, cast=int)
+
+# Logging: JSON lines on stderr, written by a background thread. Events are
+# kept with the probability given in LOG_SAMPLE_RATES
+# (e.g. "request=0.1,token_rejected=0.5"); warnings and errors always are.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', default=10000, cast=int)
+LOG_SAMPLE_RATES = config(
+    'LOG_SAMPLE_RATES',
+    default='',
+    cast=lambda value: {
+        event.strip(): float(rate) for event, rate in (pair.split('=') for pair in value.split(',') if pair)
+    },
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'api.log.RequestIdFilter'},
+        'sampling': {'()': 'api.log.SamplingFilter', 'rates': LOG_SAMPLE_RATES},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'api.log.QueueHandler',
+            'maxsize': LOG_QUEUE_SIZE,
+            'filters': ['request_id', 'sampling'],
+        },
+    },
+    'loggers': {
+        'api': {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
+# Under "manage.py test" the 'api' logger writes to a NullHandler, so request
+# lines don't bury the test report and no writer thread is started.
+# assertLogs still sees every record.
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    LOGGING['handlers'] = {'null': {'class': 'logging.NullHandler'}}
+    LOGGING['loggers']['api']['handlers'] = ['null']
+
+# Per-request phase timings are sent in a Server-Timing header when on.
+# /api/_metrics/ requires "Authorization: Bearer <METRICS_TOKEN>"; without a
+# token it is only served when DEBUG is on.
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# What to do when a view runs more queries than its declared budget:
+# 'log', 'raise' or 'off'
+QUERY_BUDGET_MODE = config('QUERY_BUDGET_MODE', default='log' if DEBUG else 'off')
 
 # Premium subscription prices (in paise for Razorpay)
 SUBSCRIPTION_PRICES = {